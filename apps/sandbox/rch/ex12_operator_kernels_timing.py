@@ -0,0 +1,146 @@
+r'''
+
+Micro-benchmark of the operator kernels.
+
+The dihedral angles, the derivatives of the facet normals and of the
+potential energy of gravity are evaluated using the previous formulation
+contracting the operands with the Levi-Civita symbol ``EPS`` (before)
+and using the crease pattern operators based on the explicit cross
+products of ``oricreate.util.operator_kernels`` (after).
+The results of both formulations are compared and the average
+evaluation times are printed.
+
+'''
+
+import timeit
+
+import numpy as np
+from oricreate.api import YoshimuraCPFactory
+from oricreate.util import DELTA, EPS
+
+
+def get_iL_psi(cp):
+    l = cp.norm_iL_vectors
+    n0, n1 = np.einsum('ijk->jik', cp.norm_iL_F_normals)
+    p0 = np.einsum('...i,...j,...kij->...k', l, n0, EPS)
+    T = np.concatenate([l[:, np.newaxis, :],
+                        n0[:, np.newaxis, :],
+                        p0[:, np.newaxis, :]], axis=1)
+    n1_ = np.einsum('...ij,...j->...i', T, n1)
+    n1_1, n1_2 = n1_[:, 1:].T
+    psi = np.arcsin(n1_2)
+    oa_idx = np.where(n1_1 < 0.0)[0]
+    psi[oa_idx] += np.sign(n1_2[oa_idx]) * np.pi - 2.0 * psi[oa_idx]
+    return psi
+
+
+def get_unit_du(x, x_du):
+    norm_x = np.sqrt(np.einsum('...i,...i->...', x, x))
+    unit_x = x / norm_x[:, np.newaxis]
+    unit_x_du = 1 / norm_x[:, np.newaxis, np.newaxis, np.newaxis] * (
+        x_du - np.einsum('...j,...i,...iNd->...jNd', unit_x, unit_x, x_du))
+    return unit_x, unit_x_du
+
+
+def get_iL_psi_dul(cp, Fa_normals_du):
+    nl0, nl1 = np.einsum('fi...->if...', cp.iL_F_normals)
+    nl_du = np.sum(Fa_normals_du, axis=1)[cp.iL_F]
+    nl0_dul0, nl1_dul1 = np.einsum('fi...->if...', nl_du)
+    unit_vl, unit_vl_dul = get_unit_du(cp.iL_vectors, cp.iL_vectors_dul)
+    unit_nl0, unit_nl0_dul0 = get_unit_du(nl0, nl0_dul0)
+    unit_nl1, unit_nl1_dul1 = get_unit_du(nl1, nl1_dul1)
+    Tl0 = np.einsum('ij...->ji...',
+                    np.array([unit_vl, unit_nl0,
+                              np.einsum('...j,...k,...ijk->...i',
+                                        unit_vl, unit_nl0, EPS)]))
+    unit_nl01 = np.einsum('...ij,...j->...i', Tl0, unit_nl1)
+    oa_idx = np.where(unit_nl01[:, 1] < 0.0)[0]
+    Tl0_dul0 = np.einsum('ij...->ji...',
+                         np.array([np.zeros_like(unit_nl0_dul0),
+                                   unit_nl0_dul0,
+                                   np.einsum('...j,...kNd,...ijk->...iNd',
+                                             unit_vl, unit_nl0_dul0, EPS)]))
+    Tl0_dul = np.einsum('ij...->ji...',
+                        np.array([unit_vl_dul,
+                                  np.zeros_like(unit_vl_dul),
+                                  np.einsum('...jNd,...k,...ijk->...iNd',
+                                            unit_vl_dul, unit_nl0, EPS)]))
+    rho = 1 / np.sqrt((1 - unit_nl01[:, 2]**2))
+    psi_dul = np.zeros((cp.n_iL, 4, 3), dtype='float_')
+    psi_dul[:, :2] += np.einsum('...,...j,...ijNd->...iNd',
+                                rho, unit_nl1, Tl0_dul)[:, 2, ...]
+    iL_idx = np.arange(cp.n_iL)[:, np.newaxis]
+    psi_dul[iL_idx, cp.iL_F_psi_idx[:, 0, :]] += np.einsum(
+        '...,...j,...ijNd->...iNd', rho, unit_nl1, Tl0_dul0)[:, 2, ...]
+    psi_dul[iL_idx, cp.iL_F_psi_idx[:, 1, :]] += np.einsum(
+        '...,...jNd,...ij->...iNd', rho, unit_nl1_dul1, Tl0)[:, 2, ...]
+    psi_dul[oa_idx, ...] *= -1.0
+    return psi_dul
+
+
+def get_Fa_normals_du(cp):
+    x_F = cp.x[cp.F_N]
+    N_deta_ip = cp.Na_deta
+    return (np.einsum('aK,aL,KJ,dli,ILl->IaiJd',
+                      N_deta_ip[:, 0, :], N_deta_ip[:, 1, :],
+                      DELTA, EPS, x_F) +
+            np.einsum('aK,aL,LJ,kdi,IKk->IaiJd',
+                      N_deta_ip[:, 0, :], N_deta_ip[:, 1, :],
+                      DELTA, EPS, x_F))
+
+
+def get_F_V_du(cp, Fa_normals_du):
+    x_F = cp.x[cp.F_N]
+    r_deta = np.einsum('ajK,IKi->Iaij', cp.Na_deta, x_F)
+    n = np.einsum('Iai,Iaj,ijk->Iak', r_deta[..., 0], r_deta[..., 1], EPS)
+    a = np.sqrt(np.einsum('Iai,Iai->Ia', n, n))
+    a_dx = np.einsum('Ia,Iak,IakJd->IaJd', 1 / a, n, Fa_normals_du)
+    r = np.einsum('aK,IKi->Iai', cp.Na, x_F)
+    r3_a_dx = np.einsum('Ia,IaJj->IaJj', r[..., 2], a_dx)
+    r3_dx = np.einsum('aK,KJ,j->aJj', cp.Na, DELTA, DELTA[2, :])
+    a_r3_dx = np.einsum('Ia,aJj->IaJj', a, r3_dx)
+    return np.einsum('a,IaJj->IJj', cp.eta_w, (a_r3_dx + r3_a_dx))
+
+
+cached_names = ['iL_psi', 'iL_psi_dul', 'F_normals_du', 'iL_F_normals_du',
+                'F_V_du']
+
+
+def get_operator_values(cp):
+    '''Evaluate the benchmarked operators after removing their values
+    from the cache so that the remaining input operators are reused.
+    '''
+    for name in cached_names:
+        cp.__dict__.pop('_traits_cache_' + name, None)
+    return (cp.iL_psi, cp.iL_psi_dul, cp.Fa_normals_du, cp.F_V_du)
+
+
+def get_reference_values(cp):
+    Fa_normals_du = get_Fa_normals_du(cp)
+    return (get_iL_psi(cp), get_iL_psi_dul(cp, Fa_normals_du),
+            Fa_normals_du, get_F_V_du(cp, Fa_normals_du))
+
+
+if __name__ == '__main__':
+
+    n_repeat = 20
+    for n_x, n_y in [(4, 4), (16, 16), (40, 40)]:
+        cp = YoshimuraCPFactory(n_x=n_x, n_y=n_y, L_x=4, L_y=2).formed_object
+        cp.U = np.sin(np.arange(cp.n_dofs)) * 0.05
+        # the input operators are shared by both formulations
+        cp.norm_iL_vectors, cp.norm_iL_F_normals, cp.iL_vectors_dul
+        cp.iL_F_psi_idx
+
+        values = get_operator_values(cp)
+        ref_values = get_reference_values(cp)
+        err = max(np.max(np.fabs(v - v_ref))
+                  for v, v_ref in zip(values, ref_values))
+
+        t_before = timeit.timeit(lambda: get_reference_values(cp),
+                                 number=n_repeat) / n_repeat
+        t_after = timeit.timeit(lambda: get_operator_values(cp),
+                                number=n_repeat) / n_repeat
+        print('n_F = %5d: before %8.3f ms, after %8.3f ms, '
+              'speedup %5.2f, max. difference %.1e' %
+              (cp.n_F, t_before * 1e3, t_after * 1e3,
+               t_before / t_after, err))
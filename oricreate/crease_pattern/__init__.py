@@ -1,6 +1,8 @@
 
 from .crease_pattern import \
     CreasePattern
+from .crease_pattern_batch import \
+    CreasePatternBatch
 from .crease_pattern_export import \
     CreasePatternExport
 from .crease_pattern_operators import \
@@ -8,5 +10,7 @@ from .crease_pattern_operators import \
     CreaseCummulativeOperators
 from .crease_pattern_state import \
     CreasePatternState
+from .crease_pattern_topology import \
+    NodeLineAdjacency, FacetLineIndex, HalfEdgeTopology
 from .crease_pattern_viz3d import \
     CreasePatternViz3D, CreasePatternNormalsViz3D, CreasePatternBasesViz3D
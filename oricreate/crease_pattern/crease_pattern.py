@@ -33,9 +33,24 @@ from .crease_pattern_operators import \
 
 from .crease_pattern_plot_helper import \
     CreasePatternPlotHelper
+from .crease_pattern_topology import \
+    NodeLineAdjacency, FacetLineIndex, HalfEdgeTopology
 
 
 INPUT = '+cp_input'
+'''Invalidation group of all input attributes, i.e. the initial
+configuration, the connectivity and the displacement of the nodes.
+Derived properties depending on the current geometry
+are recalculated on any change within this group.
+'''
+
+TOPOLOGY = '+cp_topology'
+'''Invalidation group of the attributes defining the
+crease pattern connectivity in its initial configuration ``X, L, F``.
+Topological mappings and the properties of the initial configuration
+depend on this group only so that they survive the updates
+of the displacement during the iterative solution.
+'''
 
 
 class XArrayAdapter(TabularAdapter):
@@ -116,7 +131,8 @@ class CreasePattern(CreaseNodeOperators,
     # Node coordinates
     # ==========================================================================
 
-    X = Array(value=[], dtype='float_', cp_input=True)
+    X = Array(value=[], dtype='float_', cp_input=True,
+              cp_topology=True)
     '''Input array of node coordinates with rows specifying
     ``(n_N,n_D)`` values.
     '''
@@ -149,7 +165,7 @@ class CreasePattern(CreaseNodeOperators,
     # Node mappings
     # ==========================================================================
 
-    N = Property(depends_on=INPUT)
+    N = Property(depends_on=TOPOLOGY)
     '''Array of all node numbers.
     '''
     @cached_property
@@ -163,52 +179,54 @@ class CreasePattern(CreaseNodeOperators,
     def _get_n_N(self):
         return self.X.shape[0]
 
-    NN_L = Property(depends_on=INPUT)
-    '''Matrix with ``(n_N,n_N)`` entries containing line numbers
-    for the connected nodes. For unconnected nodes it contains the value ``-1``
+    NN_L = Property(depends_on=TOPOLOGY)
+    '''Sparse matrix with ``(n_N,n_N)`` entries containing line numbers
+    for the connected nodes. For unconnected nodes it delivers
+    the value ``-1``. The adjacency is stored in the CSR format
+    (see :class:`NodeLineAdjacency`) and can be indexed
+    with a pair of node arrays, e.g. ``NN_L[n1, n2]``.
+    The dense matrix is available using ``NN_L.toarray()``.
     '''
     @cached_property
     def _get_NN_L(self):
-        NN = np.zeros((self.n_N, self.n_N), dtype='int') - 1
-        NN[self.L[:, 0], self.L[:, 1]] = np.arange(self.n_L)
-        NN[self.L[:, 1], self.L[:, 0]] = np.arange(self.n_L)
-        return NN
+        return NodeLineAdjacency(n_N=self.n_N, L=self.L)
 
-    N_nbr = Property(depends_on=INPUT)
+    N_nbr = Property(depends_on=TOPOLOGY)
     '''List with ``n_N`` entries, each containing
     an array with neighbor nodes attached to a node :math:`i`.
     '''
     @cached_property
     def _get_N_nbr(self):
-        # identify the neighbors by searching for all lines
-        # which mention a node n
-        rl = [np.where(self.L == n) for n in self.N]
-        # from the identified pair get the node other than the
-        # outgoing node
-        switch_idx = np.array([1, 0], dtype='int')
-        return [self.L[row, switch_idx[col]] for row, col in rl]
-
-    iN = Property(depends_on=INPUT)
+        # split the rows of the sparse adjacency
+        NN_L = self.NN_L
+        return np.split(NN_L.indices, NN_L.indptr[1:-1])
+
+    iN = Property(depends_on=TOPOLOGY)
     '''Array of interior nodes.
-    Included are all nodes that have a closed cycle of neighbors.
+    Included are all nodes that have a closed cycle of facets
+    obtained by rotating the half-edges around the node (see ``H``).
     For these nodes, the mappings :math:`\mathrm{nbr}(i,\\kappa)` and
     :math:`\mathrm{aln}(i,\\lambda)` (see below) are provided.
     '''
     @cached_property
     def _get_iN(self):
-        return self._get_nbr_cycles()[0]
+        return self.H.iN
 
-    iN_nbr = Property(depends_on=INPUT)
+    iN_nbr = Property(depends_on=TOPOLOGY)
     '''List of arrays implementing the mapping
     :math:`\mathrm{nbr}(i,\\kappa)` that delivers the global index
     of a :math:`\\kappa`-th neighbor of an interior node :math:`i` in
-    a counter-clockwise order.
+    a counter-clockwise order. The cycle is closed, i.e. the first
+    neighbor is repeated at the end of each array.
     '''
     @cached_property
     def _get_iN_nbr(self):
-        return self._get_ordered_nbr_cycles()
+        H = self.H
+        iN_ptr, iN_nbr = H.iN_ptr, H.iN_nbr
+        iN_nbr_closed = np.insert(iN_nbr, iN_ptr[1:], iN_nbr[iN_ptr[:-1]])
+        return np.split(iN_nbr_closed, (iN_ptr + np.arange(len(iN_ptr)))[1:-1])
 
-    iN_aln = Property(depends_on=INPUT)
+    iN_aln = Property(depends_on=TOPOLOGY)
     '''List of arrays implementing the mapping
     :math:`\mathrm{aln}(i,\\lambda)` that delivers the global index
     of a :math:`\\lambda`-th line attached to an interior node :math:`i` in
@@ -216,25 +234,22 @@ class CreasePattern(CreaseNodeOperators,
     '''
     @cached_property
     def _get_iN_aln(self):
-        iN_aln_lst = []
-        for i, neighbors in zip(self.iN, self.iN_nbr):
-            iN_aln_lst.append(self.NN_L[i, neighbors[:-1]])
-        return iN_aln_lst
+        H = self.H
+        return np.split(H.iN_aln, H.iN_ptr[1:-1])
 
-    eN = Property(depends_on=INPUT)
+    eN = Property(depends_on=TOPOLOGY)
     '''Array of edge nodes obtained as a complement of interior nodes.
     '''
     @cached_property
     def _get_eN(self):
-        eN_bool = np.ones_like(self.N, dtype='bool')
-        eN_bool[self.iN] = False
-        return np.where(eN_bool)[0]
+        return self.H.eN
 
     # ==========================================================================
     # Line mappings
     # ==========================================================================
 
-    L = Array(value=[], dtype='int_', cp_input=True)
+    L = Array(value=[], dtype='int_', cp_input=True,
+              cp_topology=True)
     '''Array of all crease lines including ghost lines ``gL``
     defined by node pairs  ``(n_L,2)``
     as index-table ``[n1, n2]``.
@@ -260,19 +275,20 @@ class CreasePattern(CreaseNodeOperators,
         filter_arr[self.gL] = False
         return L[filter_arr]
 
-    gL = Array(value=[], dtype='int_', cp_input=True)
+    gL = Array(value=[], dtype='int_', cp_input=True,
+              cp_topology=True)
     '''Array of ghost lines within a plane facet specified by the line
     index within aL array.
     '''
 
-    gL_N = Property(depends_on=INPUT)
+    gL_N = Property(depends_on=TOPOLOGY)
     '''End nodes of a ghost lines.
     '''
     @cached_property
     def _get_gL_N(self):
         return self.L_N[self.gL]
 
-    L_N = Property(depends_on=INPUT)
+    L_N = Property(depends_on=TOPOLOGY)
     '''End nodes of a line.
     '''
     @cached_property
@@ -286,23 +302,19 @@ class CreasePattern(CreaseNodeOperators,
     def _get_n_L(self):
         return self.L.shape[0]
 
-    LLL_F = Property(depends_on=INPUT)
-    '''Matrix with ``(n_L,n_L,n_L)`` entries delivering the facet number
-    for a triple of lines constituting this facet.
-    For unconnected lines it contains the value ``-1``.
+    LLL_F = Property(depends_on=TOPOLOGY)
+    '''Index delivering the facet number for a triple of lines
+    constituting this facet in arbitrary order, i.e. ``LLL_F[l1, l2, l3]``.
+    For lines not constituting a facet it contains the value ``-1``.
+    The index is stored as a sorted array of line triple keys
+    (see ``FacetLineIndex``) so that no ``(n_L,n_L,n_L)`` array
+    is allocated. The dense array is available through ``LLL_F.toarray()``.
     '''
     @cached_property
     def _get_LLL_F(self):
-        LLL = np.zeros((self.n_L, self.n_L, self.n_L), dtype='int') - 1
-        LLL[self.F[:, 0], self.F[:, 1], self.F[:, 2]] = np.arange(self.n_F)
-        LLL[self.F[:, 1], self.F[:, 2], self.F[:, 0]] = np.arange(self.n_F)
-        LLL[self.F[:, 2], self.F[:, 0], self.F[:, 1]] = np.arange(self.n_F)
-        LLL[self.F[:, 2], self.F[:, 1], self.F[:, 0]] = np.arange(self.n_F)
-        LLL[self.F[:, 0], self.F[:, 2], self.F[:, 1]] = np.arange(self.n_F)
-        LLL[self.F[:, 1], self.F[:, 0], self.F[:, 2]] = np.arange(self.n_F)
-        return LLL
-
-    L_F_map = Property(depends_on=INPUT)
+        return FacetLineIndex(n_L=self.n_L, F_L=self.F_L)
+
+    L_F_map = Property(depends_on=TOPOLOGY)
     '''Array associating lines with the adjacent facets.
     Returns two arrays, the first one contains line indices, the
     second one the facet indices that are attached. Note that
@@ -311,36 +323,37 @@ class CreasePattern(CreaseNodeOperators,
     '''
     @cached_property
     def _get_L_F_map(self):
+        # enumerate the facet-line incidences
+        F_L = self.F_L.flatten()
+        # sort the incidences by lines - the stable sort keeps the
+        # facets attached to a line in an ascending order
+        L_F_order = np.argsort(F_L, kind='mergesort')
+        return F_L[L_F_order], L_F_order // 3
 
-        # search for facets containing the line numbers
-        L = np.arange(self.n_L)
-
-        # use broadcasting to identify the matching indexes in both arrays
-        L_F_bool = L[np.newaxis, np.newaxis, :] == self.F_L[:, :, np.newaxis]
-
-        # within the facet any of the line numbers can match, merge the axis 1
-        L_F_bool = np.any(L_F_bool, axis=1)
-        l, f = np.where(L_F_bool.T)
-
-        return l, f
+    n_L_F = Property(depends_on=TOPOLOGY)
+    '''Number of facets attached to each line ``(n_L,)``.
+    '''
+    @cached_property
+    def _get_n_L_F(self):
+        return np.bincount(self.F_L.flatten(), minlength=self.n_L)
 
-    iL = Property(depends_on=INPUT)
+    iL = Property(depends_on=TOPOLOGY)
     '''Array of interior lines ``(n_iL,)``.
     Interior lines are detected by checking that there are two
     attached facets.
     '''
     @cached_property
     def _get_iL(self):
-        return np.where(np.bincount(self.L_F_map[0]) == 2)[0]
+        return np.where(self.n_L_F == 2)[0]
 
-    L_iL = Property(depends_on=INPUT)
+    L_iL = Property(depends_on=TOPOLOGY)
     '''Array mapping the line indexed within the ``L`` array to the 
     index of within the interior line array. Lines that are not interior
     contain the index None
     '''
     @cached_property
     def _get_L_iL(self):
-        L_iL = np.zeros(self.n_L, dtype=np.int) - 1
+        L_iL = np.zeros(self.n_L, dtype='int_') - 1
         L_iL[self.iL] = np.arange(self.n_iL)
         return L_iL
 
@@ -348,7 +361,7 @@ class CreasePattern(CreaseNodeOperators,
     '''Number of interior lines
     '''
 
-    iL_N = Property(depends_on=INPUT)
+    iL_N = Property(depends_on=TOPOLOGY)
     '''End nodes of a line.
     '''
     @cached_property
@@ -358,47 +371,30 @@ class CreasePattern(CreaseNodeOperators,
     def _get_n_iL(self):
         return len(self.iL)
 
-    eL = Property(depends_on=INPUT)
+    eL = Property(depends_on=TOPOLOGY)
     '''Array of edge lines ``(n_eL,)``.
     Edge lines are associated to one facet only.
     '''
     @cached_property
     def _get_eL(self):
-        return np.where(np.bincount(self.L_F_map[0]) == 1)[0]
+        return np.where(self.n_L_F == 1)[0]
 
-    iL_F = Property(depends_on=INPUT)
+    iL_F = Property(depends_on=TOPOLOGY)
     '''Array of facets associated with interior lines ``(n_L,2)``.
     Mapping from interior lines to two adjacent facets:
     :math:`\mathrm{afa}(l,\\phi), \; \\phi \\in (1,2)`.
-    The ordering of facets is given by the counter-clockwise rotation
-    around the first of the line :math:`l`.
+    The facets of each line are ordered by their index.
     '''
     @cached_property
     def _get_iL_F(self):
-        # get the line - to -facet mapping
-        l, f = self.L_F_map
-        # get the lines that have less than two attached facets
-        # i.e. they are edge lines or lose bars
-        eL = np.bincount(l) != 2
-        # get the indexes within the bincount
-        eL_vals = np.where(eL)[0]
-        # get the indices of edge lines within the original line array
-        el_ix = np.digitize(eL_vals, l) - 1
-        # construct the mask hiding the edge lines in the original array
-        l_map = np.zeros_like(l, dtype=bool)
-        l_map[el_ix] = True
-        # use the masked array to filter out the edge nodes and lose
-        # bars from the mapping.
-        fm = np.ma.masked_array(f, mask=l_map)
-        # make the array compact and reshape it.
-        fm_compressed = np.ma.compressed(fm)
-        return fm_compressed.reshape(-1, 2)
+        return self.H.iL_F
 
     # ==========================================================================
     # Facet mappings
     # ==========================================================================
 
-    F = Array(value=[], dtype='int_', cp_input=True)
+    F = Array(value=[], dtype='int_', cp_input=True,
+              cp_topology=True)
     '''Array of facet nodes ``(n_F,3)`` as an index-table ``[n1, n2, n3]``.
     '''
 
@@ -412,7 +408,7 @@ class CreasePattern(CreaseNodeOperators,
     def _get_n_F(self):
         return self.F.shape[0]
 
-    F_L = Property(depends_on=INPUT)
+    F_L = Property(depends_on=TOPOLOGY)
     '''Lines associated with facets.
     Array with the shape ``(n_F, 3)`` associating each facet with three
     ``[l1,l2,l3]``.
@@ -424,7 +420,18 @@ class CreasePattern(CreaseNodeOperators,
         # use the NN_L map to get line numbers
         return self.NN_L[F_L_N[..., 0], F_L_N[..., 1]]
 
-    F_L_N = Property(depends_on=INPUT)
+    H = Property(depends_on=TOPOLOGY)
+    '''Half-edge representation of the crease pattern derived from
+    the counter-clockwise enumerated facets (see ``HalfEdgeTopology``).
+    It delivers the vertex stars of interior nodes and the
+    facets of interior lines in the form of flat arrays.
+    '''
+    @cached_property
+    def _get_H(self):
+        return HalfEdgeTopology(n_N=self.n_N, n_L=self.n_L,
+                                F_N=self.F_N, F_L=self.F_L)
+
+    F_L_N = Property(depends_on=TOPOLOGY)
     '''Facets with lines enumerated counterclockwise.
     Array with the shape ``(n_F, 3, 2)``
     '''
@@ -435,59 +442,6 @@ class CreasePattern(CreaseNodeOperators,
         # get cycled  node numbers around a facet
         return self.F_N[:, ix_arr]
 
-    def _get_nbr_cycle(self, neighbors):
-        '''Auxiliary private methods identifying cycles around a node.
-        '''
-        n_neighbors = len(neighbors)
-        neighbor_mtx = self.NN_L[np.ix_(neighbors, neighbors)]
-
-        neighbor_map = np.where(neighbor_mtx > -1)[1]
-
-        if n_neighbors == 0 or len(neighbor_map) != 2 * n_neighbors:
-            return np.array([], dtype='i')
-
-        cycle_map = neighbor_map.reshape(n_neighbors, 2)
-
-        prev_idx = 0
-        next_idx1, next_idx = cycle_map[prev_idx]  # @UnusedVariable
-
-        cycle = [0]
-        for neigh in range(n_neighbors):  # @UnusedVariable
-            next_row = cycle_map[next_idx]
-            cycle.append(next_idx)
-            prev_2idx = next_idx
-            next_idx = next_row[np.where(next_row != prev_idx)[0][0]]
-            prev_idx = prev_2idx
-
-        return neighbors[np.array(cycle)]
-
-    def _get_nbr_cycles(self):
-        connectivity = []
-        iN_lst = []
-        for i, neighbors in enumerate(self.N_nbr):
-            cycle = self._get_nbr_cycle(neighbors)
-            if len(cycle):
-                connectivity.append((np.array(cycle)))
-                iN_lst.append(i)
-        return np.array(iN_lst), connectivity
-
-    def _get_ordered_nbr_cycles(self):
-        '''List of nodes having cycle of neighbors the format of the list is
-        ``[ (node, np.array([neighbor_node1, neighbor_node2, ...
-            neighbor_node1)), ... ]``
-        '''
-        oc = []
-        iN, iN_nbr = self._get_nbr_cycles()
-        for n, neighbors in zip(iN, iN_nbr):
-            n1, n2 = neighbors[0], neighbors[1]
-            v1 = self.X[n1] - self.X[n]
-            v2 = self.X[n2] - self.X[n]
-            vcross = np.cross(v1, v2)
-            if vcross[2] < 0:
-                neighbors = neighbors[::-1]
-            oc.append(neighbors)
-        return oc
-
     view_traits = View(
         Tabbed(
             Item('X', show_label=False,
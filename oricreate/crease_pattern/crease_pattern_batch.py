@@ -0,0 +1,301 @@
+# -------------------------------------------------------------------------
+#
+# Copyright (c) 2009, IMB, RWTH Aachen.
+# All rights reserved.
+#
+# This software is provided without warranty under the terms of the BSD
+# license included in oricreate/LICENSE.txt and may be redistributed only
+# under the conditions described in the aforementioned license.  The license
+# is also available online at http://www.simvisage.com/licenses/BSD.txt
+#
+# Thanks for using oricreate open source!
+#
+# Created on Oct 18, 2026 by: rch
+
+from traits.api import \
+    HasStrictTraits, Property, cached_property, \
+    Array, Instance
+
+import numpy as np
+from oricreate.util import \
+    get_theta, get_theta_du
+from oricreate.util.operator_kernels import \
+    contract, cross, dot
+
+from .crease_pattern import \
+    CreasePattern
+from .crease_pattern_operators import \
+    get_psi, get_psi_dul, get_Fa_tangents, get_Fa_normals_du, \
+    get_Fa_area_du, get_F_V_du
+
+
+BATCH_INPUT = 'cp, cp.X, cp.+cp_topology, u_t'
+'''Traits invalidating the batched operators: the crease pattern,
+its initial coordinates and topology and the stack of displacements.
+'''
+
+
+class CreasePatternBatch(HasStrictTraits):
+    r'''Operators of a crease pattern evaluated for a stack of states.
+
+    The displacement fields ``u_t`` of the shape ``(n_batch, n_N, n_D)``
+    are evaluated in one vectorized pass so that the operators of all
+    states are obtained as arrays with the leading dimension ``n_batch``.
+    The topology, the initial coordinates and the operators that do not
+    depend on the displacements are taken from the crease pattern ``cp``.
+    The derivatives are delivered with respect to the nodes of each
+    element given by the node maps of the crease pattern, i.e. ``L``
+    for lines, ``F_N`` for facets and ``iL_psi_N`` for interior lines.
+
+    A typical usage is the post-processing of the recorded history::
+
+        batch = CreasePatternBatch(cp=cp, u_t=sim_history.u_t)
+        psi_t = batch.iL_psi
+    '''
+
+    cp = Instance(CreasePattern)
+    r'''Crease pattern delivering the topology and the initial state.
+    '''
+
+    u_t = Array(dtype='float_')
+    r'''Stack of displacement arrays ``(n_batch, n_N, n_D)``.
+    '''
+
+    n_batch = Property(depends_on='u_t')
+    r'''Number of evaluated states.
+    '''
+
+    def _get_n_batch(self):
+        return len(self.u_t)
+
+    x_t = Property(depends_on=BATCH_INPUT)
+    r'''Stack of node coordinates ``(n_batch, n_N, n_D)``.
+    '''
+    @cached_property
+    def _get_x_t(self):
+        return self.cp.x_0[np.newaxis, ...] + self.u_t
+
+    # =========================================================================
+    # Lines
+    # =========================================================================
+    L_vectors = Property(depends_on=BATCH_INPUT)
+    r'''Vectors of the crease lines ``(n_batch, n_L, n_D)``.
+    '''
+    @cached_property
+    def _get_L_vectors(self):
+        L = self.cp.L
+        return self.x_t[:, L[:, 1]] - self.x_t[:, L[:, 0]]
+
+    L_lengths = Property(depends_on=BATCH_INPUT)
+    r'''Lengths of the crease lines ``(n_batch, n_L)``.
+    '''
+    @cached_property
+    def _get_L_lengths(self):
+        v = self.L_vectors
+        return np.sqrt(dot(v, v))
+
+    L_lengths_dul = Property(depends_on=BATCH_INPUT)
+    r'''Derivatives of the line lengths ``(n_batch, n_L, 2, n_D)``
+    with respect to the nodes of the lines given by the node map ``L``.
+    '''
+    @cached_property
+    def _get_L_lengths_dul(self):
+        unit_v = self.L_vectors / self.L_lengths[..., np.newaxis]
+        return np.stack([-unit_v, unit_v], axis=-2)
+
+    # =========================================================================
+    # Facets
+    # =========================================================================
+    F_x = Property(depends_on=BATCH_INPUT)
+    r'''Coordinates of the facet nodes ``(n_batch, n_F, 3, n_D)``
+    enumerated counter-clockwise.
+    '''
+    @cached_property
+    def _get_F_x(self):
+        return self.x_t[:, self.cp.F_N]
+
+    Fa_tangents = Property(depends_on=BATCH_INPUT)
+    r'''Tangent vectors in the integration points of the facets
+    ``(2, n_batch, n_F, n_a, n_D)``.
+    '''
+    @cached_property
+    def _get_Fa_tangents(self):
+        return get_Fa_tangents(self.cp.Na_deta, self.F_x)
+
+    Fa_normals = Property(depends_on=BATCH_INPUT)
+    r'''Normals in the integration points ``(n_batch, n_F, n_a, n_D)``.
+    '''
+    @cached_property
+    def _get_Fa_normals(self):
+        r_deta = self.Fa_tangents
+        return cross(r_deta[0], r_deta[1])
+
+    F_normals = Property(depends_on=BATCH_INPUT)
+    r'''Normals of the facets ``(n_batch, n_F, n_D)``.
+    '''
+    @cached_property
+    def _get_F_normals(self):
+        return np.sum(self.Fa_normals, axis=-2)
+
+    F_normals_dul = Property(depends_on=BATCH_INPUT)
+    r'''Derivatives of the normals of the facets
+    ``(n_batch, n_F, n_D, 3, n_D)`` with respect to the facet nodes
+    given by the node map ``F_N``.
+    '''
+    @cached_property
+    def _get_F_normals_dul(self):
+        n_du = get_Fa_normals_du(self.cp.Na_deta, self.Fa_tangents)
+        return np.sum(n_du, axis=-4)
+
+    F_L_vectors = Property(depends_on=BATCH_INPUT)
+    r'''Cycled line vectors around the facets ``(n_batch, n_F, 3, n_D)``.
+    '''
+    @cached_property
+    def _get_F_L_vectors(self):
+        F_x = self.F_x
+        return F_x[:, :, (1, 2, 0)] - F_x[:, :, (0, 1, 2)]
+
+    F_theta = Property(depends_on=BATCH_INPUT)
+    r'''Sector angles within the facets ``(n_batch, n_F, 3)``.
+    '''
+    @cached_property
+    def _get_F_theta(self):
+        v = self.F_L_vectors
+        return get_theta(-v[:, :, (2, 0, 1)], v[:, :, (0, 1, 2)])
+
+    F_theta_dul = Property(depends_on=BATCH_INPUT)
+    r'''Derivatives of the sector angles ``(n_batch, n_F, 3, 3, n_D)``
+    with respect to the facet nodes given by the node map ``F_N``.
+    '''
+    @cached_property
+    def _get_F_theta_dul(self):
+        v = self.F_L_vectors
+        v_du = self.cp.F_L_vectors_duf
+        return get_theta_du(-v[:, :, (2, 0, 1)], -v_du[:, (2, 0, 1)],
+                            v[:, :, (0, 1, 2)], v_du[:, (0, 1, 2)])
+
+    # =========================================================================
+    # Interior lines
+    # =========================================================================
+    iL_vectors = Property(depends_on=BATCH_INPUT)
+    r'''Vectors of the interior lines oriented in the counter-clockwise
+    sense of their first adjacent facet ``(n_batch, n_iL, n_D)``.
+    '''
+    @cached_property
+    def _get_iL_vectors(self):
+        F_idx, L_idx = self.cp.iL_within_F0
+        return self.F_L_vectors[:, F_idx, L_idx]
+
+    iL_F_normals = Property(depends_on=BATCH_INPUT)
+    r'''Normals of the facets adjacent to the interior lines
+    ``(n_batch, n_iL, 2, n_D)``.
+    '''
+    @cached_property
+    def _get_iL_F_normals(self):
+        return self.F_normals[:, self.cp.iL_F]
+
+    iL_psi = Property(depends_on=BATCH_INPUT)
+    r'''Dihedral angles around the interior lines ``(n_batch, n_iL)``.
+    '''
+    @cached_property
+    def _get_iL_psi(self):
+        l = self.iL_vectors
+        n = self.iL_F_normals
+        return get_psi(l / np.sqrt(dot(l, l))[..., np.newaxis],
+                       n / np.sqrt(dot(n, n))[..., np.newaxis])
+
+    iL_psi_dul = Property(depends_on=BATCH_INPUT)
+    r'''Derivatives of the dihedral angles ``(n_batch, n_iL, 4, n_D)``
+    with respect to the stencil nodes given by the node map ``iL_psi_N``.
+    '''
+    @cached_property
+    def _get_iL_psi_dul(self):
+        cp = self.cp
+        return get_psi_dul(self.iL_vectors, cp.iL_vectors_dul,
+                           self.iL_F_normals,
+                           self.F_normals_dul[:, cp.iL_F],
+                           cp.iL_F_psi_idx)
+
+    # =========================================================================
+    # Potential energy of gravity
+    # =========================================================================
+    Fa_area = Property(depends_on=BATCH_INPUT)
+    r'''Areas in the integration points ``(n_batch, n_F, n_a)``.
+    '''
+    @cached_property
+    def _get_Fa_area(self):
+        n = self.Fa_normals
+        return np.sqrt(dot(n, n))
+
+    Fa_r3 = Property(depends_on=BATCH_INPUT)
+    r'''Heights of the integration points ``(n_batch, n_F, n_a)``.
+    '''
+    @cached_property
+    def _get_Fa_r3(self):
+        return contract('aK,...IK->...Ia', self.cp.Na, self.F_x[..., 2])
+
+    F_V = Property(depends_on=BATCH_INPUT)
+    r'''Potential energy of gravity of the facets ``(n_batch, n_F)``.
+    '''
+    @cached_property
+    def _get_F_V(self):
+        return contract('a,...Ia,...Ia->...I', self.cp.eta_w,
+                        self.Fa_r3, self.Fa_area)
+
+    V = Property(depends_on=BATCH_INPUT)
+    r'''Total potential energy of gravity ``(n_batch,)``.
+    '''
+    @cached_property
+    def _get_V(self):
+        return np.sum(self.F_V, axis=-1)
+
+    F_V_dul = Property(depends_on=BATCH_INPUT)
+    r'''Derivatives of the potential energy of the facets
+    ``(n_batch, n_F, 3, n_D)`` with respect to the facet nodes
+    given by the node map ``F_N``.
+    '''
+    @cached_property
+    def _get_F_V_dul(self):
+        cp = self.cp
+        a_du = get_Fa_area_du(cp.Na_deta, self.Fa_tangents)
+        return get_F_V_du(cp.eta_w, cp.Na, self.Fa_r3, self.Fa_area, a_du)
+
+    V_du = Property(depends_on=BATCH_INPUT)
+    r'''Gradients of the total potential energy ``(n_batch, n_dofs)``.
+    '''
+    @cached_property
+    def _get_V_du(self):
+        cp = self.cp
+        n_dofs = cp.n_N * cp.n_D
+        dof_map = (cp.n_D * cp.F_N[:, :, np.newaxis] +
+                   np.arange(cp.n_D)[np.newaxis, np.newaxis, :])
+        batch_map = (np.arange(self.n_batch)[:, np.newaxis, np.newaxis,
+                                             np.newaxis] * n_dofs + dof_map)
+        V_du = np.bincount(batch_map.flatten(),
+                           weights=self.F_V_dul.flatten(),
+                           minlength=self.n_batch * n_dofs)
+        return V_du.reshape(self.n_batch, n_dofs)
+
+
+class CreasePatternTrialState(object):
+    r'''Single state of a crease pattern evaluated for a trial vector.
+
+    The compiled components of an evaluation plan obtain the operators
+    of the crease pattern for the trial vector :math:`U` of the length
+    ``n_dofs`` from a batch of one state. The batch is updated only
+    if the trial vector changes so that the operators are shared by
+    the value and the derivatives evaluated for the same vector.
+    '''
+
+    def __init__(self, cp):
+        self.n_D = cp.n_D
+        self.batch = CreasePatternBatch(cp=cp)
+        self.U = None
+
+    def get_batch(self, U):
+        '''Return the batch with the state given by the trial vector U.
+        '''
+        if self.U is None or not np.array_equal(self.U, U):
+            self.U = np.array(U, dtype='float_')
+            self.batch.u_t = self.U.reshape(1, -1, self.n_D)
+        return self.batch
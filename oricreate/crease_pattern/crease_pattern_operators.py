@@ -12,6 +12,7 @@
 #
 # Created on Jan 29, 2015 by: rch
 
+import scipy.sparse as sp
 from traits.api import \
     HasStrictTraits, Float, \
     Property, cached_property, \
@@ -21,10 +22,222 @@ import numpy as np
 from oricreate.util import \
     get_theta, get_theta_du
 from oricreate.util.einsum_utils import \
-    DELTA, EPS
+    DELTA
+from oricreate.util.operator_kernels import \
+    contract, cross, cross_matrix, dot
 
 
 INPUT = '+cp_input'
+TOPOLOGY = '+cp_topology'
+
+
+def get_dul_sparse(X_dul, X_N, n_N):
+    r'''Scatter the element-local derivatives ``X_dul`` of the shape
+    ``(n_E, ..., n_l, n_D)`` with respect to the ``n_l`` nodes
+    of each element given by the node map ``X_N`` of the shape
+    ``(n_E, n_l)`` into a sparse matrix ``(n_E * n_C, n_N * n_D)``
+    in the CSR format, with ``n_C`` denoting the number of components
+    of the differentiated quantity per element.
+    '''
+    n_E = X_dul.shape[0]
+    n_l, n_D = X_dul.shape[-2:]
+    X_dul = X_dul.reshape(n_E, -1, n_l, n_D)
+    n_C = X_dul.shape[1]
+    rows = np.arange(n_E * n_C).reshape(n_E, n_C, 1, 1)
+    cols = (X_N[:, np.newaxis, :, np.newaxis] * n_D +
+            np.arange(n_D)[np.newaxis, np.newaxis, np.newaxis, :])
+    rows, cols, values = np.broadcast_arrays(rows, cols, X_dul)
+    return sp.csr_matrix((values.flatten(),
+                          (rows.flatten(), cols.flatten())),
+                         shape=(n_E * n_C, n_N * n_D))
+
+
+def get_psi(l, n):
+    r'''Get the dihedral angles for the unit line vectors l ``(..., n_D)``
+    and the unit normals n ``(..., 2, n_D)`` of the adjacent facets.
+    The sine and cosine are the components of the second normal
+    in the basis :math:`(l, n_0, l \times n_0)` of the first facet.
+    '''
+    n0, n1 = n[..., 0, :], n[..., 1, :]
+    n1_cos = dot(n0, n1)
+    n1_sin = dot(cross(l, n0), n1)
+    psi = np.arcsin(n1_sin)
+    oa = n1_cos < 0.0
+    psi[oa] = np.sign(n1_sin[oa]) * np.pi - psi[oa]
+    return psi
+
+
+def get_psi_dul(vl, vl_dul, nl, nl_dul, F_psi_idx):
+    r'''Get the derivatives of the dihedral angles ``(..., n_iL, 4, n_D)``
+    with respect to the nodes of the four-node stencil.
+
+    The line vectors vl ``(..., n_iL, n_D)`` and the normals nl
+    ``(..., n_iL, 2, n_D)`` of the adjacent facets are supplied with
+    their derivatives vl_dul ``(..., n_iL, n_D, 2, n_D)`` with respect
+    to the line nodes and nl_dul ``(..., n_iL, 2, n_D, 3, n_D)`` with
+    respect to the facet nodes. The positions of the facet nodes within
+    the stencil are given by F_psi_idx ``(n_iL, 2, 3)``.
+
+    With the unit line vector :math:`\hat{v}` and the unit normals
+    :math:`\hat{n}_0, \hat{n}_1` the sine of the dihedral angle is given
+    by the triple product :math:`\hat{n}_1 \cdot (\hat{v} \times \hat{n}_0)`.
+    Its derivatives with respect to each of the three vectors :math:`x`
+    are obtained by contracting the derivatives :math:`x_{,u}` with the
+    weight vectors
+
+    .. math::
+        w_x = \frac{\rho}{|x|} (I - \hat{x} \otimes \hat{x}) \, c_x, \quad
+        c_v = \hat{n}_0 \times \hat{n}_1, \;
+        c_{n_0} = \hat{n}_1 \times \hat{v}, \;
+        c_{n_1} = \hat{v} \times \hat{n}_0
+
+    with :math:`\rho = 1 / \sqrt{1 - \sin^2 \psi}`.
+    '''
+    # stack the line vector and the two normals ``(..., n_iL, 3, n_D)``
+    x = np.concatenate([vl[..., np.newaxis, :], nl], axis=-2)
+    norm_x = np.sqrt(dot(x, x))
+    unit_x = x / norm_x[..., np.newaxis]
+    unit_vl, unit_nl0, unit_nl1 = (unit_x[..., 0, :], unit_x[..., 1, :],
+                                   unit_x[..., 2, :])
+
+    # weight vectors given by the cyclic cross products
+    w = np.empty_like(x)
+    cross(unit_nl0, unit_nl1, out=w[..., 0, :])
+    cross(unit_nl1, unit_vl, out=w[..., 1, :])
+    cross(unit_vl, unit_nl0, out=w[..., 2, :])
+    n1_cos = dot(unit_nl0, unit_nl1)
+    n1_sin = dot(w[..., 2, :], unit_nl1)
+
+    # project the weights on the plane orthogonal to the vectors
+    # to account for the normalization
+    w -= unit_x * dot(unit_x, w)[..., np.newaxis]
+    rho = 1 / np.sqrt((1 - n1_sin**2))
+    w *= (rho[..., np.newaxis] / norm_x)[..., np.newaxis]
+
+    return _assemble_psi_dul(vl_dul, nl_dul, w, F_psi_idx, n1_cos)
+
+
+def _assemble_psi_dul(vl_dul, nl_dul, w, F_psi_idx, n1_cos):
+    r'''Assemble the contributions of the line and of both facets
+    weighted by the vectors w ``(..., n_iL, 3, n_D)`` within the four-node
+    stencil of the interior line. A vanishing vl_dul is given as None.
+    '''
+    n_iL, n_D = w.shape[-3], w.shape[-1]
+    psi_dul = np.zeros(w.shape[:-2] + (4, n_D), dtype='float_')
+    if vl_dul is not None:
+        psi_dul[..., :2, :] = contract('...jNd,...j->...Nd',
+                                       vl_dul, w[..., 0, :])
+    iL_idx = np.arange(n_iL)[:, np.newaxis]
+    for f in range(2):
+        psi_dul[..., iL_idx, F_psi_idx[:, f, :], :] += contract(
+            '...jNd,...j->...Nd', nl_dul[..., f, :, :, :], w[..., f + 1, :])
+    # the derivative changes its sign for obtuse angles
+    psi_dul *= np.where(n1_cos < 0.0, -1.0, 1.0)[..., np.newaxis, np.newaxis]
+    return psi_dul
+
+
+def get_psi_ddul(vl, vl_dul, nl, nl_dul, F_psi_idx, d_vl, d_nl, d_nl_dul):
+    r'''Get the directional derivatives of the derivatives
+    of the dihedral angles ``(..., n_iL, 4, n_D)`` delivered by
+    ``get_psi_dul``, i.e. the products of the hessians
+    :math:`\psi_{,\bm{u}\bm{u}} \, \bm{p}` within the four-node stencil.
+
+    The increment :math:`\bm{p}` of the displacements is given by the
+    increments of the line vectors d_vl ``(..., n_iL, n_D)``, of the
+    normals d_nl ``(..., n_iL, 2, n_D)`` and of their derivatives
+    d_nl_dul ``(..., n_iL, 2, n_D, 3, n_D)``. The derivatives of the line
+    vectors vl_dul are constant. The weight vectors :math:`w_x` of
+    ``get_psi_dul`` are differentiated in closed form using
+
+    .. math::
+        \mathrm{d}|x| = \hat{x} \cdot \mathrm{d}x, \quad
+        \mathrm{d}\hat{x} = \frac{1}{|x|}
+        (\mathrm{d}x - \hat{x} \, \mathrm{d}|x|), \quad
+        \mathrm{d}\rho = \rho^3 \sin \psi \, \mathrm{d}(\sin \psi)
+
+    and the product rule for the cross products :math:`c_x`.
+    '''
+    x = np.concatenate([vl[..., np.newaxis, :], nl], axis=-2)
+    d_x = np.concatenate([d_vl[..., np.newaxis, :], d_nl], axis=-2)
+    norm_x = np.sqrt(dot(x, x))
+    unit_x = x / norm_x[..., np.newaxis]
+    d_norm_x = dot(unit_x, d_x)
+    d_unit_x = (d_x - unit_x * d_norm_x[..., np.newaxis]) / \
+        norm_x[..., np.newaxis]
+
+    # weight vectors given by the cyclic cross products
+    # and their increments
+    w = np.empty_like(x)
+    d_w = np.empty_like(x)
+    for k, (i, j) in enumerate([(1, 2), (2, 0), (0, 1)]):
+        cross(unit_x[..., i, :], unit_x[..., j, :], out=w[..., k, :])
+        d_w[..., k, :] = (cross(d_unit_x[..., i, :], unit_x[..., j, :]) +
+                          cross(unit_x[..., i, :], d_unit_x[..., j, :]))
+    n1_cos = dot(unit_x[..., 1, :], unit_x[..., 2, :])
+    n1_sin = dot(w[..., 2, :], unit_x[..., 2, :])
+    d_n1_sin = (dot(d_w[..., 2, :], unit_x[..., 2, :]) +
+                dot(w[..., 2, :], d_unit_x[..., 2, :]))
+
+    # project the weights on the plane orthogonal to the vectors
+    uw = dot(unit_x, w)
+    d_uw = dot(d_unit_x, w) + dot(unit_x, d_w)
+    d_w -= (d_unit_x * uw[..., np.newaxis] +
+            unit_x * d_uw[..., np.newaxis])
+    w -= unit_x * uw[..., np.newaxis]
+    rho = 1 / np.sqrt((1 - n1_sin**2))
+    d_rho = rho**3 * n1_sin * d_n1_sin
+    c = rho[..., np.newaxis] / norm_x
+    d_c = (d_rho[..., np.newaxis] - c * d_norm_x) / norm_x
+    d_w *= c[..., np.newaxis]
+    d_w += w * d_c[..., np.newaxis]
+    w *= c[..., np.newaxis]
+
+    return (_assemble_psi_dul(vl_dul, nl_dul, d_w, F_psi_idx, n1_cos) +
+            _assemble_psi_dul(None, d_nl_dul, w, F_psi_idx, n1_cos))
+
+
+def get_Fa_tangents(Na_deta, x_F):
+    r'''Get the tangent vectors ``(2, ..., n_F, n_a, n_D)`` in the
+    integration points of the facets with the node coordinates
+    x_F ``(..., n_F, 3, n_D)``.
+    '''
+    return contract('ajK,...IKi->j...Iai', Na_deta, x_F)
+
+
+def get_Fa_normals_du(Na_deta, r_deta):
+    r'''Get the derivatives of the normals :math:`\bm{n} = \bm{a} \times
+    \bm{b}` in the integration points ``(..., n_F, n_a, n_D, 3, n_D)``
+    with respect to the facet nodes for the tangent vectors r_deta.
+    '''
+    n_dr = np.empty(r_deta.shape[1:-1] + (2, 3, 3), dtype='float_')
+    cross_matrix(-r_deta[1], out=n_dr[..., 0, :, :])
+    cross_matrix(r_deta[0], out=n_dr[..., 1, :, :])
+    return contract('ajJ,...Iajid->...IaiJd', Na_deta, n_dr)
+
+
+def get_Fa_area_du(Na_deta, r_deta):
+    r'''Get the derivatives of the area :math:`|\bm{a} \times \bm{b}|`
+    in the integration points ``(..., n_F, n_a, 3, n_D)`` with respect
+    to the facet nodes for the tangent vectors r_deta.
+    '''
+    n = cross(r_deta[0], r_deta[1])
+    n_hat = n / np.sqrt(dot(n, n))[..., np.newaxis]
+    a_dr = np.empty(r_deta.shape[1:-1] + (2, 3), dtype='float_')
+    cross(r_deta[1], n_hat, out=a_dr[..., 0, :])
+    cross(n_hat, r_deta[0], out=a_dr[..., 1, :])
+    return contract('ajJ,...Iajd->...IaJd', Na_deta, a_dr)
+
+
+def get_F_V_du(eta_w, Na, r3, a, a_du):
+    r'''Get the derivatives of the potential energy of gravity of the
+    facets ``(..., n_F, 3, n_D)`` with respect to the facet nodes for
+    the heights r3 and the areas a in the integration points
+    and the derivatives of the areas a_du.
+    '''
+    F_V_du = contract('a,...Ia,...IaJj->...IJj', eta_w, r3, a_du)
+    # the height r_3 depends on the vertical displacements only
+    F_V_du[..., 2] += contract('a,...Ia,aJ->...IJ', eta_w, a, Na)
+    return F_V_du
 
 
 class CreaseNodeOperators(HasStrictTraits):
@@ -40,18 +253,56 @@ class CreaseNodeOperators(HasStrictTraits):
     '''
 
     def _get_iN_theta(self):
-        NN_theta = self.NN_theta
-        return [NN_theta[n, neighbors[:-1]]
-                for n, neighbors in zip(self.iN, self.iN_nbr)]
+        return np.split(self.iN_H_theta, self.H.iN_ptr[1:-1])
 
     iN_theta_du = Property
     r'''Assemble the derivatives of sector angles around a node :math:`i`
+    given as a list of sparse matrices ``(n_nbr, n_dofs)``.
     '''
 
     def _get_iN_theta_du(self):
-        NN_theta_du = self.NN_theta_du
-        return [NN_theta_du[n, neighbors[:-1], :, :]
-                for n, neighbors in zip(self.iN, self.iN_nbr)]
+        iN_H_theta_du = self.iN_H_theta_du
+        iN_ptr = self.H.iN_ptr
+        return [iN_H_theta_du[i0:i1]
+                for i0, i1 in zip(iN_ptr[:-1], iN_ptr[1:])]
+
+    iN_H_theta = Property
+    r'''Sector angles of the vertex stars of interior nodes ``(n_iH,)``
+    in the compressed format of the outgoing half-edges ``H.iN_H``.
+    The sector angle of a half-edge is the angle within its facet
+    at its origin node. The angles around the interior node ``iN[j]``
+    are given by the slice ``iN_H_theta[iN_ptr[j]:iN_ptr[j+1]]``.
+    '''
+
+    def _get_iN_H_theta(self):
+        return self.F_theta.flatten()[self.H.iN_H]
+
+    iN_H_theta_du = Property
+    r'''Derivatives of the sector angles of the vertex stars aligned
+    with ``iN_H_theta`` as a sparse matrix ``(n_iH, n_dofs)``.
+    '''
+
+    def _get_iN_H_theta_du(self):
+        return get_dul_sparse(self.iN_H_theta_dul, self.iN_H_N, self.n_N)
+
+    iN_H_theta_dul = Property
+    r'''Derivatives of the sector angles of the vertex stars
+    ``(n_iH, 3, n_D)`` with respect to the displacements of the nodes
+    of the facet of each half-edge given by the node map ``iN_H_N``.
+    '''
+
+    def _get_iN_H_theta_dul(self):
+        F_theta_dul = self.F_theta_dul
+        return F_theta_dul.reshape((-1,) + F_theta_dul.shape[2:])[self.H.iN_H]
+
+    iN_H_N = Property(depends_on=TOPOLOGY)
+    r'''Vertex-star node map ``(n_iH, 3)`` with the nodes of the facet
+    attached to each outgoing half-edge in ``H.iN_H``.
+    '''
+    @cached_property
+    def _get_iN_H_N(self):
+        H = self.H
+        return self.F_N[H.H_F[H.iN_H]]
 
     NN_theta = Property
     r'''Matrix of angles ``[n_L,n_L]`` containing the values of sector angle
@@ -69,25 +320,12 @@ class CreaseNodeOperators(HasStrictTraits):
     '''
 
     def _get_NN_theta(self):
-        NN_theta = np.zeros_like(self.NN_L, dtype='float_')
+        NN_theta = np.zeros((self.n_N, self.n_N), dtype='float_')
         F_theta = self.F_theta
         NN_theta[self.F_N[:, (0, 1, 2)], self.F_N[:, (1, 2, 0)]] = \
             F_theta[:, (0, 1, 2)]
         return NN_theta
 
-    NN_theta_du = Property
-    r'''Array of derivatives ``[n_L,n_L,n_dofs]`` of an angle between
-    two lines of a facet.
-    '''
-
-    def _get_NN_theta_du(self):
-        NN_theta_du = np.zeros((self.n_N, self.n_N, self.n_N, self.n_D),
-                               dtype='float_')
-        F_theta_du = self.F_theta_du
-        NN_theta_du[self.F_N[:, (0, 1, 2)], self.F_N[:, (1, 2, 0)], ...] = \
-            F_theta_du[:, (0, 1, 2), ...]
-        return NN_theta_du
-
 
 class CreaseLineOperators(HasStrictTraits):
 
@@ -97,7 +335,7 @@ class CreaseLineOperators(HasStrictTraits):
     # =========================================================================
     # Property operators for initial configuration
     # =========================================================================
-    L_vectors_0 = Property(Array, depends_on=INPUT)
+    L_vectors_0 = Property(Array, depends_on=TOPOLOGY)
     r'''Vectors of the crease lines.
 
     ... math::
@@ -131,7 +369,7 @@ class CreaseLineOperators(HasStrictTraits):
         v = self.L_vectors
         return np.sqrt(np.sum(v ** 2, axis=1))
 
-    L_vectors_du = Property(Array, depends_on=INPUT)
+    L_vectors_du = Property(depends_on=TOPOLOGY)
     r'''Get the derivatives of the line vectors
 
     .. math::
@@ -142,21 +380,19 @@ class CreaseLineOperators(HasStrictTraits):
        v_{l,d,I,e} = 0 \; \mathrm{where} \; I \neq \mathrm{lnode}(l,[0,1])
 
     with the indices :math:`l,d,I,e` representing the line, component,
-    node and coordinate, respectively.
+    node and coordinate, respectively. The derivatives are assembled
+    from ``L_vectors_dul`` into a sparse matrix ``(n_L * n_D, n_dofs)``
+    with the row ``l * n_D + d``.
     '''
     @cached_property
     def _get_L_vectors_du(self):
-        L_vectors_du = np.zeros((self.n_L, self.n_D, self.n_N, self.n_D),
-                                dtype='float_')
-        L_idx = np.arange(self.n_L)
-        L_N0_idx = self.L[L_idx, 0]
-        L_N1_idx = self.L[L_idx, 1]
-        L_vectors_du[L_idx, :, L_N0_idx, :] = -DELTA
-        L_vectors_du[L_idx, :, L_N1_idx, :] = DELTA
-        return L_vectors_du
-
-    L_vectors_dul = Property(Array, depends_on=INPUT)
+        return get_dul_sparse(self.L_vectors_dul, self.L, self.n_N)
 
+    L_vectors_dul = Property(Array, depends_on=TOPOLOGY)
+    r'''Get the derivatives of the line vectors ``(n_L, n_D, 2, n_D)``
+    with respect to the displacements of the two nodes of a line
+    given by the node map ``L``.
+    '''
     @cached_property
     def _get_L_vectors_dul(self):
         L_vectors_du = np.zeros((self.n_L, self.n_D, 2, self.n_D),
@@ -166,19 +402,12 @@ class CreaseLineOperators(HasStrictTraits):
         L_vectors_du[L_idx, :, 1, :] = DELTA
         return L_vectors_du
 
-    iL_within_F0 = Property(Array, depends_on=INPUT)
+    iL_within_F0 = Property(Array, depends_on=TOPOLOGY)
     r'''Index of a crease line within the first adjacent facet
     '''
     @cached_property
     def _get_iL_within_F0(self):
-        iL_F0 = self.iL_F[:, 0]
-        L_of_F0_of_iL = self.F_L[iL_F0, :]
-        iL = self.iL
-        #iL_within_F0 = np.where(iL[:, np.newaxis] == L_of_F0_of_iL)
-        L_within_F0, ell_within_F0 = np.where(
-            iL[:, np.newaxis] == L_of_F0_of_iL)
-        F0_iL = (iL_F0[L_within_F0], ell_within_F0)
-        return F0_iL
+        return self.H.iL_within_F0
 
     iL_vectors = Property(Array, depends_on=INPUT)
     r'''Get the line vector of an interior line oriented in the
@@ -189,26 +418,28 @@ class CreaseLineOperators(HasStrictTraits):
         F_L_vectors = self.F_L_vectors
         return F_L_vectors[self.iL_within_F0]
 
-    iL_vectors_du = Property(Array, depends_on=INPUT)
-    r'''Get the line vector of an interior line oriented in the
-    sense of counter-clockwise direction of its first adjacent facet.
+    iL_vectors_du = Property(depends_on=TOPOLOGY)
+    r'''Get the derivatives of the line vector of an interior line
+    oriented in the sense of counter-clockwise direction of its first
+    adjacent facet as a sparse matrix ``(n_iL * n_D, n_dofs)``.
     '''
     @cached_property
     def _get_iL_vectors_du(self):
-        F_L_vectors_du = self.F_L_vectors_du
-        return F_L_vectors_du[self.iL_within_F0]
+        return get_dul_sparse(self.iL_vectors_dul,
+                              self.F_L_N[self.iL_within_F0], self.n_N)
 
     iL_vectors_dul = Property(Array, depends_on=INPUT)
     r'''Get the derivatives with respect to the node coordinates 
     of a  line vector of an interior line oriented in the
     sense of counter-clockwise direction of its first adjacent facet.
+    The nodes are given by the node map ``F_L_N[iL_within_F0]``.
     '''
     @cached_property
     def _get_iL_vectors_dul(self):
         F_L_vectors_dul = self.F_L_vectors_dul
         return F_L_vectors_dul[self.iL_within_F0]
 
-    iL_vectors_0 = Property(Array, depends_on=INPUT)
+    iL_vectors_0 = Property(Array, depends_on=TOPOLOGY)
     r'''Get the line vector of an interior line oriented in the
     sense of counter-clockwise direction of its first adjacent facet.
     '''
@@ -228,7 +459,7 @@ class CreaseLineOperators(HasStrictTraits):
                                            iL_vectors, iL_vectors))
         return iL_vectors / mag_iL_vectors[:, np.newaxis]
 
-    norm_iL_vectors_0 = Property(Array, depends_on=INPUT)
+    norm_iL_vectors_0 = Property(Array, depends_on=TOPOLOGY)
     r'''Get the normed line vector of an interior line oriented in the
     sense of counter-clockwise direction of its first adjacent facet.
     '''
@@ -255,7 +486,7 @@ class CreaseLineOperators(HasStrictTraits):
         F_normals_du = self.F_normals_du
         return F_normals_du[self.iL_F]
 
-    iL_F_normals_0 = Property(Array, depends_on=INPUT)
+    iL_F_normals_0 = Property(Array, depends_on=TOPOLOGY)
     r'''Get normals of facets adjacent to an interior line.
     '''
     @cached_property
@@ -271,7 +502,7 @@ class CreaseLineOperators(HasStrictTraits):
         norm_F_normals = self.norm_F_normals
         return norm_F_normals[self.iL_F]
 
-    norm_iL_F_normals_0 = Property(Array, depends_on=INPUT)
+    norm_iL_F_normals_0 = Property(Array, depends_on=TOPOLOGY)
     r'''Get normed normals of facets adjacent to an interior line.
     '''
     @cached_property
@@ -286,215 +517,81 @@ class CreaseLineOperators(HasStrictTraits):
     '''
     @cached_property
     def _get_iL_psi(self):
-        l = self.norm_iL_vectors
-        n = self.norm_iL_F_normals
-        n0, n1 = np.einsum('ijk->jik', n)
-        p0 = np.einsum('...i,...j,...kij->...k', l, n0, EPS)
-        T = np.concatenate([l[:, np.newaxis, :],
-                            n0[:, np.newaxis, :],
-                            p0[:, np.newaxis, :]], axis=1)
-        n1_ = np.einsum('...ij,...j->...i', T, n1)
-        n1_1, n1_2 = n1_[:, 1:].T
-        psi = np.arcsin(n1_2)
-        oa_idx = np.where(n1_1 < 0.0)[0]
-        shifted_psi = np.sign(n1_2[oa_idx]) * np.pi - 2.0 * psi[oa_idx]
-        psi[oa_idx] += shifted_psi
-        return psi
-
-    iL_psi_0 = Property(Array, depends_on=INPUT)
+        return get_psi(self.norm_iL_vectors, self.norm_iL_F_normals)
+
+    iL_psi_0 = Property(Array, depends_on=TOPOLOGY)
     r'''Calculate the dihedral angle for the intermediate configuration.
     '''
     @cached_property
     def _get_iL_psi_0(self):
-        l = self.norm_iL_vectors_0
-        n = self.norm_iL_F_normals_0
-        n0, n1 = np.einsum('ijk->jik', n)
-        p0 = np.einsum('...i,...j,...kij->...k', l, n0, EPS)
-        T = np.concatenate([l[:, np.newaxis, :],
-                            n0[:, np.newaxis, :],
-                            p0[:, np.newaxis, :]], axis=1)
-        n1_ = np.einsum('...ij,...j->...i', T, n1)
-        n1_cos, n1_sin = n1_[:, 1:].T
-        oa_idx = np.where(n1_cos < 0.0)[0]
-        psi = np.arcsin(n1_sin)
-        shifted_psi = np.sign(n1_sin[oa_idx]) * np.pi - 2.0 * psi[oa_idx]
-        psi[oa_idx] += shifted_psi
-        return psi
-
-    iL_psi_du = Property(Array, depends_on=INPUT)
-    r'''Calculate the derivatives of the dihedral angle 
-    for the intermediate configuration.
+        return get_psi(self.norm_iL_vectors_0, self.norm_iL_F_normals_0)
+
+    iL_psi_dul = Property(Array, depends_on=INPUT)
+    r'''Calculate the derivatives of the dihedral angle
+    for the intermediate configuration with respect to the displacements
+    of the four nodes ``(n_iL, 4, n_D)`` given by the stencil ``iL_psi_N``
+    (see ``get_psi_dul``).
     '''
     @cached_property
-    def _get_iL_psi_du(self, t=0):
-        '''Get the derivatives with respect to individual displacements.
-        '''
-        vl = self.iL_vectors
-        nl0, nl1 = np.einsum('fi...->if...', self.iL_F_normals)
+    def _get_iL_psi_dul(self):
+        psi_dul = get_psi_dul(self.iL_vectors, self.iL_vectors_dul,
+                              self.iL_F_normals, self.iL_F_normals_du,
+                              self.iL_F_psi_idx)
         if self.debug_level > 0:
-            print('vl', vl.shape)
-            print(vl)
-            print('nl0', nl0.shape)
-            print(nl0)
-            print('nl1', nl1.shape)
-            print(nl1)
-
-        # construct the unit orthonormal basis
-        norm_vl = np.sqrt(np.einsum('...i,...i->...', vl, vl))
-        norm_nl0 = np.sqrt(np.einsum('...i,...i->...', nl0, nl0))
-        norm_nl1 = np.sqrt(np.einsum('...i,...i->...', nl1, nl1))
-        unit_vl = vl / norm_vl[:, np.newaxis]
-        unit_nl0 = nl0 / norm_nl0[:, np.newaxis]
-        unit_nl1 = nl1 / norm_nl1[:, np.newaxis]
-        if self.debug_level > 0:
-            print('unit_vl', unit_vl.shape)
-            print(unit_vl)
-            print('unit_nl0', unit_nl0.shape)
-            print(unit_nl0)
-            print('unit_nl1', unit_nl1.shape)
-            print(unit_nl1)
-
-        # construct transformation matrix
-        Tl0 = np.einsum('ij...->ji...',
-                        np.array(
-                            [unit_vl,
-                             unit_nl0,
-                             np.einsum('...j,...k,...ijk->...i',
-                                       unit_vl, unit_nl0, EPS)]
-                        ))
-        if self.debug_level > 0:
-            print('Tl0', Tl0.shape)
-            print(Tl0)
-
-        unit_nl01 = np.einsum('...ij,...j->...i', Tl0, unit_nl1)
-        if self.debug_level > 0:
-            print('unit_nl01[:,2]', unit_nl01[:, 2])
-            print(unit_nl01[:, 2])
-
-        n1_cos, n1_sin = unit_nl01[:, 1:].T
-        oa_idx = np.where(n1_cos < 0.0)[0]
-
-        psi = np.arcsin(unit_nl01[:, 2])
-        if self.debug_level > 0:
-            print('psi', psi)
-
-        vl_dul = self.iL_vectors_dul
-        nl0_dul0, nl1_dul1 = np.einsum('fi...->if...', self.iL_F_normals_du)
-        if self.debug_level > 0:
-            print(cp.iL_N.shape)
-            print('vl_dul', vl_dul.shape)
-            print(vl_dul)
-            print('nl0_dul0', nl0_dul0.shape)
-            print(nl0_dul0)
-            print('nl1_dul1', nl1_dul1.shape)
-            print(nl1_dul1)
-
-        unit_nl0_dul0 = 1 / norm_nl0[:, np.newaxis, np.newaxis, np.newaxis] * (
-            nl0_dul0 -
-            np.einsum('...j,...i,...iNd->...jNd', unit_nl0, unit_nl0, nl0_dul0)
-        )
-        unit_nl1_dul1 = 1 / norm_nl1[:, np.newaxis, np.newaxis, np.newaxis] * (
-            nl1_dul1 -
-            np.einsum('...j,...i,...iNd->...jNd', unit_nl1, unit_nl1, nl1_dul1)
-        )
-        unit_vl_dul = 1 / norm_vl[:, np.newaxis, np.newaxis, np.newaxis] * (
-            vl_dul -
-            np.einsum('...j,...i,...iNd->...jNd', unit_vl, unit_vl, vl_dul)
-        )
-        if self.debug_level > 0:
-            print('unit_nl0_dul0', unit_nl0_dul0.shape)
-            print(unit_nl0_dul0)
-            print('unit_nl1_dul1', unit_nl1_dul1.shape)
-            print(unit_nl1_dul1)
-            print('unit_vl_dul', unit_vl_dul.shape)
-            print(unit_vl_dul)
-
-        Tl0_dul0 = np.einsum('ij...->ji...',
-                             np.array([np.zeros_like(unit_nl0_dul0),
-                                       unit_nl0_dul0,
-                                       np.einsum(
-                                      '...j,...kNd,...ijk->...iNd',
-                                      unit_vl, unit_nl0_dul0, EPS)
-                             ]
-                             ))
-
-        if self.debug_level > 0:
-            print('Tl0_dul0', Tl0_dul0.shape)
-            print(Tl0_dul0)
-
-        Tl0_dul = np.einsum('ij...->ji...',
-                            np.array([unit_vl_dul,
-                                      np.zeros_like(unit_vl_dul),
-                                      np.einsum(
-                                          '...jNd,...k,...ijk->...iNd',
-                                          unit_vl_dul, unit_nl0, EPS)
-                                      ]
-                                     )
-                            )
-        if self.debug_level > 0:
-            print('Tl0_dul0', Tl0_dul.shape)
-            print(Tl0_dul)
-
-        rho = 1 / np.sqrt((1 - unit_nl01[:, 2]**2))
-        if self.debug_level > 0:
-            print('rho', unit_nl01[:, 2])
-
-        unit_nl01_dul = np.einsum(
-            '...,...j,...ijNd->...iNd',
-            rho, unit_nl1, Tl0_dul)[:, 2, ...]
-        unit_nl01_dul0 = np.einsum(
-            '...,...j,...ijNd->...iNd',
-            rho, unit_nl1, Tl0_dul0)[:, 2, ...]
-        unit_nl01_dul1 = np.einsum(
-            '...,...jNd,...ij->...iNd',
-            rho, unit_nl1_dul1, Tl0)[:, 2, ...]
-        if self.debug_level > 0:
-            print('unit_nl01_dul', unit_nl01_dul.shape)
-            print(unit_nl01_dul)
-            print('unit_nl01_dul0', unit_nl01_dul0.shape)
-            print(unit_nl01_dul0)
-            print('unit_nl01_dul1', unit_nl01_dul1.shape)
-            print(unit_nl01_dul1)
-
-        # get the map of facet nodes attached to interior lines
-        iL0_N_map = self.F_N[self.iL_F[:, 0]].reshape(self.n_iL, -1)
-        iL1_N_map = self.F_N[self.iL_F[:, 1]].reshape(self.n_iL, -1)
-        iL_N_map = self.F_L_N[self.iL_within_F0]
-
-        # enumerate the interior lines and broadcast it N and D into dimensions
-        iL_map = np.arange(self.n_iL)[:, np.newaxis, np.newaxis]
-        # broadcast the facet node map into D dimension
-        l0_map = iL0_N_map[:, :, np.newaxis]
-        l1_map = iL1_N_map[:, :, np.newaxis]
-        l_map = iL_N_map[:, :, np.newaxis]
-        # broadcast the spatial dimension map into iL and N dimensions
-        D_map = np.arange(3)[np.newaxis, np.newaxis, :]
-        # allocate the gamma derivatives of iL with respect to N and D
-        # dimensions
-        psi_du = np.zeros((self.n_iL, self.n_N, self.n_D), dtype='float_')
-        # add the contributions gamma_du from the left and right facet
-        # Note: this cannot be done in a single step since the incremental
-        # assembly is not possible within a single index expression.
-        psi_du[iL_map, l_map, D_map] += unit_nl01_dul
-        if self.debug_level > 0:
-            print('l_map', l_map.shape)
-            print(l_map)
-            print('psi_du', psi_du.shape)
-            print(psi_du)
-        psi_du[iL_map, l0_map, D_map] += unit_nl01_dul0
-        if self.debug_level > 0:
-            print('l0_map', l0_map.shape)
-            print(l0_map)
-            print('psi_du', psi_du.shape)
-            print(psi_du)
-        psi_du[iL_map, l1_map, D_map] += unit_nl01_dul1
-        if self.debug_level > 0:
-            print('l1_map', l1_map.shape)
-            print(l1_map)
-            print('psi_du', psi_du.shape)
-            print(psi_du)
-        psi_du[oa_idx, ...] *= -1.0
-        return psi_du
+            print('psi_dul', psi_dul.shape)
+            print(psi_dul)
+        return psi_dul
+
+    def get_iL_psi_ddul(self, p):
+        r'''Get the products of the hessians of the dihedral angles
+        with the vector p ``(n_iL, 4, n_D)`` with respect to the nodes
+        of the stencil ``iL_psi_N`` (see ``get_psi_ddul``).
+        '''
+        p_F = p.reshape(-1, self.n_D)[self.F_N]
+        r_deta = get_Fa_tangents(self.Na_deta, p_F)
+        d_F_normals_du = np.sum(get_Fa_normals_du(self.Na_deta, r_deta),
+                                axis=1)
+        d_F_normals = contract('FjNd,FNd->Fj', self.F_normals_du, p_F)
+        p_L = p.reshape(-1, self.n_D)[self.iL_psi_N[:, :2]]
+        d_iL_vectors = contract('ljNd,lNd->lj', self.iL_vectors_dul, p_L)
+        return get_psi_ddul(self.iL_vectors, self.iL_vectors_dul,
+                            self.iL_F_normals, self.iL_F_normals_du,
+                            self.iL_F_psi_idx, d_iL_vectors,
+                            d_F_normals[self.iL_F], d_F_normals_du[self.iL_F])
+
+    iL_psi_N = Property(Array, depends_on=TOPOLOGY)
+    r'''Stencil of the dihedral angle of an interior line ``(n_iL, 4)``.
+    It contains the start and end node of the line oriented
+    in the sense of its first adjacent facet followed by the opposite
+    nodes of the first and of the second adjacent facet.
+    '''
+    @cached_property
+    def _get_iL_psi_N(self):
+        iL_F_N = self.F_N[self.iL_F]
+        l_N = self.F_L_N[self.iL_within_F0]
+        opposite = ((iL_F_N != l_N[:, np.newaxis, 0, np.newaxis]) &
+                    (iL_F_N != l_N[:, np.newaxis, 1, np.newaxis]))
+        F_o_idx = np.argmax(opposite, axis=2)
+        o_N = np.take_along_axis(iL_F_N, F_o_idx[..., np.newaxis], axis=2)
+        return np.hstack([l_N, o_N[..., 0]])
+
+    iL_F_psi_idx = Property(Array, depends_on=TOPOLOGY)
+    r'''Positions of the nodes of the two facets adjacent to an interior
+    line within its stencil ``iL_psi_N`` with the shape ``(n_iL, 2, 3)``.
+    '''
+    @cached_property
+    def _get_iL_F_psi_idx(self):
+        iL_F_N = self.F_N[self.iL_F]
+        return np.argmax(iL_F_N[..., np.newaxis] ==
+                         self.iL_psi_N[:, np.newaxis, np.newaxis, :], axis=3)
+
+    iL_psi_du = Property(depends_on=INPUT)
+    r'''Derivatives of the dihedral angles with respect to the displacements
+    as a sparse matrix ``(n_iL, n_dofs)`` in the CSR format.
+    '''
+    @cached_property
+    def _get_iL_psi_du(self):
+        return get_dul_sparse(self.iL_psi_dul, self.iL_psi_N, self.n_N)
 
 
 class CreaseFacetOperators(HasStrictTraits):
@@ -505,19 +602,15 @@ class CreaseFacetOperators(HasStrictTraits):
     # =========================================================================
     # Property operators for initial configuration
     # =========================================================================
-    F0_normals = Property(Array, depends_on='X, L, F')
+    F0_normals = Property(Array, depends_on=TOPOLOGY)
     r'''Normal facet vectors.
     '''
     @cached_property
     def _get_F0_normals(self):
-        x_F = self.x_0[self.F]
-        N_deta_ip = self.Na_deta
-        r_deta = np.einsum('ajK,IKi->Iaij', N_deta_ip, x_F)
-        Fa_normals = np.einsum('Iai,Iaj,ijk->Iak',
-                               r_deta[..., 0], r_deta[..., 1], EPS)
-        return np.sum(Fa_normals, axis=1)
+        r_deta = get_Fa_tangents(self.Na_deta, self.x_0[self.F])
+        return np.sum(cross(r_deta[0], r_deta[1]), axis=1)
 
-    sign_normals = Property(Array, depends_on='X,L,F')
+    sign_normals = Property(Array, depends_on=TOPOLOGY)
     r'''Orientation of the normal in the initial state.
     This array is used to switch the normal vectors of the faces
     to be oriented in the positive sense of the z-axis.
@@ -526,7 +619,7 @@ class CreaseFacetOperators(HasStrictTraits):
     def _get_sign_normals(self):
         return np.sign(self.F0_normals[:, 2])
 
-    F_N = Property(Array, depends_on='X,L,F')
+    F_N = Property(Array, depends_on=TOPOLOGY)
     r'''Counter-clockwise enumeration.
     '''
     @cached_property
@@ -544,7 +637,7 @@ class CreaseFacetOperators(HasStrictTraits):
         n = self.Fa_normals
         return np.sum(n, axis=1)
 
-    F_normals_0 = Property(Array, depends_on=INPUT)
+    F_normals_0 = Property(Array, depends_on=TOPOLOGY)
     r'''Get the normals of the facets.
     '''
     @cached_property
@@ -561,7 +654,7 @@ class CreaseFacetOperators(HasStrictTraits):
         mag_n = np.sqrt(np.einsum('...i,...i', n, n))
         return n / mag_n[:, np.newaxis]
 
-    norm_F_normals_0 = Property(Array, depends_on=INPUT)
+    norm_F_normals_0 = Property(Array, depends_on=TOPOLOGY)
     r'''Get the normed normals of the facets.
     '''
     @cached_property
@@ -610,18 +703,13 @@ class CreaseFacetOperators(HasStrictTraits):
         r = self.Fa_r
         a = self.Fa_area
         a_dx = self.Fa_area_du
-        r3_a_dx = np.einsum('Ia,IaJj->IaJj', r[..., 2], a_dx)
-        N_eta_ip = self.Na
-        r3_dx = np.einsum('aK,KJ,j->aJj', N_eta_ip, DELTA, DELTA[2, :])
-        a_r3_dx = np.einsum('Ia,aJj->IaJj', a, r3_dx)
-        F_V_du = np.einsum('a,IaJj->IJj', self.eta_w, (a_r3_dx + r3_a_dx))
-        return F_V_du
+        return get_F_V_du(self.eta_w, self.Na, r[..., 2], a, a_dx)
 
     # =========================================================================
     # Line vectors
     # =========================================================================
 
-    F_L_vectors_0 = Property(Array, depends_on=INPUT)
+    F_L_vectors_0 = Property(Array, depends_on=TOPOLOGY)
     r'''Get the cycled line vectors around the facet
     The cycle is closed - the first and last vector are identical.
 
@@ -651,7 +739,7 @@ class CreaseFacetOperators(HasStrictTraits):
         F_N = self.F_N  # F_N is cycled counter clockwise
         return self.x[F_N[:, (1, 2, 0)]] - self.x[F_N[:, (0, 1, 2)]]
 
-    F_L_vectors_du = Property(Array, depends_on=INPUT)
+    F_L_vectors_du = Property(depends_on=TOPOLOGY)
     r'''Get the derivatives of the line vectors around the facets.
 
     .. math::
@@ -688,16 +776,37 @@ class CreaseFacetOperators(HasStrictTraits):
         \pard{\bm{a}_3}{\bm{u}_3} = -1, \;\;\;
         \pard{\bm{a}_3}{\bm{u}_1} = 1 \\
 
+    The derivatives are assembled from ``F_L_vectors_dul`` into
+    a sparse matrix ``(n_F * 3 * n_D, n_dofs)`` with the row
+    ``(p * 3 + l) * n_D + d``.
     '''
-
+    @cached_property
     def _get_F_L_vectors_du(self):
-        return self.L_vectors_du[self.F_L]
-
-    F_L_vectors_dul = Property(Array, depends_on=INPUT)
-
+        return get_dul_sparse(self.F_L_vectors_dul.reshape(-1, self.n_D,
+                                                           2, self.n_D),
+                              self.F_L_N.reshape(-1, 2), self.n_N)
+
+    F_L_vectors_dul = Property(Array, depends_on=TOPOLOGY)
+    r'''Get the derivatives of the cycled line vectors around the facets
+    ``(n_F, 3, n_D, 2, n_D)`` with respect to the displacements of the
+    start and end node of each vector given by the node map ``F_L_N``.
+    '''
+    @cached_property
     def _get_F_L_vectors_dul(self):
         return self.L_vectors_dul[self.F_L]
 
+    F_L_vectors_duf = Property(Array, depends_on=TOPOLOGY)
+    r'''Get the derivatives of the cycled line vectors around the facets
+    ``(n_F, 3, n_D, 3, n_D)`` with respect to the displacements
+    of the three facet nodes given by the node map ``F_N``.
+    '''
+    @cached_property
+    def _get_F_L_vectors_duf(self):
+        # vector l runs from the facet node l to the facet node l+1
+        I = np.identity(3)
+        v_duf = np.einsum('lK,de->ldKe', np.roll(I, 1, axis=1) - I, DELTA)
+        return np.broadcast_to(v_duf, (self.n_F,) + v_duf.shape)
+
     norm_F_L_vectors = Property(Array, depends_on=INPUT)
     r'''Get the cycled line vectors around the facet
     The cycle is closed - the first and last vector are identical.
@@ -729,7 +838,7 @@ class CreaseFacetOperators(HasStrictTraits):
     def _get_F_L_bases(self):
         l = self.norm_F_L_vectors
         n = self.norm_F_normals
-        lxn = np.einsum('...li,...j,...kij->...lk', l, n, EPS)
+        lxn = cross(l, n[:, np.newaxis, :])
         n_ = n[:, np.newaxis, :] * np.ones((1, 3, 1), dtype='float_')
         T = np.concatenate([l[:, :, np.newaxis, :],
                             -lxn[:, :, np.newaxis, :],
@@ -757,13 +866,24 @@ class CreaseFacetOperators(HasStrictTraits):
         b = v[:, (0, 1, 2), :]
         return get_theta(a, b)
 
-    F_theta_du = Property(Array, depends_on=INPUT)
-    r'''Get the derivatives of sector angles :math:`\theta` within a facet.
+    F_theta_du = Property(depends_on=INPUT)
+    r'''Get the derivatives of sector angles :math:`\theta` within a facet
+    assembled from ``F_theta_dul`` into a sparse matrix
+    ``(n_F * 3, n_dofs)`` with the row ``p * 3 + k``.
     '''
     @cached_property
     def _get_F_theta_du(self):
+        return get_dul_sparse(self.F_theta_dul, self.F_N, self.n_N)
+
+    F_theta_dul = Property(Array, depends_on=INPUT)
+    r'''Get the derivatives of sector angles :math:`\theta` within a facet
+    ``(n_F, 3, 3, n_D)`` with respect to the displacements
+    of the facet nodes given by the node map ``F_N``.
+    '''
+    @cached_property
+    def _get_F_theta_dul(self):
         v = self.F_L_vectors
-        v_du = self.F_L_vectors_du
+        v_du = self.F_L_vectors_duf
 
         a = -v[:, (2, 0, 1), :]
         b = v[:, (0, 1, 2), :]
@@ -813,16 +933,8 @@ class CreaseFacetOperators(HasStrictTraits):
     '''
 
     def _get_Fa_normals_du(self):
-        x_F = self.x[self.F_N]
-        N_deta_ip = self.Na_deta
-        NN_delta_eps_x1 = np.einsum('aK,aL,KJ,dli,ILl->IaiJd',
-                                    N_deta_ip[:, 0, :], N_deta_ip[:, 1, :],
-                                    DELTA, EPS, x_F)
-        NN_delta_eps_x2 = np.einsum('aK,aL,LJ,kdi,IKk->IaiJd',
-                                    N_deta_ip[:, 0, :], N_deta_ip[:, 1, :],
-                                    DELTA, EPS, x_F)
-        n_du = NN_delta_eps_x1 + NN_delta_eps_x2
-        return n_du
+        r_deta = get_Fa_tangents(self.Na_deta, self.x[self.F_N])
+        return get_Fa_normals_du(self.Na_deta, r_deta)
 
     Fa_area_du = Property
     '''Get the derivatives of the facet area with respect
@@ -830,33 +942,24 @@ class CreaseFacetOperators(HasStrictTraits):
     '''
 
     def _get_Fa_area_du(self):
-        a = self.Fa_area
-        n = self.Fa_normals
-        n_du = self.Fa_normals_du
-        a_du = np.einsum('Ia,Iak,IakJd->IaJd', 1 / a, n, n_du)
-        return a_du
+        r_deta = get_Fa_tangents(self.Na_deta, self.x[self.F_N])
+        return get_Fa_area_du(self.Na_deta, r_deta)
 
     Fa_normals = Property
     '''Get normals of the facets.
     '''
 
     def _get_Fa_normals(self):
-        x_F = self.x[self.F_N]
-        N_deta_ip = self.Na_deta
-        r_deta = np.einsum('ajK,IKi->Iaij', N_deta_ip, x_F)
-        return np.einsum('Iai,Iaj,ijk->Iak',
-                         r_deta[..., 0], r_deta[..., 1], EPS)
+        r_deta = get_Fa_tangents(self.Na_deta, self.x[self.F_N])
+        return cross(r_deta[0], r_deta[1])
 
     Fa_normals_0 = Property
     '''Get normals of the facets.
     '''
 
     def _get_Fa_normals_0(self):
-        x_F = self.x_0[self.F_N]
-        N_deta_ip = self.Na_deta
-        r_deta = np.einsum('ajK,IKi->Iaij', N_deta_ip, x_F)
-        return np.einsum('Iai,Iaj,ijk->Iak',
-                         r_deta[..., 0], r_deta[..., 1], EPS)
+        r_deta = get_Fa_tangents(self.Na_deta, self.x_0[self.F_N])
+        return cross(r_deta[0], r_deta[1])
 
     Fa_area = Property
     '''Get the surface area of the facets.
@@ -906,6 +1009,56 @@ class CreaseCummulativeOperators(HasStrictTraits):
         V_du = np.bincount(dof_map.flatten(), weights=F_V_du.flatten())
         return V_du
 
+    def get_V_ddu(self, p):
+        r'''Get the product of the hessian of the potential energy
+        of gravity with the vector p.
+
+        With the facet normal :math:`\bm{n} = \bm{a} \times \bm{b}`
+        spanned by the tangent vectors :math:`\bm{a}, \bm{b}`
+        in an integration point, its area :math:`A = |\bm{n}|`
+        and the height :math:`r_3`, the product is obtained
+        from the directional derivatives along :math:`\bm{p}`
+
+        .. math::
+            \mathrm{d}A = \hat{\bm{n}} \cdot
+            (\mathrm{d}\bm{a} \times \bm{b} + \bm{a} \times \mathrm{d}\bm{b}),
+            \quad
+            \bm{q} = \frac{\mathrm{d}\bm{n} - \hat{\bm{n}} \, \mathrm{d}A}{A}
+
+        as :math:`(A \, r_3)_{,\bm{u}\bm{u}} \bm{p} =
+        r_{3,\bm{u}} \mathrm{d}A + A_{,\bm{u}} \mathrm{d}r_3 +
+        r_3 (\mathrm{d}A)_{,\bm{u}}`.
+        '''
+        F = self.F_N
+        p_F = p.reshape(-1, 3)[F]
+        x_F = self.x[F]
+        N_eta_ip = self.Na
+        N_deta_ip = self.Na_deta
+        a, b = np.einsum('ajK,IKi->jIai', N_deta_ip, x_F)
+        d_a, d_b = np.einsum('ajK,IKi->jIai', N_deta_ip, p_F)
+        r3 = np.einsum('aK,IK->Ia', N_eta_ip, x_F[..., 2])
+        d_r3 = np.einsum('aK,IK->Ia', N_eta_ip, p_F[..., 2])
+        n = np.cross(a, b)
+        A = np.sqrt(np.einsum('Iai,Iai->Ia', n, n))
+        n_hat = n / A[..., np.newaxis]
+        d_n = np.cross(d_a, b) + np.cross(a, d_b)
+        d_A = np.einsum('Iai,Iai->Ia', n_hat, d_n)
+        q = (d_n - n_hat * d_A[..., np.newaxis]) / A[..., np.newaxis]
+        # derivatives with respect to the first and second tangent vector
+        c_a = (np.cross(b, n_hat) * d_r3[..., np.newaxis] +
+               (np.cross(b, q) + np.cross(d_b, n_hat)) * r3[..., np.newaxis])
+        c_b = (np.cross(n_hat, a) * d_r3[..., np.newaxis] +
+               (np.cross(q, a) + np.cross(n_hat, d_a)) * r3[..., np.newaxis])
+        c_r3 = np.einsum('Ia,i->Iai', d_A, DELTA[2, :])
+        F_V_ddu = np.einsum('a,aK,Iai->IKi', self.eta_w, N_deta_ip[:, 0, :], c_a)
+        F_V_ddu += np.einsum('a,aK,Iai->IKi', self.eta_w,
+                             N_deta_ip[:, 1, :], c_b)
+        F_V_ddu += np.einsum('a,aK,Iai->IKi', self.eta_w, N_eta_ip, c_r3)
+        dof_map = (3 * F[:, :, np.newaxis] +
+                   np.arange(3)[np.newaxis, np.newaxis, :])
+        return np.bincount(dof_map.flatten(), weights=F_V_ddu.flatten(),
+                           minlength=self.n_dofs)
+
 
 class CreaseViewRelatedOperators(HasStrictTraits):
 
@@ -1053,9 +1206,6 @@ if __name__ == '__main__':
     print('F_theta_du')
     print([cp.F_theta_du])
     print()
-    print('NN_theta_du')
-    print(cp.NN_theta_du)
-    print()
     print('iN_theta_du')
     print(cp.iN_theta_du)
     print()
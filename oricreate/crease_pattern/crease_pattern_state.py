@@ -26,6 +26,7 @@ import numpy as np
 
 
 INPUT = '+cp_input'
+TOPOLOGY = '+cp_topology'
 
 
 class UArrayAdapter(TabularAdapter):
@@ -90,7 +91,7 @@ class CreasePatternState(CreasePattern):
     def _get_x(self):
         return self.x_0 + self.u
 
-    n_dofs = Property(depends_on=INPUT)
+    n_dofs = Property(depends_on=TOPOLOGY)
     '''Total number of displacement degrees of freedom.
     '''
     @cached_property
@@ -0,0 +1,465 @@
+# -------------------------------------------------------------------------
+#
+# Copyright (c) 2009, IMB, RWTH Aachen.
+# All rights reserved.
+#
+# This software is provided without warranty under the terms of the BSD
+# license included in simvisage/LICENSE.txt and may be redistributed only
+# under the conditions described in the aforementioned license.  The license
+# is also available online at http://www.simvisage.com/licenses/BSD.txt
+#
+# Thanks for using Simvisage open source!
+#
+# Created on Oct 18, 2026 by: rch
+
+from traits.api import \
+    HasStrictTraits, Property, cached_property, \
+    Array, Int
+
+import numpy as np
+
+
+def lookup_sorted_keys(keys, values, search):
+    '''Vectorized lookup of the ``search`` keys in the sorted
+    array ``keys`` delivering the associated ``values`` or ``-1``
+    for keys that are not contained in ``keys``.
+    '''
+    search = np.asarray(search, dtype='int_')
+    result = np.full(search.shape, -1, dtype='int_')
+    if len(keys) == 0:
+        return result[()]
+    pos = np.minimum(np.searchsorted(keys, search), len(keys) - 1)
+    found = keys[pos] == search
+    result[found] = values[pos[found]]
+    return result[()]
+
+
+class NodeLineAdjacency(HasStrictTraits):
+
+    r'''Sparse node-to-node adjacency of a crease pattern.
+
+    The adjacency is stored in the compressed sparse row (CSR) format.
+    The neighbors of a node :math:`i` are given by the slice
+    ``indices[indptr[i]:indptr[i+1]]`` with the connecting
+    lines ``lines[indptr[i]:indptr[i+1]]``.
+    Within a row, the entries are ordered by the line index.
+
+    The object can be indexed with a pair of node index arrays
+    in the same way as the dense ``(n_N,n_N)`` matrix of line numbers::
+
+        nn_l[n1, n2]
+        nn_l[np.ix_(neighbors, neighbors)]
+
+    delivering the numbers of lines connecting the nodes or ``-1``
+    for unconnected pairs of nodes. The construction
+    requires :math:`\mathcal{O}(n_L \log n_L)` operations and
+    the memory is linear in the number of lines.
+    '''
+
+    n_N = Int
+    '''Number of nodes.
+    '''
+
+    L = Array(dtype='int_')
+    '''Array of lines given by node pairs ``(n_L,2)``.
+    '''
+
+    shape = Property(depends_on='n_N')
+    '''Shape of the equivalent dense matrix.
+    '''
+
+    def _get_shape(self):
+        return (self.n_N, self.n_N)
+
+    _row_col_line = Property(depends_on='n_N, L')
+    '''Line incidences enumerated in both directions.
+    '''
+    @cached_property
+    def _get__row_col_line(self):
+        L = self.L.reshape(-1, 2)
+        n_L = len(L)
+        row = np.hstack([L[:, 0], L[:, 1]])
+        col = np.hstack([L[:, 1], L[:, 0]])
+        line = np.hstack([np.arange(n_L), np.arange(n_L)])
+        return row, col, line
+
+    _csr = Property(depends_on='n_N, L')
+    '''Incidences sorted by the rows and line numbers.
+    '''
+    @cached_property
+    def _get__csr(self):
+        row, col, line = self._row_col_line
+        order = np.lexsort((line, row))
+        indptr = np.zeros((self.n_N + 1,), dtype='int_')
+        indptr[1:] = np.cumsum(np.bincount(row, minlength=self.n_N))
+        return indptr, col[order], line[order]
+
+    indptr = Property
+    '''Row pointers ``(n_N+1,)`` into the ``indices`` and ``lines`` arrays.
+    '''
+
+    def _get_indptr(self):
+        return self._csr[0]
+
+    indices = Property
+    '''Neighbor nodes ``(2*n_L,)`` of each node.
+    '''
+
+    def _get_indices(self):
+        return self._csr[1]
+
+    lines = Property
+    '''Lines ``(2*n_L,)`` connecting a node with its neighbor in ``indices``.
+    '''
+
+    def _get_lines(self):
+        return self._csr[2]
+
+    _search_keys = Property(depends_on='n_N, L')
+    '''Sorted keys of node pairs ``row * n_N + col`` with
+    the associated line numbers used for the pairwise lookup.
+    '''
+    @cached_property
+    def _get__search_keys(self):
+        row, col, line = self._row_col_line
+        keys = row * self.n_N + col
+        order = np.argsort(keys, kind='mergesort')
+        return keys[order], line[order]
+
+    def get_nbr(self, n):
+        '''Neighbors of the node ``n``.
+        '''
+        indptr = self.indptr
+        return self.indices[indptr[n]:indptr[n + 1]]
+
+    def __getitem__(self, idx):
+        n1, n2 = np.broadcast_arrays(*[np.asarray(i, dtype='int_')
+                                       for i in idx])
+        keys, lines = self._search_keys
+        return lookup_sorted_keys(keys, lines, n1 * self.n_N + n2)
+
+    def toarray(self):
+        '''Return the dense ``(n_N,n_N)`` matrix of line numbers.
+        '''
+        NN = np.zeros(self.shape, dtype='int_') - 1
+        row, col, line = self._row_col_line
+        NN[row, col] = line
+        return NN
+
+
+class FacetLineIndex(HasStrictTraits):
+
+    r'''Index of facets identified by the triple of their lines.
+
+    Each facet is represented by the canonical key of its line triple
+    obtained by sorting the line numbers, so that the lookup
+    is independent of the order of the lines. The keys are stored
+    in a sorted array and searched by bisection.
+    The object can be indexed in the same way as the dense
+    ``(n_L,n_L,n_L)`` array of facet numbers::
+
+        lll_f[l1, l2, l3]
+
+    delivering the facet numbers or ``-1`` for triples of lines
+    that do not constitute a facet. An array of line triples ``(...,3)``
+    can be resolved at once using the method ``get_F``.
+    The memory is linear in the number of facets.
+    '''
+
+    n_L = Int
+    '''Number of lines.
+    '''
+
+    F_L = Array(dtype='int_')
+    '''Array of facets given by line triples ``(n_F,3)``.
+    '''
+
+    shape = Property(depends_on='n_L')
+    '''Shape of the equivalent dense array.
+    '''
+
+    def _get_shape(self):
+        return (self.n_L, self.n_L, self.n_L)
+
+    def _triple_keys(self, LLL):
+        '''Canonical keys of the line triples given in the last dimension.
+        '''
+        LLL = np.sort(LLL, axis=-1)
+        return (LLL[..., 0] * self.n_L + LLL[..., 1]) * self.n_L + LLL[..., 2]
+
+    _search_keys = Property(depends_on='n_L, F_L')
+    '''Sorted keys of the line triples with the associated facet numbers.
+    '''
+    @cached_property
+    def _get__search_keys(self):
+        F_L = self.F_L.reshape(-1, 3)
+        keys = self._triple_keys(F_L)
+        order = np.argsort(keys, kind='mergesort')
+        return keys[order], order
+
+    def get_F(self, LLL):
+        '''Facets constituted by the line triples ``(...,3)``.
+        '''
+        keys, facets = self._search_keys
+        LLL = np.asarray(LLL, dtype='int_')
+        return lookup_sorted_keys(keys, facets, self._triple_keys(LLL))
+
+    def __getitem__(self, idx):
+        LLL = np.broadcast_arrays(*[np.asarray(i, dtype='int_')
+                                    for i in idx])
+        return self.get_F(np.stack(LLL, axis=-1))
+
+    def toarray(self):
+        '''Return the dense ``(n_L,n_L,n_L)`` array of facet numbers.
+        '''
+        LLL = np.zeros(self.shape, dtype='int_') - 1
+        F_L = self.F_L.reshape(-1, 3)
+        F = np.arange(len(F_L))
+        for i, j, k in [(0, 1, 2), (1, 2, 0), (2, 0, 1),
+                        (2, 1, 0), (0, 2, 1), (1, 0, 2)]:
+            LLL[F_L[:, i], F_L[:, j], F_L[:, k]] = F
+        return LLL
+
+
+class HalfEdgeTopology(HasStrictTraits):
+
+    r'''Half-edge representation of a crease pattern.
+
+    Each facet :math:`f` with the counter-clockwise enumerated nodes
+    ``F_N[f]`` is decomposed into three half-edges :math:`h = 3f + k`
+    running from the node ``F_N[f,k]`` to the node ``F_N[f,(k+1)%3]``
+    along the line ``F_L[f,k]``. The arrays ``H_next``, ``H_prev``
+    and ``H_twin`` link the half-edges within a facet and across
+    the interior lines, respectively. Half-edges on the boundary
+    of the pattern have no twin, which is indicated by ``-1``.
+
+    Rotating around a node :math:`i` in a counter-clockwise manner
+    is achieved by the map ``H_twin[H_prev[h]]``. The vertex stars
+    of interior nodes are provided in the compressed format:
+    the outgoing half-edges of the interior node ``iN[j]``
+    are given by the slice ``iN_H[iN_ptr[j]:iN_ptr[j+1]]``
+    in the counter-clockwise order starting with the half-edge
+    attached to the line with the lowest index.
+    All mappings are constructed using vectorized sorting and
+    pointer jumping operations without loops over nodes.
+    '''
+
+    n_N = Int
+    '''Number of nodes.
+    '''
+
+    n_L = Int
+    '''Number of lines.
+    '''
+
+    F_N = Array(dtype='int_')
+    '''Counter-clockwise enumerated facet nodes ``(n_F,3)``.
+    '''
+
+    F_L = Array(dtype='int_')
+    '''Lines of facets ``(n_F,3)`` with the line ``F_L[f,k]`` connecting
+    the nodes ``F_N[f,k]`` and ``F_N[f,(k+1)%3]``.
+    '''
+
+    n_H = Property(depends_on='F_N')
+    '''Number of half-edges.
+    '''
+    @cached_property
+    def _get_n_H(self):
+        return self.F_N.size
+
+    H_N = Property(depends_on='F_N')
+    '''Origin node of a half-edge ``(n_H,)``.
+    '''
+    @cached_property
+    def _get_H_N(self):
+        return self.F_N.flatten()
+
+    H_F = Property(depends_on='F_N')
+    '''Facet of a half-edge ``(n_H,)``.
+    '''
+    @cached_property
+    def _get_H_F(self):
+        return np.arange(self.n_H) // 3
+
+    H_L = Property(depends_on='F_L')
+    '''Line of a half-edge ``(n_H,)``.
+    '''
+    @cached_property
+    def _get_H_L(self):
+        return self.F_L.flatten()
+
+    H_next = Property(depends_on='F_N')
+    '''Next half-edge within the facet ``(n_H,)``.
+    '''
+    @cached_property
+    def _get_H_next(self):
+        H = np.arange(self.n_H)
+        return H - H % 3 + (H + 1) % 3
+
+    H_prev = Property(depends_on='F_N')
+    '''Previous half-edge within the facet ``(n_H,)``.
+    '''
+    @cached_property
+    def _get_H_prev(self):
+        H = np.arange(self.n_H)
+        return H - H % 3 + (H + 2) % 3
+
+    H_target = Property(depends_on='F_N')
+    '''End node of a half-edge ``(n_H,)``.
+    '''
+    @cached_property
+    def _get_H_target(self):
+        return self.H_N[self.H_next]
+
+    _L_H = Property(depends_on='n_L, F_N, F_L')
+    '''Half-edges sorted by lines with the number of half-edges per line.
+    '''
+    @cached_property
+    def _get__L_H(self):
+        H_L = self.H_L
+        order = np.argsort(H_L, kind='mergesort')
+        n_L_H = np.bincount(H_L, minlength=self.n_L)
+        ptr = np.zeros((self.n_L + 1,), dtype='int_')
+        ptr[1:] = np.cumsum(n_L_H)
+        return order, ptr, n_L_H
+
+    iL = Property(depends_on='n_L, F_N, F_L')
+    '''Interior lines shared by two facets ``(n_iL,)``.
+    '''
+    @cached_property
+    def _get_iL(self):
+        return np.where(self._L_H[2] == 2)[0]
+
+    iL_H = Property(depends_on='n_L, F_N, F_L')
+    '''Pair of half-edges ``(n_iL,2)`` of an interior line
+    ordered by the facet number.
+    '''
+    @cached_property
+    def _get_iL_H(self):
+        order, ptr, _ = self._L_H
+        iL_ptr = ptr[self.iL]
+        return np.c_[order[iL_ptr], order[iL_ptr + 1]]
+
+    iL_F = Property(depends_on='n_L, F_N, F_L')
+    '''Facets ``(n_iL,2)`` attached to an interior line.
+    '''
+    @cached_property
+    def _get_iL_F(self):
+        return self.H_F[self.iL_H]
+
+    iL_within_F0 = Property(depends_on='n_L, F_N, F_L')
+    '''Index of an interior line within its first facet given as a pair
+    of arrays with the facet numbers and the positions within the facet.
+    '''
+    @cached_property
+    def _get_iL_within_F0(self):
+        H0 = self.iL_H[:, 0]
+        return (self.H_F[H0], H0 % 3)
+
+    H_twin = Property(depends_on='n_L, F_N, F_L')
+    '''Opposite half-edge attached to the same line ``(n_H,)``.
+    Boundary half-edges contain the value ``-1``.
+    '''
+    @cached_property
+    def _get_H_twin(self):
+        H_twin = np.full((self.n_H,), -1, dtype='int_')
+        iL_H = self.iL_H
+        H_twin[iL_H[:, 0]] = iL_H[:, 1]
+        H_twin[iL_H[:, 1]] = iL_H[:, 0]
+        return H_twin
+
+    H_rot = Property(depends_on='n_L, F_N, F_L')
+    '''Half-edge obtained by rotating the half-edge counter-clockwise
+    around its origin node ``(n_H,)``. Half-edges that cannot be
+    rotated further contain ``-1``.
+    '''
+    @cached_property
+    def _get_H_rot(self):
+        return self.H_twin[self.H_prev]
+
+    _star = Property(depends_on='n_N, n_L, F_N, F_L')
+    '''Interior nodes with their counter-clockwise ordered half-edges.
+    '''
+    @cached_property
+    def _get__star(self):
+        H = np.arange(self.n_H)
+        H_N, H_L, H_rot = self.H_N, self.H_L, self.H_rot
+        # a node is interior if all its half-edges can be rotated
+        n_N_H = np.bincount(H_N, minlength=self.n_N)
+        n_N_open = np.bincount(H_N[H_rot < 0], minlength=self.n_N)
+        is_iN = (n_N_H > 0) & (n_N_open == 0)
+        # start the star with the half-edge along the lowest line index
+        N_H = np.lexsort((H_L, H_N))
+        N_ptr = np.zeros((self.n_N + 1,), dtype='int_')
+        N_ptr[1:] = np.cumsum(n_N_H)
+        N_H0 = np.full((self.n_N,), -1, dtype='int_')
+        N_H0[n_N_H > 0] = N_H[N_ptr[:-1][n_N_H > 0]]
+        # rank the half-edges along the star using pointer jumping
+        # on the inverse rotation map
+        is_iH = is_iN[H_N]
+        pred = np.copy(H)
+        pred[H_rot[is_iH]] = H[is_iH]
+        rank = is_iH.astype('int_')
+        H0 = N_H0[H_N[is_iH]]
+        pred[H0] = H0
+        rank[H0] = 0
+        for i in range(int(np.ceil(np.log2(max(n_N_H.max(), 1)))) + 1):
+            rank, pred = rank + rank[pred], pred[pred]
+        # reject nodes with more than one cycle of half-edges
+        star_closed = np.ones((self.n_N,), dtype='bool')
+        star_closed[H_N[pred != N_H0[H_N]]] = False
+        is_iN &= star_closed
+        is_iH = is_iN[H_N]
+        # sort the half-edges of interior nodes by the rank
+        iH = H[is_iH]
+        iN_H = iH[np.lexsort((rank[iH], H_N[iH]))]
+        iN = np.where(is_iN)[0]
+        iN_ptr = np.zeros((len(iN) + 1,), dtype='int_')
+        iN_ptr[1:] = np.cumsum(n_N_H[iN])
+        return iN, iN_ptr, iN_H
+
+    iN = Property
+    '''Interior nodes with a closed cycle of facets ``(n_iN,)``.
+    '''
+
+    def _get_iN(self):
+        return self._star[0]
+
+    eN = Property(depends_on='n_N, n_L, F_N, F_L')
+    '''Edge nodes obtained as a complement of interior nodes.
+    '''
+    @cached_property
+    def _get_eN(self):
+        eN_bool = np.ones((self.n_N,), dtype='bool')
+        eN_bool[self.iN] = False
+        return np.where(eN_bool)[0]
+
+    iN_ptr = Property
+    '''Pointers ``(n_iN+1,)`` into the vertex star arrays
+    ``iN_H``, ``iN_nbr`` and ``iN_aln``.
+    '''
+
+    def _get_iN_ptr(self):
+        return self._star[1]
+
+    iN_H = Property
+    '''Outgoing half-edges of interior nodes in the counter-clockwise order.
+    '''
+
+    def _get_iN_H(self):
+        return self._star[2]
+
+    iN_nbr = Property
+    '''Neighbor nodes of interior nodes in the counter-clockwise order.
+    '''
+
+    def _get_iN_nbr(self):
+        return self.H_target[self.iN_H]
+
+    iN_aln = Property
+    '''Lines attached to interior nodes in the counter-clockwise order.
+    '''
+
+    def _get_iN_aln(self):
+        return self.H_L[self.iN_H]
@@ -28,3 +28,22 @@ class Fu(OptComponent):
     '''Indicates the derivatives are unavailable for a given
     type of constraint.
     '''
+
+    has_f_ddu = Bool(False)
+    '''Indicates that the product of the hessian with a vector
+    is provided by the method ``get_f_ddu``.
+    '''
+
+    def get_f_ddu(self, p, t=0):
+        '''Return the product of the hessian with the vector p.
+        '''
+        raise NotImplementedError('%s does not provide the hessian' %
+                                  self.__class__.__name__)
+
+    def get_f_du_fd(self, t=0, step=1e-7, n_workers=1):
+        '''Return the finite difference gradient of the goal function.
+        It is used for goal functions that do not provide the derivatives
+        (``has_f_du == False``) or if the analytical derivatives
+        are switched off.
+        '''
+        return self.get_du_fd(self.get_f, t, step, n_workers).toarray()[0]
@@ -15,6 +15,8 @@
 from traits.api import \
     provides, Float
 
+from oricreate.crease_pattern.crease_pattern_batch import \
+    CreasePatternTrialState
 from oricreate.opt import \
     IFu
 
@@ -42,3 +44,23 @@ class FuPotEngGravity(Fu):
         '''Get the derivatives with respect to individual displacements.
         '''
         return self.forming_task.formed_object.V_du * self.rho
+
+    def compile(self):
+        return CompiledPotEngGravity(
+            self.forming_task.formed_object, self.rho)
+
+
+class CompiledPotEngGravity(object):
+    '''Traits-free evaluation of the potential energy of gravity
+    obtained for the trial vector from a batch of one state.
+    '''
+
+    def __init__(self, cp, rho):
+        self.state = CreasePatternTrialState(cp)
+        self.rho = rho
+
+    def get_f(self, U, t=0):
+        return self.state.get_batch(U).V[0] * self.rho
+
+    def get_f_du(self, U, t=0):
+        return self.state.get_batch(U).V_du[0] * self.rho
@@ -16,11 +16,15 @@ import types
 
 from traits.api import \
     provides,  List, Tuple, Float, \
-    Property, Array, Int
+    Property, Array, Int, Bool
 
 import numpy as np
+from oricreate.crease_pattern.crease_pattern_batch import \
+    CreasePatternTrialState
 from oricreate.opt import \
     IFu
+from oricreate.opt.constraint_spec import \
+    CompiledRhs
 from oricreate.viz3d import \
     Visual3D
 
@@ -89,19 +93,30 @@ class FuPotEngTotal(Fu, Visual3D):
 
     fu_factor = Float(1.0)
 
+    def _get_iL_mask(self, cp):
+        '''Return the mask of the interior lines contributing to the stored
+        energy, i.e. all interior lines except ``exclude_lines``,
+        and the stiffness of these lines.
+        '''
+        iL_mask = np.ones_like(cp.iL, dtype=bool)
+        iL_mask[cp.L_iL[self.exclude_lines]] = False
+        kappa = self.kappa
+        if len(kappa) == cp.n_iL:
+            kappa = kappa[iL_mask]
+        return iL_mask, kappa
+
     def get_f(self, t=0):
         '''Get the total potential energy.
         '''
         cp = self.forming_task.formed_object
 
-        iL_mask = np.ones_like(cp.iL, dtype=bool)
-        iL_mask[cp.L_iL[self.exclude_lines]] = True
+        iL_mask, kappa = self._get_iL_mask(cp)
 
         iL_phi = cp.iL_psi[iL_mask] - cp.iL_psi_0[iL_mask]
         iL_length = np.linalg.norm(cp.iL_vectors[iL_mask], axis=1)
 
         stored_energy = np.einsum(
-            '...i,...i,...i->...', self.kappa, iL_phi**2, iL_length) / 2.0
+            '...i,...i,...i->...', kappa, iL_phi**2, iL_length) / 2.0
 
 #         F_ext = self._get_F_ext(t)
 #         ext_energy = np.einsum(
@@ -117,29 +132,179 @@ class FuPotEngTotal(Fu, Visual3D):
         return tot_energy
 
     def get_f_du(self, t=0):
-        '''Get the derivatives with respect to individual displacements.
+        r'''Get the derivatives with respect to individual displacements.
+
+        The stored energy of an interior line
+        :math:`\frac{1}{2} \kappa_l \, \phi_l^2 \, L_l` with
+        :math:`\phi_l = \psi_l - \psi_{l,0}` depends on the
+        displacements through the dihedral angle and the line length
+
+        .. math::
+            \Pi_{l,\bm{u}} = \kappa_l \, (L_l \, \phi_l \, \psi_{l,\bm{u}}
+            + \frac{1}{2} \phi_l^2 \, L_{l,\bm{u}}).
+
         '''
         cp = self.forming_task.formed_object
 
-        iL_mask = np.ones_like(cp.iL, dtype=bool)
-        iL_mask[cp.L_iL[self.exclude_lines]] = True
+        iL_mask, kappa = self._get_iL_mask(cp)
 
         F_ext = self._get_F_ext(t)
 
         iL_phi = cp.iL_psi[iL_mask] - cp.iL_psi_0[iL_mask]
-        iL_phi_du = cp.iL_psi_du[iL_mask]
-        iL_length = np.linalg.norm(cp.iL_vectors[iL_mask], axis=1)
-
-        Pi_int_du = np.einsum('...l,...l,...l,...lId->...Id',
-                              iL_length, self.kappa, iL_phi, iL_phi_du)
+        iL_phi_dul = cp.iL_psi_dul[iL_mask]
+        iL_vectors = cp.iL_vectors[iL_mask]
+        iL_length = np.linalg.norm(iL_vectors, axis=1)
+        # derivatives of the line lengths with respect to the line nodes
+        iL_length_dul = np.einsum('ljNd,lj->lNd', cp.iL_vectors_dul[iL_mask],
+                                  iL_vectors / iL_length[:, np.newaxis])
+
+        Pi_int_dul = ((kappa * iL_length * iL_phi)[:, np.newaxis, np.newaxis] *
+                      iL_phi_dul)
+        Pi_int_dul[:, :2] += ((kappa * iL_phi**2 / 2.0)[:, np.newaxis,
+                                                       np.newaxis] *
+                              iL_length_dul)
+        Pi_int_du = np.zeros((cp.n_N, cp.n_D), dtype='float_')
+        np.add.at(Pi_int_du, cp.iL_psi_N[iL_mask], Pi_int_dul)
 
         V_du = cp.V_du.reshape((-1, 3))
 
         Pi_ext_du = F_ext - V_du * self.rho * self.thickness
 
-        Pi_du = Pi_int_du - Pi_ext_du
+        Pi_du = self.fu_factor * (Pi_int_du - Pi_ext_du)
 
         return Pi_du.flatten()
 
+    has_f_ddu = Bool(True)
+    r'''Supply the hessian-vector products ``get_f_ddu``
+    to the optimizer.
+    '''
+
+    def get_f_ddu(self, p, t=0):
+        r'''Get the product of the hessian with the vector p.
+
+        With :math:`\phi_l = \psi_l - \psi_{l,0}` the hessian
+        of the stored energy of an interior line is obtained
+        by differentiating the gradient ``get_f_du`` as
+
+        .. math::
+            \Pi_{l,\bm{u}\bm{u}} \, \bm{p} = \kappa_l \, [
+            L_l \, \psi_{l,\bm{u}} \, \mathrm{d}\psi_l +
+            L_l \, \phi_l \, \psi_{l,\bm{u}\bm{u}} \bm{p} +
+            \phi_l \, (\psi_{l,\bm{u}} \, \mathrm{d}L_l +
+            L_{l,\bm{u}} \, \mathrm{d}\psi_l) +
+            \frac{1}{2} \phi_l^2 \, L_{l,\bm{u}\bm{u}} \bm{p} ]
+
+        with the increments :math:`\mathrm{d}\psi_l = \psi_{l,\bm{u}}
+        \cdot \bm{p}` and :math:`\mathrm{d}L_l = L_{l,\bm{u}} \cdot
+        \bm{p}`. The products :math:`\psi_{l,\bm{u}\bm{u}} \bm{p}`
+        are evaluated in closed form within the four-node stencils
+        by ``get_iL_psi_ddul``. The products with the hessian
+        of the potential energy of gravity are added.
+        '''
+        cp = self.forming_task.formed_object
+
+        iL_mask, kappa = self._get_iL_mask(cp)
+
+        iL_phi = cp.iL_psi[iL_mask] - cp.iL_psi_0[iL_mask]
+        iL_phi_dul = cp.iL_psi_dul[iL_mask]
+        iL_phi_ddul = cp.get_iL_psi_ddul(p)[iL_mask]
+        iL_vectors = cp.iL_vectors[iL_mask]
+        iL_length = np.linalg.norm(iL_vectors, axis=1)
+        iL_unit = iL_vectors / iL_length[:, np.newaxis]
+        iL_vectors_dul = cp.iL_vectors_dul[iL_mask]
+        iL_length_dul = np.einsum('ljNd,lj->lNd', iL_vectors_dul, iL_unit)
+
+        # increments of the dihedral angles, line vectors and lengths
+        iL_p = p.reshape(-1, cp.n_D)[cp.iL_psi_N[iL_mask]]
+        d_phi = np.einsum('lNd,lNd->l', iL_phi_dul, iL_p)
+        d_vectors = np.einsum('ljNd,lNd->lj', iL_vectors_dul, iL_p[:, :2])
+        d_length = np.einsum('lj,lj->l', iL_unit, d_vectors)
+        d_unit = ((d_vectors - iL_unit * d_length[:, np.newaxis]) /
+                  iL_length[:, np.newaxis])
+        iL_length_ddul = np.einsum('ljNd,lj->lNd', iL_vectors_dul, d_unit)
+
+        def w(value):
+            return (kappa * value)[:, np.newaxis, np.newaxis]
+
+        Pi_int_ddul = (w(iL_length * d_phi + iL_phi * d_length) *
+                       iL_phi_dul + w(iL_length * iL_phi) * iL_phi_ddul)
+        Pi_int_ddul[:, :2] += (w(iL_phi * d_phi) * iL_length_dul +
+                               w(iL_phi**2 / 2.0) * iL_length_ddul)
+        Pi_int_ddu = np.zeros((cp.n_N, cp.n_D), dtype='float_')
+        np.add.at(Pi_int_ddu, cp.iL_psi_N[iL_mask], Pi_int_ddul)
+
+        Pi_ext_ddu = -cp.get_V_ddu(p) * self.rho * self.thickness
+
+        return self.fu_factor * (Pi_int_ddu.flatten() - Pi_ext_ddu)
+
+    def compile(self):
+        return CompiledPotEngTotal(self)
+
     viz3d_classes = dict(default=FuPotEngBendingViz3D,
                          node_load=FuPotEngNodeLoadViz3D)
+
+
+class CompiledPotEngTotal(object):
+    r'''Traits-free evaluation of the total potential energy.
+
+    The stiffness, the initial dihedral angles and the dof indexes
+    of the stencil nodes of the contributing interior lines
+    and the dofs loaded by the external forces are extracted once.
+    The dihedral angles, line lengths and the potential energy
+    of gravity are obtained for the trial vector from a batch
+    of one state. The gradient is delivered as a dense vector.
+    '''
+
+    def __init__(self, fu):
+        cp = fu.forming_task.formed_object
+        self.n_dofs = cp.n_dofs
+        self.state = CreasePatternTrialState(cp)
+        iL_mask, kappa = fu._get_iL_mask(cp)
+        self.iL = np.where(iL_mask)[0]
+        self.kappa = np.array(kappa, dtype='float_')
+        self.iL_psi_0 = cp.iL_psi_0[self.iL]
+        self.iL_vectors_dul = cp.iL_vectors_dul[self.iL]
+        self.iL_dofs = (cp.n_D * cp.iL_psi_N[self.iL][:, :, np.newaxis] +
+                        np.arange(cp.n_D)).flatten()
+        self.F_ext_dofs = np.array([cp.n_D * node + dim
+                                    for node, dim, value in fu.F_ext_list],
+                                   dtype='int_')
+        self.F_ext_values = CompiledRhs(
+            [value if isinstance(value, types.FunctionType) else
+             float(value) for node, dim, value in fu.F_ext_list])
+        self.rho_t = fu.rho * fu.thickness
+        self.fu_factor = fu.fu_factor
+
+    def _get_F_ext(self, t):
+        F_ext = np.zeros((self.n_dofs,), dtype='float_')
+        F_ext[self.F_ext_dofs] = self.F_ext_values.get_rhs(t)
+        return F_ext
+
+    def _get_iL(self, U):
+        batch = self.state.get_batch(U)
+        iL_phi = batch.iL_psi[0, self.iL] - self.iL_psi_0
+        iL_vectors = batch.iL_vectors[0, self.iL]
+        iL_length = np.linalg.norm(iL_vectors, axis=1)
+        return batch, iL_phi, iL_vectors, iL_length
+
+    def get_f(self, U, t=0):
+        batch, iL_phi, iL_vectors, iL_length = self._get_iL(U)
+        stored_energy = np.sum(self.kappa * iL_phi**2 * iL_length) / 2.0
+        ext_energy = (np.dot(self._get_F_ext(t), U) -
+                      batch.V[0] * self.rho_t)
+        return self.fu_factor * (stored_energy - ext_energy)
+
+    def get_f_du(self, U, t=0):
+        batch, iL_phi, iL_vectors, iL_length = self._get_iL(U)
+        iL_length_dul = np.einsum('ljNd,lj->lNd', self.iL_vectors_dul,
+                                  iL_vectors / iL_length[:, np.newaxis])
+        Pi_int_dul = ((iL_length * self.kappa * iL_phi)[:, np.newaxis,
+                                                        np.newaxis] *
+                      batch.iL_psi_dul[0, self.iL])
+        Pi_int_dul[:, :2] += ((self.kappa * iL_phi**2 / 2.0)[:, np.newaxis,
+                                                            np.newaxis] *
+                              iL_length_dul)
+        Pi_int_du = np.bincount(self.iL_dofs, weights=Pi_int_dul.flatten(),
+                                minlength=self.n_dofs)
+        Pi_ext_du = self._get_F_ext(t) - batch.V_du[0] * self.rho_t
+        return self.fu_factor * (Pi_int_du - Pi_ext_du)
@@ -10,8 +10,11 @@ from traits.api import \
     provides, Tuple, \
     cached_property, Property
 
+import numpy as np
 from oricreate.opt import \
     IFu
+from oricreate.opt.fd_jacobian import \
+    get_node_pattern, get_stencil_N
 from oricreate.viz3d import \
     Visual3D
 
@@ -67,11 +70,26 @@ class FuTargetPsiValue(Fu, Visual3D):
         '''
         cp = self.formed_object
         iL_psi = cp.iL_psi
-        iL_psi_du = cp.iL_psi_du
         l, v = self.psi_value  # @UnusedVariable
         value = v(t) if isinstance(v, types.FunctionType) else v
         il = cp.L_iL[l]
-        return (iL_psi[il] - value) * iL_psi_du[il]
+        f_du = np.zeros((cp.n_N, cp.n_D), dtype='float_')
+        np.add.at(f_du, cp.iL_psi_N[il],
+                  (iL_psi[il] - value) * cp.iL_psi_dul[il])
+        return f_du
+
+    def _du_stencil_default(self):
+        return 'psi'
+
+    def get_du_pattern(self, n_G):
+        '''The goal function depends on the nodes of the facets
+        adjacent to the target line.
+        '''
+        cp = self.formed_object
+        l, v = self.psi_value  # @UnusedVariable
+        il = cp.L_iL[l]
+        return get_node_pattern(get_stencil_N(cp, self.du_stencil)[[il]],
+                                cp.n_N, cp.n_D)
 
     viz3d_dict = Property
 
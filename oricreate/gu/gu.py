@@ -16,8 +16,10 @@ from traits.api import \
     DelegatesTo, \
     Bool
 
+import numpy as np
 from oricreate.opt import \
     OptComponent, IGu
+import scipy.sparse as sp
 
 
 class Gu(OptComponent):
@@ -33,3 +35,50 @@ class Gu(OptComponent):
     '''Indicates the derivatives are unavailable for a given
     type of constraint.
     '''
+
+    constant_G_du = Bool(False)
+    '''Indicates that the jacobian is constant, e.g. for linear constraints,
+    so that it is evaluated only once within a simulation task.
+    '''
+
+    has_G_ddu = Bool(False)
+    '''Indicates that the products of the hessians with a vector
+    are provided by the method ``get_G_ddu``.
+    '''
+
+    def get_G_ddu(self, v, p, t=0):
+        '''Return the product of the hessians of the constraints
+        weighted by the multipliers v with the vector p.
+        '''
+        raise NotImplementedError('%s does not provide the hessian' %
+                                  self.__class__.__name__)
+
+    def get_G_du_fd(self, t=0, step=1e-7, n_workers=1):
+        '''Return the sparse finite difference jacobian of equality
+        constraint values. It is used for constraints that do not
+        provide the derivatives (``has_G_du == False``) or
+        if the analytical derivatives are switched off.
+        '''
+        return self.get_du_fd(self.get_G, t, step, n_workers)
+
+    def get_G_du_sparse(self, t=0):
+        '''Return the jacobian of equality constraint values as a sparse
+        matrix ``(n_G, n_dofs)``. The default implementation converts
+        the dense matrix delivered by ``get_G_du`` so that legacy
+        constraints can be assembled together with the sparse ones.
+        Constraints with element-local derivatives override this method
+        and construct the matrix from triplets using ``get_G_du_coo``.
+        '''
+        return sp.coo_matrix(self.get_G_du(t))
+
+    def get_G_du_coo(self, n_G, rows, cols, values):
+        '''Construct the sparse jacobian ``(n_G, n_dofs)`` from the arrays
+        of row indices, global degree of freedom indices and values.
+        The arrays are broadcast against each other and
+        duplicate entries are summed up.
+        '''
+        rows, cols, values = np.broadcast_arrays(rows, cols, values)
+        n_dofs = self.formed_object.n_dofs
+        return sp.coo_matrix((values.flatten(),
+                              (rows.flatten(), cols.flatten())),
+                             shape=(n_G, n_dofs))
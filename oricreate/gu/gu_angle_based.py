@@ -18,6 +18,7 @@ from traits.api import \
 from .gu import \
     Gu
 import numpy as np
+import scipy.sparse as sp
 
 
 class GuAngle(Gu):
@@ -37,20 +38,48 @@ class GuAngle(Gu):
     # =========================================================================
 
     def _get_G(self, t=0.0):
-        cp = self.forming_task.formed_object
-        theta_arr = cp.iN_theta
-        signs = self.signs
-        return np.array([np.sum(signs[:theta.shape[0]] * theta)
-                         for theta in theta_arr])
+        cp = self.formed_object
+        return self._get_star_sums(cp, cp.iN_H_theta)
 
     def _get_G_du(self, t=0.0):
-        cp = self.forming_task.formed_object
-        theta_du_arr = cp.iN_theta_du
-        signs = self.signs
-        sum_theta_du = np.array([np.einsum('i...,i...->...',
-                                           signs[:theta_du.shape[0]], theta_du)
-                                 for theta_du in theta_du_arr])
-        return sum_theta_du.reshape(-1, cp.n_dofs)
+        return self.get_G_du_sparse(t).toarray()
+
+    def get_G_du_sparse(self, t=0.0):
+        '''Assemble the jacobian as the product of the signed incidence
+        matrix of the vertex stars with the sparse derivatives
+        of the sector angles around the interior nodes.
+        '''
+        cp = self.formed_object
+        iN_ptr = cp.H.iN_ptr
+        n_iN, n_iH = len(iN_ptr) - 1, iN_ptr[-1]
+        iH_iN = np.repeat(np.arange(n_iN), np.diff(iN_ptr))
+        S = sp.csr_matrix((self._get_iH_signs(iN_ptr),
+                           (iH_iN, np.arange(n_iH))), shape=(n_iN, n_iH))
+        return (S * cp.iN_H_theta_du).tocsr()
+
+    def _du_stencil_default(self):
+        return 'stars'
+
+    def _get_iH_signs(self, iN_ptr):
+        '''Signs of the half-edges given by their position
+        within the vertex star.
+        '''
+        iH_pos = (np.arange(iN_ptr[-1]) -
+                  np.repeat(iN_ptr[:-1], np.diff(iN_ptr)))
+        return self.signs[iH_pos % len(self.signs)]
+
+    def _get_star_sums(self, cp, iH_values):
+        '''Sum up the values associated with the half-edges of the vertex
+        stars of interior nodes weighted by the signs of their position
+        within the star using segment sums over ``H.iN_ptr``.
+        '''
+        iN_ptr = cp.H.iN_ptr
+        n_iN = len(iN_ptr) - 1
+        if n_iN == 0:
+            return np.zeros((0,) + iH_values.shape[1:], dtype='float_')
+        signs = self._get_iH_signs(iN_ptr)
+        return np.add.reduceat(np.einsum('i,i...->i...', signs, iH_values),
+                               iN_ptr[:-1], axis=0)
 
     # =========================================================================
     # Subsidiary operators and arrays - constants
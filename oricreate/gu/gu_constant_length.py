@@ -12,7 +12,7 @@
 #
 
 from traits.api import \
-    provides
+    provides, Bool
 
 import numpy as np
 
@@ -56,27 +56,96 @@ class GuConstantLength(Gu):
         '''Calculate the residue for constant crease length
         given the fold vector dX.
         '''
+        # the rows of the matrix correspond to crease lines and
+        # the columns to the derivatives with respect to the node
+        # displacements in 3d.
+        return self.get_G_du_sparse(t).toarray()
+
+    def get_G_du_sparse(self, t=0.0):
+        '''Calculate the derivatives of the constant crease length
+        residue as a sparse matrix. Each line contributes to the
+        displacements of its two end nodes only.
+        '''
+        cp = self.forming_task.formed_object
+        v_0 = cp.L_vectors_0
+        u = cp.u
+        u_i, u_j = u[cp.L.T]
+        # derivatives with respect to the first and second node
+        # of a line with the shape (n_L, 2, n_D)
+        G_du_i = -2 * v_0 + 2 * u_i - 2 * u_j
+        G_du = np.concatenate([G_du_i[:, np.newaxis, :],
+                               -G_du_i[:, np.newaxis, :]], axis=1)
+        rows = np.arange(cp.n_L)[:, np.newaxis, np.newaxis]
+        cols = cp.L[:, :, np.newaxis] * cp.n_D + np.arange(cp.n_D)
+        return self.get_G_du_coo(cp.n_L, rows, cols, G_du)
+
+    def _du_stencil_default(self):
+        return 'lines'
+
+    has_G_ddu = Bool(True)
+
+    def get_G_ddu(self, v, p, t=0.0):
+        r'''Calculate the product of the constant hessians weighted by the
+        multipliers v with the vector p. The hessian of a line
+
+        .. math::
+            \frac{\partial^2 G}{\partial (\bm{u}_i, \bm{u}_j)^2} =
+            2 \begin{bmatrix} \bm{I} & -\bm{I} \\
+            -\bm{I} & \bm{I} \end{bmatrix}
+
+        couples the displacements of its end nodes :math:`i,j` only.
+        '''
         cp = self.forming_task.formed_object
-        G_du = np.zeros((cp.n_L, cp.n_N, cp.n_D), dtype='float_')
-
-        # running crease line index
-        if cp.n_L > 0:
-            v_0 = cp.L_vectors_0
-            u = cp.u
-            i, j = cp.L.T
-            u_i, u_j = u[cp.L.T]
-            l = np.arange(cp.n_L)
-            G_du[l, i, :] += -2 * v_0 + 2 * u_i - 2 * u_j
-            G_du[l, j, :] += 2 * v_0 - 2 * u_i + 2 * u_j
-
-        # reshape the 3D matrix to a 2D matrix
-        # with rows for crease lines and columns representing
-        # the derivatives with respect to the node displacements
-        # in 3d.
-        #
-        G_du = G_du.reshape(cp.n_L, cp.n_N * cp.n_D)
-        return G_du
+        p = p.reshape(-1, cp.n_D)
+        p_i, p_j = p[cp.L.T]
+        w_j = 2 * v[:, np.newaxis] * (p_j - p_i)
+        G_ddu = np.concatenate([-w_j[:, np.newaxis, :],
+                                w_j[:, np.newaxis, :]], axis=1)
+        cols = cp.L[:, :, np.newaxis] * cp.n_D + np.arange(cp.n_D)
+        return np.bincount(cols.flatten(), weights=G_ddu.flatten(),
+                           minlength=cp.n_dofs)
+
+    def compile(self):
+        cp = self.forming_task.formed_object
+        return CompiledConstantLength(cp.L, cp.L_vectors_0)
+
+
+class CompiledConstantLength(object):
+    r'''Traits-free evaluation of the constant length constraints.
+
+    The index arrays of the line nodes and of the jacobian entries
+    are computed once. The values are evaluated in terms of
+    the difference of the end node displacements
+    :math:`\bm{d} = \bm{u}_j - \bm{u}_i` as
+    :math:`G = 2 \bm{v}_0 \cdot \bm{d} + \bm{d} \cdot \bm{d}`.
+    '''
 
+    def __init__(self, L, L_vectors_0):
+        n_L, n_D = L_vectors_0.shape
+        self.n_G = n_L
+        self.n_D = n_D
+        self.L_i, self.L_j = np.copy(L.T)
+        self.v_0 = np.copy(L_vectors_0)
+        self.rows = np.repeat(np.arange(n_L), 2 * n_D)
+        self.cols = (L[:, :, np.newaxis] * n_D + np.arange(n_D)).flatten()
+        self._d = np.zeros((n_L, n_D), dtype='float_')
+        self._G_du = np.zeros((n_L, 2, n_D), dtype='float_')
+
+    def _get_d(self, U):
+        u = U.reshape(-1, self.n_D)
+        return np.subtract(u[self.L_j], u[self.L_i], out=self._d)
+
+    def get_G(self, U, t=0.0):
+        d = self._get_d(U)
+        return np.einsum('ij,ij->i', 2 * self.v_0 + d, d)
+
+    def get_G_du(self, U, t=0.0):
+        d = self._get_d(U)
+        G_du = self._G_du
+        np.add(self.v_0, d, out=G_du[:, 1, :])
+        G_du[:, 1, :] *= 2
+        np.negative(G_du[:, 1, :], out=G_du[:, 0, :])
+        return self.rows, self.cols, G_du.flatten()
 
 if __name__ == '__main__':
 
@@ -4,16 +4,21 @@ Created on Feb 19, 2015
 @author: rch
 '''
 
-import collections
-import numbers
-
+import scipy.sparse as sp
 from traits.api import \
     provides, \
-    Array, DelegatesTo, cached_property, Property
+    Array, Bool, DelegatesTo, Tuple, cached_property, Property, \
+    on_trait_change
 
 import numpy as np
 from oricreate.opt import \
     IGu
+from oricreate.opt.constraint_spec import \
+    CompiledRhs, get_spec_key
+from oricreate.opt.fd_jacobian import \
+    get_pattern
+from oricreate.util.einsum_utils import \
+    EPS
 from oricreate.viz3d import \
     Visual3D
 
@@ -21,6 +26,13 @@ from .gu import Gu
 from .gu_disp_control_viz3d import \
     GuDofConstraintsViz3D
 
+LP_R_MAP = np.array([[0, 1, 0],
+                     [-1, 0, 0],
+                     [0, 0, -1]], dtype='float_')
+'''Permutation and signs of the components of the cross product
+used in the constraint equations of the points on lines.
+'''
+
 
 @provides(IGu)
 class GuGrabPoints(Gu):
@@ -36,10 +48,13 @@ class GuGrabPoints(Gu):
     n_GP = DelegatesTo('forming_task')
     n_D = DelegatesTo('forming_task')
 
+    constant_G_du = Bool(True)
+
     # =========================================================================
     # Grab point specification
     # =========================================================================
-    grab_pts_L = Property(Array, depends_on='X, F, GP')
+    grab_pts_L = Property(Array, depends_on='forming_task, forming_task.GP, '
+                          'forming_task.F, forming_task.X')
 
     @cached_property
     def _get_grab_pts_L(self):
@@ -49,24 +64,13 @@ class GuGrabPoints(Gu):
            (lying in the plane of the facet)
            L4 will be 0
         '''
-        n = self.x_0
-        f = self.F
-
+        GP = np.array(self.GP, dtype='int_').reshape(-1, 2)
         x4 = np.array([0, 0, -1])
-        L = np.array([])
-
-        for i in self.GP:
-            f_i = i[1]  # actual facet index
-            T = np.c_[n[f[f_i][0]] - x4, n[f[f_i][1]] - x4]
-            T = np.c_[T, n[f[f_i][2]] - x4]
-            Tinv = np.linalg.inv(T)
-
-            x = n[i[0]] - x4
-            Li = np.dot(Tinv, x)
-            L = np.append(L, Li)
-
-        L = L.reshape(-1, 3)  # gives L1,L2,L3 for each grabpoint
-        return L
+        # columns of the matrices are the facet nodes relative to x4
+        T = np.einsum('gNd->gdN', self.x_0[self.F[GP[:, 1]]] - x4)
+        x = self.x_0[GP[:, 0]] - x4
+        # gives L1,L2,L3 for each grabpoint
+        return np.linalg.solve(T, x[:, :, np.newaxis])[:, :, 0]
 
     def get_G(self, t=0):
         ''' Calculate the residuum for constant crease length
@@ -79,21 +83,24 @@ class GuGrabPoints(Gu):
         given the fold vector dX.
 
         '''
-        grab_lines = np.zeros((self.n_GP * self.n_D, self.n_dofs))
-        for i in range(len(self.GP)):
-            facet = self.F[self.GP[i][1]]
-            c = 0
-            for q in facet:
-                grab_lines[i * 3, q * 3] = self.grab_pts_L[i][c]
-                grab_lines[i * 3 + 1, q * 3 + 1] = self.grab_pts_L[i][c]
-                grab_lines[i * 3 + 2, q * 3 + 2] = self.grab_pts_L[i][c]
-                c += 1
-
-            grab_lines[i * 3, self.GP[i][0] * 3] = -1
-            grab_lines[i * 3 + 1, self.GP[i][0] * 3 + 1] = -1
-            grab_lines[i * 3 + 2, self.GP[i][0] * 3 + 2] = -1
+        return self.get_G_du_sparse(t).toarray()
 
-        return grab_lines
+    def get_G_du_sparse(self, t=0):
+        ''' Assemble the barycentric coordinates of the grab points
+        with respect to the facet nodes and the negative unit
+        coefficients of the grab point nodes for each direction.
+        '''
+        GP = np.array(self.GP, dtype='int_').reshape(-1, 2)
+        n_GP, n_D = len(GP), self.n_D
+        # nodes [grab point, facet nodes] and their coefficients
+        GP_N = np.hstack([GP[:, :1], self.F[GP[:, 1]]])
+        GP_c = np.hstack([-np.ones((n_GP, 1)), self.grab_pts_L])
+        D = np.arange(n_D)
+        rows = (np.arange(n_GP)[:, np.newaxis, np.newaxis] * n_D +
+                D[np.newaxis, np.newaxis, :])
+        cols = GP_N[:, :, np.newaxis] * n_D + D[np.newaxis, np.newaxis, :]
+        return self.get_G_du_coo(n_GP * n_D, rows, cols,
+                                 GP_c[:, :, np.newaxis])
 
 
 @provides(IGu)
@@ -114,154 +121,68 @@ class GuPointsOnLine(Gu):
     L = DelegatesTo('forming_task')
     N = DelegatesTo('forming_task')
 
+    def _get_line_points(self):
+        '''Return the nodes ``(n_LP, 3)`` of the line points followed
+        by the nodes of their lines and the indexes ``(n_LP, 2)``
+        of the two components of the normal vector
+        :math:`[R_x, R_y, R_z]` used as the constraint equations.
+        '''
+        line = np.array(self.LP, dtype='int_').reshape(-1, 2)
+        LP_N = np.hstack([line[:, :1], self.L[line[:, 1]]])
+        p1, p2 = np.einsum('lNd->Nld', self.x_0[LP_N[:, 1:]])
+        # linepoint Elements take only two equations!
+        # if line lays in a system axis the representing equation
+        # will be zero, so it will be singular
+        on_x = (p1[:, 0] == p2[:, 0]) & (p1[:, 2] == p2[:, 2])
+        on_y = (p1[:, 1] == p2[:, 1]) & (p1[:, 2] == p2[:, 2]) & ~on_x
+        eqs = np.zeros((len(line), 2), dtype='int_')
+        eqs[:, 1] = 1
+        eqs[on_x] = [1, 2]
+        eqs[on_y] = [0, 2]
+        return LP_N, eqs
+
+    def _get_R(self, LP_N):
+        '''Return the vectors a = r_2 - r_1 and b = r_0 - r_1
+        between the line point r_0 and the line nodes r_1, r_2.
+        '''
+        r0, r1, r2 = np.einsum('lNd->Nld', self.x_0[LP_N] + self.u[LP_N])
+        return r2 - r1, r0 - r1
+
     def get_G(self, t=0):
 
-        line = np.array(self.LP)
-        if(len(line) == 0):
+        if len(self.LP) == 0:
             return []
-        cl = self.L[line[:, 1]]
-        u = self.u
-        p0 = self.x_0[line[:, 0]]
-        p1 = self.x_0[cl[:, 0]]
-        p2 = self.x_0[cl[:, 1]]
-        dp0 = u[line[:, 0]]
-        dp1 = u[cl[:, 0]]
-        dp2 = u[cl[:, 1]]
-
-        ri = p1 + dp1
-        rj = p2 + dp2
-        rij = p0 + dp0
-
+        LP_N, eqs = self._get_line_points()
+        a, b = self._get_R(LP_N)
         # parameter free determinant Form of the line
-        R = np.cross((rj - ri), (rij - ri))
-
-        # sorting of the residuum for same arangement as G_du
-        # ToDo: Redesigne G_du
-        Rx = R[:, 1]
-        Ry = R[:, 0] * -1
-        Rz = R[:, 2] * -1
-
-        R = np.zeros((len(Rx) * 2,))
-
-        # linepoint Elements take only two equations!
-        # if line lays in a system axis the representing equation
-        # will be zero, so it will be singular
-        for i in range(len(Rx)):
-            if((p1[i][0] == p2[i][0])and(p1[i][2] == p2[i][2])):
-                # check if line lays on x-axis
-                R[i * 2] = Ry[i]
-                R[i * 2 + 1] = Rz[i]
-            elif((p1[i][1] == p2[i][1])and(p1[i][2] == p2[i][2])):
-                # check if line lays on y-axis
-                R[i * 2] = Rx[i]
-                R[i * 2 + 1] = Rz[i]
-            else:
-                R[i * 2] = Rx[i]
-                R[i * 2 + 1] = Ry[i]
-
-        return R.reshape((-1,))
+        R = np.einsum('ij,lj->li', LP_R_MAP, np.cross(a, b))
+        return np.take_along_axis(R, eqs, axis=1).flatten()
 
     def get_G_du(self, t=0):
         ''' Calculate the jacobian of the residuum at the instantaneous
         configuration dR
         '''
-        line = np.array(self.LP)
-        if(len(line) == 0):
-            return np.zeros((self.n_LP * 2, self.n_dofs))
-        cl = self.L[line[:, 1]]
-        u = self.u
-        p0 = self.x_0[line[:, 0]]
-        p1 = self.x_0[cl[:, 0]]
-        p2 = self.x_0[cl[:, 1]]
-        dp0 = u[line[:, 0]]
-        dp1 = u[cl[:, 0]]
-        dp2 = u[cl[:, 1]]
-        dR = np.zeros((len(line) * 2, self.n_dofs))
-
-        for i in range(len(line)):
-            if((p1[i][0] == p2[i][0])and(p1[i][2] == p2[i][2])):
-                dR1 = self.get_line_G_duf2(
-                    p0[i], p1[i], p2[i], dp0[i], dp1[i], dp2[i],
-                    line[i], cl[i])
-                dR2 = self.get_line_G_duf3(
-                    p0[i], p1[i], p2[i], dp0[i], dp1[i], dp2[i],
-                    line[i], cl[i])
-            elif((p1[i][1] == p2[i][1])and(p1[i][2] == p2[i][2])):
-                dR1 = self.get_line_G_duf1(
-                    p0[i], p1[i], p2[i], dp0[i], dp1[i], dp2[i],
-                    line[i], cl[i])
-                dR2 = self.get_line_G_duf3(
-                    p0[i], p1[i], p2[i], dp0[i], dp1[i], dp2[i],
-                    line[i], cl[i])
-            else:
-                dR1 = self.get_line_G_duf1(
-                    p0[i], p1[i], p2[i], dp0[i], dp1[i], dp2[i],
-                    line[i], cl[i])
-                dR2 = self.get_line_G_duf2(
-                    p0[i], p1[i], p2[i], dp0[i], dp1[i], dp2[i],
-                    line[i], cl[i])
-            dR[i * 2] = dR1
-            dR[i * 2 + 1] = dR2
-
-        return dR
-
-    def get_line_G_duf1(self, p0, p1, p2, dp0, dp1, dp2, line, cl):
-        dfdx0 = p2[2] + dp2[2] - p1[2] - dp1[2]
-        dfdx1 = p0[2] + dp0[2] - p2[2] - dp2[2]
-        dfdx2 = p1[2] + dp1[2] - p0[2] - dp0[2]
-
-        dfdz0 = p1[0] + dp1[0] - p2[0] - dp2[0]
-        dfdz1 = p2[0] + dp2[0] - p0[0] - dp0[0]
-        dfdz2 = p0[0] + dp0[0] - p1[0] - dp1[0]
-
-        dR = np.zeros((1, self.n_dofs))
-        dR[0, line[0] * 3] = dfdx0
-        dR[0, line[0] * 3 + 2] = dfdz0
-        dR[0, cl[0] * 3] = dfdx1
-        dR[0, cl[0] * 3 + 2] = dfdz1
-        dR[0, cl[1] * 3] = dfdx2
-        dR[0, cl[1] * 3 + 2] = dfdz2
-
-        return dR
-
-    def get_line_G_duf2(self, p0, p1, p2, dp0, dp1, dp2, line, cl):
-        dfdy0 = p2[2] + dp2[2] - p1[2] - dp1[2]
-        dfdy1 = p0[2] + dp0[2] - p2[2] - dp2[2]
-        dfdy2 = p1[2] + dp1[2] - p0[2] - dp0[2]
-
-        dfdz0 = p1[1] + dp1[1] - p2[1] - dp2[1]
-        dfdz1 = p2[1] + dp2[1] - p0[1] - dp0[1]
-        dfdz2 = p0[1] + dp0[1] - p1[1] - dp1[1]
-
-        dR = np.zeros((1, self.n_dofs))
-
-        dR[0, line[0] * 3 + 1] = dfdy0
-        dR[0, line[0] * 3 + 2] = dfdz0
-        dR[0, cl[0] * 3 + 1] = dfdy1
-        dR[0, cl[0] * 3 + 2] = dfdz1
-        dR[0, cl[1] * 3 + 1] = dfdy2
-        dR[0, cl[1] * 3 + 2] = dfdz2
-
-        return dR
-
-    def get_line_G_duf3(self, p0, p1, p2, dp0, dp1, dp2, line, cl):
-        dfdx0 = p2[1] + dp2[1] - p1[1] - dp1[1]
-        dfdx1 = p0[1] + dp0[1] - p2[1] - dp2[1]
-        dfdx2 = p1[1] + dp1[1] - p0[1] - dp0[1]
-
-        dfdy0 = p1[0] + dp1[0] - p2[0] - dp2[0]
-        dfdy1 = p2[0] + dp2[0] - p0[0] - dp0[0]
-        dfdy2 = p0[0] + dp0[0] - p1[0] - dp1[0]
-
-        dR = np.zeros((1, self.n_dofs))
-        dR[0, line[0] * 3] = dfdx0
-        dR[0, line[0] * 3 + 1] = dfdy0
-        dR[0, cl[0] * 3] = dfdx1
-        dR[0, cl[0] * 3 + 1] = dfdy1
-        dR[0, cl[1] * 3] = dfdx2
-        dR[0, cl[1] * 3 + 1] = dfdy2
-
-        return dR
+        return self.get_G_du_sparse(t).toarray()
+
+    def get_G_du_sparse(self, t=0):
+        ''' Calculate the sparse jacobian of the residuum
+        with respect to the line point and the line nodes.
+        '''
+        n_LP, n_D = len(self.LP), self.n_D
+        if n_LP == 0:
+            return self.get_G_du_coo(2 * self.n_LP, [], [], [])
+        LP_N, eqs = self._get_line_points()
+        a, b = self._get_R(LP_N)
+        # derivatives of R = a x b with respect to r_0, r_1 and r_2
+        R_db = np.einsum('ijk,lj->lik', EPS, a)
+        R_da = np.einsum('ijk,lk->lij', EPS, b)
+        R_du = np.array([R_db, -R_da - R_db, R_da])
+        R_du = np.einsum('ij,Nljd->liNd', LP_R_MAP, R_du)
+        R_du = R_du[np.arange(n_LP)[:, np.newaxis], eqs]
+        rows = np.arange(2 * n_LP).reshape(n_LP, 2, 1, 1)
+        cols = (LP_N[:, np.newaxis, :, np.newaxis] * n_D +
+                np.arange(n_D)[np.newaxis, np.newaxis, np.newaxis, :])
+        return self.get_G_du_coo(2 * n_LP, rows, cols, R_du)
 
 
 @provides(IGu)
@@ -297,37 +218,107 @@ class GuDofConstraints(Gu, Visual3D):
             s += '\t= r: %s\n' % str(rhs)
         return s
 
+    def get_spec_key(self):
+        return get_spec_key(self.dof_constraints)
+
+    def validate_spec(self):
+        key = self.get_spec_key()
+        compiled_key = (key, self.formed_object.n_dofs)
+        if not self._compiled or self._compiled[0] != compiled_key:
+            self._compiled = (compiled_key, CompiledDofConstraints(
+                self.dof_constraints, self.formed_object.n_dofs))
+        return key
+
+    compiled = Property
+    '''Coefficient matrix and right-hand sides of the constraint equations.
+    The equations are compiled at the first access and recompiled
+    if the array ``dof_constraints`` gets replaced. In-place modifications
+    of the array are taken into account by ``validate_spec``.
+    '''
+
+    def _get_compiled(self):
+        if not self._compiled:
+            self.validate_spec()
+        return self._compiled[1]
+
+    _compiled = Tuple
+    '''Specification key and the compiled constraints.
+    '''
+
+    @on_trait_change('dof_constraints, forming_task')
+    def _reset_compiled(self):
+        self._compiled = ()
+
     def get_G(self, t=0):
         ''' Calculate the residue for given constraint equations
         '''
-        cp = self.formed_object
-        u = cp.u
-        G = np.zeros((len(self.dof_constraints)), dtype='float_')
-        for i, dof_cnstr in enumerate(self.dof_constraints):
-            lhs, rhs = dof_cnstr
-            for n, d, c in lhs:  # @UnusedVariable
-                G[i] += c * u[n, d]
-            if rhs:
-                if isinstance(rhs, numbers.Number):
-                    G[i] -= rhs
-                elif isinstance(rhs, collections.Callable):
-                    G[i] -= rhs(t)
-            else:
-                G[i] -= 0
-        return G
+        return self.compiled.get_G(self.formed_object.U, t)
 
     def get_G_du(self, t=0.0):
         ''' Calculate the residue for given constraint equations
         '''
-        cp = self.formed_object
-        G_du = np.zeros((len(self.dof_constraints), cp.n_dofs),
-                        dtype='float_')
-        for i, dof_cnstr in enumerate(self.dof_constraints):
-            lhs, rhs = dof_cnstr  # @UnusedVariable
-            for n, d, c in lhs:  # @UnusedVariable
-                dof = 3 * n + d
-                G_du[i, dof] += c
+        return self.get_G_du_sparse(t).toarray()
+
+    def get_G_du_sparse(self, t=0.0):
+        ''' Return the sparse jacobian of the constraint equations
+        containing the coefficients of the constrained dofs.
+        '''
+        return self.compiled.C
+
+    constant_G_du = Bool(True)
 
-        return G_du
+    has_G_ddu = Bool(True)
+
+    def get_G_ddu(self, v, p, t=0):
+        '''The constraints are linear, their hessians vanish.
+        '''
+        return np.zeros_like(p)
+
+    def _get_has_du_pattern(self):
+        return True
+
+    def get_du_pattern(self, n_G):
+        compiled = self.compiled
+        return get_pattern(compiled.rows, compiled.cols,
+                           (n_G, self.formed_object.n_dofs))
+
+    def compile(self):
+        return self.compiled
 
     viz3d_classes = dict(default=GuDofConstraintsViz3D)
+
+
+class CompiledDofConstraints(object):
+    r'''Traits-free evaluation of the dof constraints.
+
+    The equations are compiled into the sparse coefficient matrix
+    :math:`C` so that the residue is obtained as
+
+    .. math::
+        G = C \, U - r(t).
+
+    The right-hand sides :math:`r(t)` are compiled by ``CompiledRhs``.
+    '''
+
+    def __init__(self, dof_constraints, n_dofs=None, n_D=3):
+        rows, cols, coeffs = [], [], []
+        self.n_G = len(dof_constraints)
+        for i, (lhs, rhs) in enumerate(dof_constraints):  # @UnusedVariable
+            for n, d, c in lhs:
+                rows.append(i)
+                cols.append(n_D * n + d)
+                coeffs.append(c)
+        self.rhs = CompiledRhs([rhs for lhs, rhs in dof_constraints])
+        self.rows = np.array(rows, dtype='int_')
+        self.cols = np.array(cols, dtype='int_')
+        self.coeffs = np.array(coeffs, dtype='float_')
+        if n_dofs is None:
+            n_dofs = np.max(self.cols) + 1 if len(self.cols) else 0
+        self.C = sp.csr_matrix((self.coeffs, (self.rows, self.cols)),
+                               shape=(self.n_G, n_dofs))
+
+    def get_G(self, U, t=0):
+        return self.C.dot(U) - self.rhs.get_rhs(t)
+
+    def get_G_du(self, U, t=0):
+        return self.rows, self.cols, self.coeffs
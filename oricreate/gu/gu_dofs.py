@@ -15,7 +15,10 @@
 
 '''
 
-import collections
+try:
+    from collections.abc import Container
+except ImportError:
+    from collections import Container
 import types
 
 import numpy as np
@@ -27,12 +30,12 @@ def _broadcast_nd(n, d):
     nodes, dirs = n, d
     if isinstance(nodes, (int, np.int_)):
         nodes = np.array([n], dtype='int')
-    elif isinstance(nodes, collections.Container):
+    elif isinstance(nodes, Container):
         nodes = np.array(list(nodes), np.int_)
 
     if isinstance(dirs, (int, np.int_)):
         dirs = np.array([d], dtype='int')
-    elif isinstance(dirs, collections.Container):
+    elif isinstance(dirs, Container):
         dirs = np.array(list(dirs), dtype=np.int_)
     return np.broadcast(nodes[None, :], dirs[:, None])
 
@@ -4,15 +4,20 @@ Created on Feb 19, 2015
 @author: rch
 '''
 
-import types
-
+import scipy.sparse as sp
 from traits.api import \
     provides, \
-    Array
+    Array, Property, Tuple, on_trait_change
 
 import numpy as np
+from oricreate.crease_pattern.crease_pattern_batch import \
+    CreasePatternTrialState
 from oricreate.opt import \
     IGu
+from oricreate.opt.constraint_spec import \
+    CompiledRhs, get_spec_key
+from oricreate.opt.fd_jacobian import \
+    get_node_pattern, get_pattern, get_stencil_N
 from oricreate.viz3d import \
     Visual3D
 
@@ -68,33 +73,141 @@ class GuPsiConstraints(Gu, Visual3D):
             s += '\t= r: %s\n' % str(rhs)
         return s
 
+    def get_spec_key(self):
+        return get_spec_key(self.psi_constraints)
+
+    def validate_spec(self):
+        key = self.get_spec_key()
+        cp = self.formed_object
+        compiled_key = (key, cp, cp.n_iL)
+        if not self._compiled or self._compiled[0] != compiled_key:
+            self._compiled = (compiled_key, self._compile_C(cp), CompiledRhs(
+                [rhs for lhs, rhs in self.psi_constraints]))
+        return key
+
+    compiled = Property
+    r'''Pair of the coefficient matrix ``C`` and of the right-hand sides
+    of the constraint equations. The equations are compiled at the first
+    access and recompiled if the array ``psi_constraints`` gets replaced.
+    In-place modifications of the array are taken into account
+    by ``validate_spec``.
+    '''
+
+    def _get_compiled(self):
+        if not self._compiled:
+            self.validate_spec()
+        return self._compiled[1:]
+
+    _compiled = Tuple
+    '''Specification key, coefficient matrix and right-hand sides.
+    '''
+
+    @on_trait_change('psi_constraints, forming_task')
+    def _reset_compiled(self):
+        self._compiled = ()
+
+    C = Property
+    r'''Sparse matrix of coefficients ``(n_G, n_iL)`` of the dihedral
+    angles around the interior lines in the constraint equations.
+    '''
+
+    def _get_C(self):
+        return self.compiled[0]
+
+    def _compile_C(self, cp):
+        rows, lines, coeffs = [], [], []
+        for i, psi_cnstr in enumerate(self.psi_constraints):
+            lhs, rhs = psi_cnstr  # @UnusedVariable
+            for l, c in lhs:
+                rows.append(i)
+                lines.append(l)
+                coeffs.append(c)
+        iL = cp.L_iL[np.array(lines, dtype='int_')]
+        return sp.csr_matrix((np.array(coeffs, dtype='float_'),
+                              (np.array(rows, dtype='int_'), iL)),
+                             shape=(len(self.psi_constraints), cp.n_iL))
+
+    rhs = Property
+    r'''Right-hand sides of the constraint equations.
+    '''
+
+    def _get_rhs(self):
+        return self.compiled[1]
+
     def get_G(self, t=0):
         ''' Calculate the residue for given constraint equations
         '''
         cp = self.formed_object
-        iL_psi = cp.iL_psi
-        G = np.zeros((len(self.psi_constraints)), dtype='float_')
-        for i, psi_cnstr in enumerate(self.psi_constraints):
-            lhs, rhs = psi_cnstr
-            for l, c in lhs:  # @UnusedVariable
-                il = cp.L_iL[l]
-                G[i] += c * iL_psi[il]
-            G[i] -= rhs(t) if isinstance(rhs, types.FunctionType) else rhs
-        return G
+        return self.C.dot(cp.iL_psi) - self.rhs.get_rhs(t)
+
+    def _get_has_du_pattern(self):
+        return True
+
+    def get_du_pattern(self, n_G):
+        '''Each equation depends on the nodes of the facets
+        adjacent to its lines.
+        '''
+        cp = self.formed_object
+        iL_pattern = get_node_pattern(get_stencil_N(cp, 'psi'),
+                                      cp.n_N, cp.n_D)
+        G_pattern = (abs(self.C) * iL_pattern).tocoo()
+        return get_pattern(G_pattern.row, G_pattern.col, (n_G, cp.n_dofs))
 
     def get_G_du(self, t=0.0):
         ''' Calculate the residue for given constraint equations
         '''
+        return self.get_G_du_sparse(t).toarray()
+
+    def get_G_du_sparse(self, t=0.0):
+        ''' Return the sparse jacobian obtained as the product
+        of the coefficient matrix with the derivatives of the dihedral
+        angles around the interior lines.
+        '''
         cp = self.formed_object
-        iL_psi_du = cp.iL_psi_du
-        G_du = np.zeros((len(self.psi_constraints), cp.n_dofs),
-                        dtype='float_')
-        for i, psi_cnstr in enumerate(self.psi_constraints):
-            lhs, rhs = psi_cnstr  # @UnusedVariable
-            for l, c in lhs:  # @UnusedVariable
-                il = cp.L_iL[l]
-                G_du[i, :] += c * iL_psi_du[il, :].flatten()
+        return self.C * cp.iL_psi_du
 
-        return G_du
+    def compile(self):
+        C, rhs = self.compiled
+        return CompiledPsiConstraints(self.formed_object, C, rhs)
 
     viz3d_classes = dict(psi_constraints=GuPsiConstraintsViz3D)
+
+
+class CompiledPsiConstraints(object):
+    r'''Traits-free evaluation of the constraints of the dihedral angles.
+
+    The residue and the jacobian are obtained as
+
+    .. math::
+        G = C \, \psi(U) - r(t), \quad
+        G_{,U} = C \, \psi_{,U}
+
+    with the coefficient matrix :math:`C` and the right-hand sides
+    :math:`r(t)` compiled by ``GuPsiConstraints``. The dihedral angles
+    and their derivatives with respect to the stencil nodes are obtained
+    for the trial vector from a batch of one state. The rows and columns
+    of the jacobian entries are computed once for the nonzero
+    coefficients of :math:`C`.
+    '''
+
+    def __init__(self, cp, C, rhs):
+        C = C.tocoo()
+        self.n_G = C.shape[0]
+        self.C = C.tocsr()
+        self.rhs = rhs
+        self.state = CreasePatternTrialState(cp)
+        n_S = cp.iL_psi_N.shape[1] * cp.n_D
+        self.iL = C.col
+        self.coeffs = C.data[:, np.newaxis]
+        self.rows = np.repeat(C.row, n_S)
+        self.cols = (cp.n_D * cp.iL_psi_N[C.col][:, :, np.newaxis] +
+                     np.arange(cp.n_D)).flatten()
+
+    def get_G(self, U, t=0):
+        iL_psi = self.state.get_batch(U).iL_psi[0]
+        return self.C.dot(iL_psi) - self.rhs.get_rhs(t)
+
+    def get_G_du(self, U, t=0):
+        iL_psi_dul = self.state.get_batch(U).iL_psi_dul[0, self.iL]
+        values = self.coeffs * iL_psi_dul.reshape(len(self.iL), -1)
+        return self.rows, self.cols, values.flatten()
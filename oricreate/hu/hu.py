@@ -18,6 +18,7 @@ from traits.api import \
 
 from oricreate.opt import \
     OptComponent, IGu
+import scipy.sparse as sp
 
 
 class Hu(OptComponent):
@@ -33,3 +34,16 @@ class Hu(OptComponent):
     '''Indicates the derivatives are unavailable for a given
     type of constraint.
     '''
+
+    def get_H_du_fd(self, t=0, step=1e-7, n_workers=1):
+        '''Return the sparse finite difference jacobian of inequality
+        constraint values.
+        '''
+        return self.get_du_fd(self.get_H, t, step, n_workers)
+
+    def get_H_du_sparse(self, t=0):
+        '''Return the jacobian of inequality constraint values
+        as a sparse matrix ``(n_H, n_dofs)`` converted from the dense
+        matrix delivered by ``get_H_du``.
+        '''
+        return sp.coo_matrix(self.get_H_du(t))
@@ -4,13 +4,19 @@ Created on Feb 19, 2015
 @author: rch
 '''
 
+import scipy.sparse as sp
 from traits.api import \
     provides, \
-    Array, cached_property, Property, Dict, Float
+    Array, cached_property, Property, Dict, Float, Tuple, \
+    on_trait_change
 
 import numpy as np
 from oricreate.opt import \
     IHu
+from oricreate.opt.constraint_spec import \
+    get_spec_key
+from oricreate.opt.fd_jacobian import \
+    get_node_pattern
 from oricreate.viz3d import \
     Visual3D
 
@@ -55,33 +61,79 @@ class HuPsiConstraints(Hu, Visual3D):
                                  'not refer to an interior line: '
                                  'must be one of %s' % (l, cp.iL))
 
+    def get_spec_key(self):
+        return get_spec_key(self.psi_constraints)
+
+    def validate_spec(self):
+        key = self.get_spec_key()
+        cp = self.formed_object
+        compiled_key = (key, sorted(self.sign.items()), cp, cp.n_iL)
+        if not self._compiled or self._compiled[0] != compiled_key:
+            self._compiled = (compiled_key, self._compile_C(cp))
+        return key
+
+    C = Property
+    r'''Sparse matrix ``(n_H, n_iL)`` with the signs of the dihedral
+    angles around the interior lines in the constraint equations.
+    The matrix is compiled at the first access and recompiled
+    if the array ``psi_constraints`` or the signs get replaced.
+    In-place modifications of the array are taken into account
+    by ``validate_spec``.
+    '''
+
+    def _get_C(self):
+        if not self._compiled:
+            self.validate_spec()
+        return self._compiled[1]
+
+    _compiled = Tuple
+    '''Specification key and the sign matrix.
+    '''
+
+    @on_trait_change('psi_constraints, sign, sign_items, forming_task')
+    def _reset_compiled(self):
+        self._compiled = ()
+
+    def _compile_C(self, cp):
+        n_H = len(self.psi_constraints)
+        L = np.array([l for l, is_mountain in self.psi_constraints],
+                     dtype='int_')
+        signs = np.array([self.sign[is_mountain]
+                          for l, is_mountain in self.psi_constraints],
+                         dtype='float_')
+        return sp.csr_matrix((signs, (np.arange(n_H), cp.L_iL[L])),
+                             shape=(n_H, cp.n_iL))
+
     def get_H(self, t=0):
         ''' Calculate the residue for given constraint equations
         '''
         cp = self.formed_object
-        iL_psi = cp.iL_psi
-        H = np.zeros((len(self.psi_constraints)), dtype='float_')
-        for i, psi_cnstr in enumerate(self.psi_constraints):
-            l, is_mountain = psi_cnstr
-            sign = self.sign[is_mountain]
-            il = cp.L_iL[l]
-            H[i] = sign * iL_psi[il] + self.threshold
-        return H
+        return self.C.dot(cp.iL_psi) + self.threshold
+
+    def _get_has_du_pattern(self):
+        return True
+
+    def get_du_pattern(self, n_G):
+        '''Each equation depends on the nodes of the facets
+        adjacent to its line.
+        '''
+        cp = self.formed_object
+        L = np.array([psi_cnstr[0] for psi_cnstr in self.psi_constraints],
+                     dtype='int_')
+        return get_node_pattern(cp.iL_psi_N[cp.L_iL[L]], cp.n_N, cp.n_D)
 
     def get_H_du(self, t=0.0):
         ''' Calculate the residue for given constraint equations
         '''
+        return self.get_H_du_sparse(t).toarray()
+
+    def get_H_du_sparse(self, t=0.0):
+        ''' Return the sparse jacobian obtained as the product
+        of the sign matrix with the derivatives of the dihedral
+        angles around the interior lines.
+        '''
         cp = self.formed_object
-        iL_psi_du = cp.iL_psi_du
-        H_du = np.zeros((len(self.psi_constraints), cp.n_dofs),
-                        dtype='float_')
-        for i, psi_cnstr in enumerate(self.psi_constraints):
-            l, is_mountain = psi_cnstr
-            sign = self.sign[is_mountain]
-            il = cp.L_iL[l]
-            H_du[i, :] = sign * iL_psi_du[il, :].flatten()
-
-        return H_du
+        return self.C * cp.iL_psi_du
 
     viz3d_dict = Property
 
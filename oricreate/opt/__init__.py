@@ -1,4 +1,6 @@
 
+from .fd_jacobian import \
+    FDJacobian
 from .i_fu import \
     IFu
 from .i_gu import \
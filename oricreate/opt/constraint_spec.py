@@ -0,0 +1,68 @@
+# -------------------------------------------------------------------------
+#
+# Copyright (c) 2009, IMB, RWTH Aachen.
+# All rights reserved.
+#
+# This software is provided without warranty under the terms of the BSD
+# license included in oricreate/LICENSE.txt and may be redistributed only
+# under the conditions described in the aforementioned license.  The license
+# is also available online at http://www.simvisage.com/licenses/BSD.txt
+#
+# Thanks for using oricreate open source!
+#
+# Created on Oct 18, 2026 by: rch
+
+import numbers
+
+import numpy as np
+
+
+def get_spec_key(spec):
+    '''Return a key identifying the current content of the specification
+    of constraint equations, e.g. ``dof_constraints``.
+
+    The specification arrays may be modified in place by item assignments,
+    e.g. ``dof_constraints[-1][-1] = u``, which does not notify the traits
+    depending on the array. The forms compiled from the specification
+    are therefore validated by comparing the key obtained at the time
+    of compilation with the current one. The entries of the array
+    and the items of the lists within the entries are compared by value,
+    the time functions on the right-hand sides by identity.
+    '''
+    spec = np.asarray(spec)
+    if spec.dtype != object:
+        return [spec.shape, spec.tobytes()]
+    return [tuple(item) if isinstance(item, list) else item
+            for item in spec.flat]
+
+
+class CompiledRhs(object):
+    '''Right-hand sides of a list of constraint equations given
+    as numbers or as functions of time.
+
+    Constant values are summed into an array. Time functions
+    shared by several equations are evaluated once and their values
+    are scattered to the rows of these equations.
+    '''
+
+    def __init__(self, rhs_lst):
+        self.values = np.zeros((len(rhs_lst),), dtype='float_')
+        fns = {}
+        for i, rhs in enumerate(rhs_lst):
+            if rhs:
+                if isinstance(rhs, numbers.Number):
+                    self.values[i] = rhs
+                elif callable(rhs):
+                    fns.setdefault(id(rhs), (rhs, []))[1].append(i)
+        self.fns = [(np.array(fn_rows, dtype='int_'), fn)
+                    for fn, fn_rows in fns.values()]
+
+    def get_rhs(self, t=0):
+        '''Return the right-hand sides at time t.
+        '''
+        if not self.fns:
+            return self.values
+        rhs = np.copy(self.values)
+        for fn_rows, fn in self.fns:
+            rhs[fn_rows] += fn(t)
+        return rhs
@@ -0,0 +1,210 @@
+# -------------------------------------------------------------------------
+#
+# Copyright (c) 2009, IMB, RWTH Aachen.
+# All rights reserved.
+#
+# This software is provided without warranty under the terms of the BSD
+# license included in oricreate/LICENSE.txt and may be redistributed only
+# under the conditions described in the aforementioned license.  The license
+# is also available online at http://www.simvisage.com/licenses/BSD.txt
+#
+# Thanks for using oricreate open source!
+#
+# Created on Oct 18, 2026 by: rch
+
+import multiprocessing
+
+import scipy.sparse as sp
+from traits.api import \
+    HasStrictTraits, Property, cached_property, Instance, Event, \
+    Float, Int
+
+import numpy as np
+
+
+def get_stencil_N(cp, stencil):
+    '''Return the array of nodes ``(n_G, n_S)`` the constraint equations
+    depend on if each equation is associated with a node, line, facet
+    or an interior line of the crease pattern cp. The stencil of an
+    interior line (``psi``) includes the nodes of both adjacent facets
+    given by the node map ``iL_psi_N``.
+    '''
+    if stencil == 'nodes':
+        return np.arange(cp.n_N)[:, np.newaxis]
+    elif stencil == 'lines':
+        return cp.L
+    elif stencil == 'facets':
+        return cp.F
+    elif stencil == 'psi':
+        return cp.iL_psi_N
+    raise ValueError('unknown stencil %s' % stencil)
+
+
+def get_stencil_pattern(cp, stencil):
+    '''Return the sparsity pattern ``(n_E, n_dofs)`` of the equations
+    associated with the ``n_E`` entities of the stencil. The stencil
+    of an interior node (``stars``) includes the nodes of all facets
+    of its vertex star given by the node map ``iN_H_N`` of the half-edges
+    in the compressed format ``H.iN_ptr``.
+    '''
+    if stencil == 'stars':
+        iN_ptr = cp.H.iN_ptr
+        n_iN = len(iN_ptr) - 1
+        iH_iN = np.repeat(np.arange(n_iN), np.diff(iN_ptr))
+        return get_node_pattern(cp.iN_H_N, cp.n_N, cp.n_D, iH_iN, n_iN)
+    return get_node_pattern(get_stencil_N(cp, stencil), cp.n_N, cp.n_D)
+
+
+def get_node_pattern(G_N, n_N, n_D=3, G_rows=None, n_G=None):
+    '''Return the sparsity pattern of a jacobian ``(n_G, n_N * n_D)``
+    with rows depending on all displacement components
+    of the nodes given in the rows of the array G_N. If the row
+    indexes G_rows are given, the nodes in the k-th row of G_N
+    are assigned to the row ``G_rows[k]`` of the pattern.
+    '''
+    G_N = np.asarray(G_N, dtype='int_')
+    if G_rows is None:
+        G_rows = np.arange(G_N.shape[0])
+        n_G = G_N.shape[0]
+    cols = (G_N[:, :, np.newaxis] * n_D +
+            np.arange(n_D)).reshape(G_N.shape[0], -1)
+    rows = np.repeat(G_rows, cols.shape[1])
+    return get_pattern(rows, cols.flatten(), (n_G, n_N * n_D))
+
+
+def get_pattern(rows, cols, shape):
+    '''Return the sparsity pattern with the given nonzero positions.
+    Duplicate positions are merged.
+    '''
+    pattern = sp.csr_matrix((np.ones(len(rows), dtype='int8'),
+                             (rows, cols)), shape=shape)
+    pattern.sum_duplicates()
+    pattern.data[:] = 1
+    return pattern
+
+
+def get_column_colors(pattern):
+    '''Color the columns of the sparsity pattern so that no two columns
+    of the same color have a nonzero entry in a common row. Greedy
+    coloring of the column intersection graph is performed in the order
+    of decreasing degree. The number of colors is bounded by the maximum
+    degree plus one.
+    '''
+    P = sp.csc_matrix(pattern, dtype='int_')
+    C = (P.T * P).tocsr()
+    n_cols = C.shape[0]
+    degree = np.diff(C.indptr)
+    colors = np.full((n_cols,), -1, dtype='int_')
+    for j in np.argsort(-degree, kind='stable'):
+        nbr_colors = colors[C.indices[C.indptr[j]:C.indptr[j + 1]]]
+        used = np.zeros((degree[j] + 1,), dtype=bool)
+        nbr_colors = nbr_colors[(nbr_colors >= 0) & (nbr_colors <= degree[j])]
+        used[nbr_colors] = True
+        colors[j] = np.argmin(used)
+    return colors
+
+
+_get_G = None
+'''Residual function evaluated by the worker processes.
+'''
+
+
+def _eval_G(U):
+    return _get_G(U)
+
+
+class FDJacobian(HasStrictTraits):
+    r'''Sparse finite difference jacobian with colored columns.
+
+    The columns of the sparsity pattern are colored so that the columns
+    of the same color do not share any row. All columns of one color
+    are perturbed simultaneously
+
+    .. math::
+        \bm{J}_{ij} = \frac{G_i(\bm{U} + \sum_{k \in c(j)} h_k \bm{e}_k)
+        - G_i(\bm{U})}{h_j}
+
+    so that the jacobian is obtained with the number of residual
+    evaluations equal to the number of colors instead of the number
+    of unknowns. The perturbed evaluations can be distributed
+    to a pool of processes.
+    '''
+
+    pattern = Instance(sp.spmatrix)
+    r'''Sparsity pattern of the jacobian ``(n_G, n_dofs)``.
+    '''
+
+    pattern_changed = Event
+
+    def set_pattern(self, pattern):
+        '''Set a new sparsity pattern. The coloring is recalculated
+        only if the pattern differs from the current one.
+        '''
+        pattern = sp.csr_matrix(pattern)
+        pattern.sort_indices()
+        current = self.pattern
+        if (current is None or current.shape != pattern.shape or
+                not np.array_equal(current.indptr, pattern.indptr) or
+                not np.array_equal(current.indices, pattern.indices)):
+            self.pattern = pattern
+            self.pattern_changed = True
+
+    colors = Property(depends_on='pattern_changed')
+    r'''Colors of the columns ``(n_dofs,)``.
+    '''
+    @cached_property
+    def _get_colors(self):
+        return get_column_colors(self.pattern)
+
+    n_colors = Property(depends_on='pattern_changed')
+    r'''Number of colors, i.e. the number of perturbed evaluations.
+    '''
+    @cached_property
+    def _get_n_colors(self):
+        if len(self.colors) == 0:
+            return 0
+        return np.max(self.colors) + 1
+
+    step = Float(1e-7)
+    r'''Relative perturbation of the unknowns.
+    '''
+
+    n_workers = Int(1)
+    r'''Number of processes evaluating the perturbed residuals.
+    The process pool requires the fork start method, otherwise
+    the residuals are evaluated sequentially.
+    '''
+
+    def get_jacobian(self, get_G, U, G_0=None):
+        '''Return the jacobian of the residual function get_G
+        at the vector U as a sparse matrix in the CSR format.
+        '''
+        U = np.asarray(U, dtype='float_')
+        pattern = self.pattern.tocoo()
+        colors = self.colors
+        if G_0 is None:
+            G_0 = np.asarray(get_G(U), dtype='float_')
+        h = self.step * np.maximum(1.0, np.fabs(U))
+        U_lst = []
+        for c in range(self.n_colors):
+            U_c = np.copy(U)
+            U_c[colors == c] += h[colors == c]
+            U_lst.append(U_c)
+        G_lst = self._eval(get_G, U_lst)
+        dG = np.array([np.asarray(G, dtype='float_') - G_0 for G in G_lst])
+        rows, cols = pattern.row, pattern.col
+        values = dG.reshape(self.n_colors, -1)[colors[cols], rows] / h[cols]
+        return sp.csr_matrix((values, (rows, cols)), shape=pattern.shape)
+
+    def _eval(self, get_G, U_lst):
+        if (self.n_workers > 1 and len(U_lst) > 1 and
+                'fork' in multiprocessing.get_all_start_methods()):
+            global _get_G
+            _get_G = get_G
+            ctx = multiprocessing.get_context('fork')
+            try:
+                with ctx.Pool(min(self.n_workers, len(U_lst))) as pool:
+                    return pool.map(_eval_G, U_lst)
+            finally:
+                _get_G = None
+        return [get_G(U_c) for U_c in U_lst]
@@ -21,3 +21,8 @@ class IFu(Interface):
     def get_f_du(self, t=0):
         '''Return the Jacobian of equality constraint values.
         '''
+
+    def get_f_ddu(self, p, t=0):
+        '''Return the product of the hessian of the goal function
+        with the vector p.
+        '''
@@ -4,7 +4,7 @@ Created on Oct 6, 2014
 @author: rch
 '''
 
-from traits.api import Interface
+from traits.api import Interface, Bool
 
 
 class IGu(Interface):
@@ -12,6 +12,11 @@ class IGu(Interface):
     '''Interface of an equality constraint.
     '''
 
+    constant_G_du = Bool
+    '''Indicates that the jacobian does not depend on the displacement
+    vector and on time so that it can be evaluated once and reused.
+    '''
+
     def get_G(self, t=0):
         '''Return the vector of equality constraint values.
         '''
@@ -20,6 +25,16 @@ class IGu(Interface):
         '''Return the jacobian of equality constraint values.
         '''
 
+    def get_G_du_sparse(self, t=0):
+        '''Return the jacobian of equality constraint values
+        as a sparse matrix.
+        '''
+
+    def get_G_ddu(self, v, p, t=0):
+        '''Return the product of the hessians of equality constraint values
+        weighted by the multipliers v with the vector p.
+        '''
+
     def __str__(self):
         '''Print as a string.
         '''
\ No newline at end of file
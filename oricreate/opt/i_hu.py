@@ -19,3 +19,8 @@ class IHu(Interface):
     def get_H_du(self, t=0):
         '''Return the jacobian of equality constraint values.
         '''
+
+    def get_H_du_sparse(self, t=0):
+        '''Return the jacobian of inequality constraint values
+        as a sparse matrix.
+        '''
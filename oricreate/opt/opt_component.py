@@ -5,10 +5,15 @@ Created on Nov 14, 2014
 '''
 
 from traits.api import \
-    HasStrictTraits, WeakRef, Property, Str
+    HasStrictTraits, WeakRef, Property, Str, Enum, Instance
 from traitsui.api import \
     View, Item
 
+import numpy as np
+
+from .fd_jacobian import \
+    FDJacobian, get_stencil_pattern
+
 
 class OptComponent(HasStrictTraits):
 
@@ -30,6 +35,94 @@ class OptComponent(HasStrictTraits):
         '''
         return
 
+    def compile(self):
+        '''Return a traits-free evaluator of the component
+        for the evaluation plan of a simulation step. The evaluator
+        delivers the values ``get_G(U, t)`` and the derivatives
+        ``get_G_du(U, t)`` as triplets of rows, columns and values
+        for the trial vector ``U``. The evaluator of a goal function
+        delivers the value ``get_f(U, t)`` and the gradient
+        ``get_f_du(U, t)`` instead. Components without a compiled form
+        return None and are evaluated through the crease pattern state.
+        '''
+        return None
+
+    def get_spec_key(self):
+        '''Return a key identifying the current content of the arrays
+        specifying the equations of the component, e.g. the dof
+        constraints, obtained by ``constraint_spec.get_spec_key``.
+        The forms compiled from the specification are rebuilt if
+        the key changes. Components without such arrays return None.
+        '''
+        return None
+
+    def validate_spec(self):
+        '''Rebuild the forms compiled from the specification of the
+        equations if it has been modified in place since the compilation
+        and return the key of the specification. The simulation step
+        calls the method once per step so that the evaluation of
+        the equations within the iterations uses the compiled forms
+        without checking the specification again.
+        '''
+        return self.get_spec_key()
+
+    du_stencil = Enum('dense', 'nodes', 'lines', 'facets', 'psi', 'stars')
+    '''Crease pattern entities associated with the equations
+    of the component. Each equation depends on the displacements of
+    the nodes of its node, line, facet, interior line (``psi``)
+    or of the vertex star of its interior node (``stars``),
+    respectively. The stencil defines the sparsity pattern of the finite
+    difference jacobian. The ``dense`` stencil makes each equation
+    depend on all displacements.
+    '''
+
+    has_du_pattern = Property
+    '''Indicates that the component provides a sparse pattern
+    of the jacobian so that the finite difference jacobian
+    is obtained with less evaluations than the number of dofs.
+    '''
+
+    def _get_has_du_pattern(self):
+        return self.du_stencil != 'dense'
+
+    def get_du_pattern(self, n_G):
+        '''Return the sparsity pattern of the jacobian ``(n_G, n_dofs)``.
+        '''
+        cp = self.formed_object
+        if self.du_stencil == 'dense':
+            return np.ones((n_G, cp.n_dofs), dtype='int8')
+        pattern = get_stencil_pattern(cp, self.du_stencil)
+        if pattern.shape[0] != n_G:
+            raise ValueError('%s: %d equations do not match the %d entities '
+                             'of the %s stencil' % (self.label, n_G,
+                                                    pattern.shape[0],
+                                                    self.du_stencil))
+        return pattern
+
+    _fd_jacobian = Instance(FDJacobian, ())
+
+    def get_du_fd(self, get_value, t=0, step=1e-7, n_workers=1):
+        '''Return the finite difference jacobian of the values delivered by
+        ``get_value(t)`` as a sparse matrix. The columns are perturbed
+        in groups obtained by coloring the pattern ``get_du_pattern``.
+        The crease pattern state is restored afterwards.
+        '''
+        cp = self.formed_object
+        U_0 = np.copy(cp.U)
+        G_0 = np.atleast_1d(get_value(t))
+
+        def get_G(U):
+            cp.U = U
+            return get_value(t)
+
+        fd = self._fd_jacobian
+        fd.trait_set(step=step, n_workers=n_workers)
+        fd.set_pattern(self.get_du_pattern(len(G_0)))
+        try:
+            return fd.get_jacobian(get_G, U_0, G_0)
+        finally:
+            cp.U = U_0
+
     def _get_formed_object(self):
         return self.forming_task.formed_object
 
@@ -1,4 +1,6 @@
 
+from .optimizer import \
+    Optimizer, OptimizerSLSQP, OptimizerTrustConstr
 from .simulation_config import SimulationConfig
 from .simulation_step import SimulationStep
 
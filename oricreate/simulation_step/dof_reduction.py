@@ -0,0 +1,197 @@
+# -------------------------------------------------------------------------
+#
+# Copyright (c) 2009, IMB, RWTH Aachen.
+# All rights reserved.
+#
+# This software is provided without warranty under the terms of the BSD
+# license included in oricreate/LICENSE.txt and may be redistributed only
+# under the conditions described in the aforementioned license.  The license
+# is also available online at http://www.simvisage.com/licenses/BSD.txt
+#
+# Thanks for using oricreate open source!
+#
+# Created on Oct 18, 2026 by: rch
+
+import numbers
+
+import scipy.sparse as sp
+from traits.api import \
+    HasStrictTraits, Property, cached_property, \
+    Int, List
+
+import numpy as np
+
+
+def get_rhs_value(rhs, t):
+    '''Evaluate the right-hand side of a dof constraint given
+    as a number or as a function of time.
+    '''
+    if rhs:
+        if isinstance(rhs, numbers.Number):
+            return rhs
+        elif callable(rhs):
+            return rhs(t)
+    return 0.0
+
+
+class DofReduction(HasStrictTraits):
+    r'''Elimination of prescribed and linked degrees of freedom.
+
+    The dof constraints with a single term :math:`c \, u_k = r(t)` prescribe
+    the value of the dof :math:`u_k`. The constraints with two terms
+    :math:`c_s \, u_s + c_m \, u_m = r(t)` express the slave dof
+    :math:`u_s` in terms of the master dof :math:`u_m`. Both are removed
+    from the vector of unknowns so that the displacement vector is
+    reconstructed from the free dofs :math:`\bm{V}` as
+
+    .. math::
+        \bm{U} = \bm{T} \, \bm{V} + \bm{g}(t)
+
+    and the corresponding constraint equations are removed from the system.
+    Constraints that cannot be eliminated, e.g. chained links or multiple
+    constraints of a single dof, are kept as equations.
+    '''
+
+    n_dofs = Int
+    r'''Number of degrees of freedom of the full displacement vector.
+    '''
+
+    n_G = Int
+    r'''Number of equality constraint equations.
+    '''
+
+    dof_constraints = List
+    r'''List of pairs ``(offset, dof_constraints)`` with the dof constraints
+    of ``GuDofConstraints`` and the position of their first equation
+    within the vector of equality constraints.
+    '''
+
+    _setup = Property(depends_on='n_dofs, n_G, dof_constraints')
+
+    @cached_property
+    def _get__setup(self):
+        n_D = 3
+        fixed = {}
+        linked = {}
+        masters = set()
+        link_cnstr = []
+        for offset, dof_constraints in self.dof_constraints:
+            for i, (lhs, rhs) in enumerate(dof_constraints):
+                if len(lhs) == 1:
+                    n, d, c = lhs[0]
+                    dof = n_D * int(n) + int(d)
+                    if c != 0 and dof not in fixed:
+                        fixed[dof] = (offset + i, c, rhs)
+                elif len(lhs) == 2:
+                    link_cnstr.append((offset + i, lhs, rhs))
+        for row, lhs, rhs in link_cnstr:
+            (n1, d1, c1), (n2, d2, c2) = lhs
+            dof1, dof2 = n_D * int(n1) + int(d1), n_D * int(n2) + int(d2)
+            for s, c_s, m, c_m in [(dof1, c1, dof2, c2), (dof2, c2, dof1, c1)]:
+                if (c_s != 0 and s != m and s not in fixed and
+                        s not in linked and s not in masters and
+                        m not in linked):
+                    linked[s] = (row, c_s, m, c_m, rhs)
+                    masters.add(m)
+                    break
+        free = np.ones((self.n_dofs,), dtype=bool)
+        free[list(fixed.keys())] = False
+        free[list(linked.keys())] = False
+        G_keep = np.ones((self.n_G,), dtype=bool)
+        G_keep[[cnstr[0] for cnstr in fixed.values()]] = False
+        G_keep[[cnstr[0] for cnstr in linked.values()]] = False
+        return fixed, linked, free, G_keep
+
+    free_dofs = Property(depends_on='_setup')
+    r'''Indexes of the free dofs within the full displacement vector.
+    '''
+    @cached_property
+    def _get_free_dofs(self):
+        return np.where(self._setup[2])[0]
+
+    n_free = Property(depends_on='_setup')
+    r'''Number of free dofs.
+    '''
+
+    def _get_n_free(self):
+        return len(self.free_dofs)
+
+    G_keep = Property(depends_on='_setup')
+    r'''Mask of the constraint equations kept in the system.
+    '''
+
+    def _get_G_keep(self):
+        return self._setup[3]
+
+    T = Property(depends_on='_setup')
+    r'''Sparse transformation matrix ``(n_dofs, n_free)``.
+    '''
+    @cached_property
+    def _get_T(self):
+        fixed, linked, free, G_keep = self._setup  # @UnusedVariable
+        free_dofs = self.free_dofs
+        free_col = np.full((self.n_dofs,), -1, dtype='int_')
+        free_col[free_dofs] = np.arange(len(free_dofs))
+        rows, cols, values = list(free_dofs), list(free_col[free_dofs]), \
+            [1.0] * len(free_dofs)
+        for s, (row, c_s, m, c_m, rhs) in linked.items():  # @UnusedVariable
+            if free[m]:
+                rows.append(s)
+                cols.append(free_col[m])
+                values.append(-c_m / c_s)
+        return sp.csr_matrix((values, (rows, cols)),
+                             shape=(self.n_dofs, len(free_dofs)))
+
+    def get_g(self, t):
+        '''Return the prescribed part of the displacement vector at time t.
+        '''
+        fixed, linked, free, G_keep = self._setup  # @UnusedVariable
+        g = np.zeros((self.n_dofs,), dtype='float_')
+        for dof, (row, c, rhs) in fixed.items():  # @UnusedVariable
+            g[dof] = get_rhs_value(rhs, t) / c
+        for s, (row, c_s, m, c_m, rhs) in linked.items():  # @UnusedVariable
+            g[s] = (get_rhs_value(rhs, t) - c_m * g[m]) / c_s
+        return g
+
+    def expand(self, V, t):
+        '''Return the full displacement vector for the free dofs V.
+        '''
+        return self.T.dot(V) + self.get_g(t)
+
+    def reduce(self, U):
+        '''Return the free dofs of the full displacement vector U.
+        '''
+        return U[self.free_dofs]
+
+    def expand_multipliers(self, v):
+        '''Return the multipliers of all constraint equations with zeros
+        inserted for the eliminated equations.
+        '''
+        v_full = np.zeros((self.n_G,), dtype='float_')
+        v_full[self.G_keep] = v
+        return v_full
+
+    def reduce_value(self, name, value):
+        '''Transform the goal function, constraints and their derivatives
+        evaluated for the full displacement vector to the free dofs.
+        '''
+        T = self.T
+        if name in ('f', 'H'):
+            return value
+        elif name == 'f_du':
+            return T.T.dot(np.ravel(value))
+        elif name == 'G':
+            return np.asarray(value)[self.G_keep] if len(value) else value
+        elif name == 'G_du':
+            if len(value) == 0:
+                return value
+            return np.asarray(T.T.dot(np.asarray(value)[self.G_keep].T).T)
+        elif name == 'G_du_sparse':
+            return (value.tocsr()[self.G_keep] * T).tocsr()
+        elif name == 'H_du':
+            if len(value) == 0:
+                return value
+            return np.asarray(T.T.dot(np.asarray(value).T).T)
+        elif name == 'H_du_sparse':
+            return (value.tocsr() * T).tocsr()
+        raise ValueError('unknown quantity %s' % name)
@@ -0,0 +1,208 @@
+# -------------------------------------------------------------------------
+#
+# Copyright (c) 2009, IMB, RWTH Aachen.
+# All rights reserved.
+#
+# This software is provided without warranty under the terms of the BSD
+# license included in oricreate/LICENSE.txt and may be redistributed only
+# under the conditions described in the aforementioned license.  The license
+# is also available online at http://www.simvisage.com/licenses/BSD.txt
+#
+# Thanks for using oricreate open source!
+#
+# Created on Oct 18, 2026 by: rch
+
+import scipy.sparse as sp
+
+import numpy as np
+
+
+class StateEvaluation(object):
+    '''Evaluation of an optimization component that has no compiled
+    form. The trial vector is set to the crease pattern state
+    before evaluating the component through its methods.
+    The number of equations ``n_G`` is obtained from the first evaluation.
+    '''
+
+    def __init__(self, plan, get_value, get_value_du):
+        self.plan = plan
+        self.get_value = get_value
+        self.get_value_du = get_value_du
+        self.n_G = None
+
+    def get_G(self, U, t=0):
+        self.plan.set_state(U)
+        G = np.atleast_1d(np.asarray(self.get_value(t), dtype='float_'))
+        self.n_G = len(G)
+        return G
+
+    def get_G_du(self, U, t=0):
+        self.plan.set_state(U)
+        G_du = sp.coo_matrix(self.get_value_du(t))
+        self.n_G = G_du.shape[0]
+        return G_du.row, G_du.col, G_du.data
+
+    def get_f(self, U, t=0):
+        self.plan.set_state(U)
+        return self.get_value(t)
+
+    def get_f_du(self, U, t=0):
+        self.plan.set_state(U)
+        return np.ravel(self.get_value_du(t))
+
+
+class ConstantJacobianEvaluation(object):
+    '''Evaluation of an equality constraint with a constant jacobian.
+    The jacobian is evaluated only once and kept in the dictionary
+    shared with the simulation step so that it is reused
+    in the subsequent time steps.
+    '''
+
+    def __init__(self, plan, compiled, gu, G_du_const):
+        self.plan = plan
+        self.compiled = compiled
+        self.gu = gu
+        self.G_du_const = G_du_const
+
+    @property
+    def n_G(self):
+        G_du = self.G_du_const.get(self.gu)
+        if G_du is None:
+            return self.compiled.n_G
+        return G_du.shape[0]
+
+    def get_G(self, U, t=0):
+        return self.compiled.get_G(U, t)
+
+    def get_G_du(self, U, t=0):
+        G_du = self.G_du_const.get(self.gu)
+        if G_du is None:
+            rows, cols, values = self.compiled.get_G_du(U, t)
+            G_du = self.G_du_const[self.gu] = sp.coo_matrix(
+                (values, (rows, cols)),
+                shape=(self.compiled.n_G, self.plan.n_dofs))
+        return G_du.row, G_du.col, G_du.data
+
+
+class EvaluationPlan(object):
+    r'''Traits-free evaluation of the goal function and constraints.
+
+    The plan is compiled from the configuration of a simulation
+    step by calling the method ``compile`` of the goal function
+    and of each equality and inequality constraint. The objects
+    delivered by ``compile`` hold the precomputed index arrays and
+    work buffers of the component. They evaluate the values
+    ``get_G(U, t)`` and the derivatives ``get_G_du(U, t)``
+    as triplets ``(rows, cols, values)`` directly from the trial
+    vector :math:`U` without accessing the crease pattern state.
+    The compiled goal function delivers the value ``get_f(U, t)``
+    and the gradient ``get_f_du(U, t)`` as a dense vector.
+    Components that cannot be compiled (``compile`` returns None)
+    are evaluated through the crease pattern state. The state is
+    then set only when the trial vector changes. The same applies
+    to the goal function with the gradient delivered by the function
+    ``f_du`` and to the constraints with the jacobians delivered by
+    the functions given in ``gu_du_lst`` and ``hu_du_lst`` instead
+    of their derivatives, e.g. by finite differences. The jacobians
+    of the equality constraints flagged with ``constant_G_du``
+    are evaluated once and stored in the dictionary ``G_du_const``.
+    '''
+
+    def __init__(self, cp_state, fu=None, gu_lst=None, hu_lst=None,
+                 gu_du_lst=None, hu_du_lst=None, G_du_const=None,
+                 f_du=None):
+        self.cp_state = cp_state
+        self.n_dofs = cp_state.n_dofs
+        gu_lst = gu_lst or []
+        hu_lst = hu_lst or []
+        if fu is None:
+            self.fu = None
+        elif f_du is None:
+            self.fu = self._compile(fu, fu.get_f, fu.get_f_du)
+        else:
+            self.fu = StateEvaluation(self, fu.get_f, f_du)
+        gu_du_lst = gu_du_lst or [None] * len(gu_lst)
+        hu_du_lst = hu_du_lst or [None] * len(hu_lst)
+        self.gu_lst = [self._compile(gu, gu.get_G, self._get_G_du(gu))
+                       if get_G_du is None else
+                       StateEvaluation(self, gu.get_G, get_G_du)
+                       for gu, get_G_du in zip(gu_lst, gu_du_lst)]
+        G_du_const = {} if G_du_const is None else G_du_const
+        self.gu_lst = [ConstantJacobianEvaluation(self, compiled,
+                                                  gu, G_du_const)
+                       if getattr(gu, 'constant_G_du', False) else compiled
+                       for gu, compiled in zip(gu_lst, self.gu_lst)]
+        self.hu_lst = [self._compile(hu, hu.get_H, hu.get_H_du_sparse)
+                       if get_H_du is None else
+                       StateEvaluation(self, hu.get_H, get_H_du)
+                       for hu, get_H_du in zip(hu_lst, hu_du_lst)]
+
+    def _compile(self, component, get_value, get_value_du):
+        compiled = component.compile()
+        if compiled is None:
+            compiled = StateEvaluation(self, get_value, get_value_du)
+        return compiled
+
+    def _get_G_du(self, gu):
+        get_G_du_sparse = getattr(gu, 'get_G_du_sparse', None)
+        return get_G_du_sparse if get_G_du_sparse else gu.get_G_du
+
+    def _get_offsets(self, compiled_lst):
+        n_G_lst = [compiled.n_G for compiled in compiled_lst]
+        return np.hstack([[0], np.cumsum(n_G_lst, dtype='int_')])
+
+    def set_state(self, U):
+        '''Set the trial vector to the crease pattern state
+        if it differs from the current one.
+        '''
+        cp_state = self.cp_state
+        if not np.array_equal(cp_state.u.flatten(), U):
+            cp_state.U = np.copy(U)
+
+    def _get_values(self, compiled_lst, U, t):
+        if compiled_lst == []:
+            return []
+        return np.hstack([compiled.get_G(U, t) for compiled in compiled_lst])
+
+    def _get_values_du(self, compiled_lst, U, t):
+        '''Assemble the jacobians of the components. The row offsets
+        are obtained after the evaluation so that the number of equations
+        of the components evaluated through the state is available.
+        '''
+        du_lst = [compiled.get_G_du(U, t) for compiled in compiled_lst]
+        if du_lst == []:
+            return sp.csr_matrix((0, self.n_dofs))
+        offsets = self._get_offsets(compiled_lst)
+        rows, cols, values = zip(*du_lst)
+        rows = [r + offset for r, offset in zip(rows, offsets)]
+        return sp.csr_matrix((np.hstack(values),
+                              (np.hstack(rows), np.hstack(cols))),
+                             shape=(offsets[-1], self.n_dofs))
+
+    def get_f(self, U, t=0):
+        return self.fu.get_f(U, t)
+
+    def get_f_du(self, U, t=0):
+        return self.fu.get_f_du(U, t)
+
+    def get_G(self, U, t=0):
+        return self._get_values(self.gu_lst, U, t)
+
+    def get_G_du_sparse(self, U, t=0):
+        return self._get_values_du(self.gu_lst, U, t)
+
+    def get_G_du(self, U, t=0):
+        if self.gu_lst == []:
+            return []
+        return self.get_G_du_sparse(U, t).toarray()
+
+    def get_H(self, U, t=0):
+        return self._get_values(self.hu_lst, U, t)
+
+    def get_H_du_sparse(self, U, t=0):
+        return self._get_values_du(self.hu_lst, U, t)
+
+    def get_H_du(self, U, t=0):
+        if self.hu_lst == []:
+            return []
+        return self.get_H_du_sparse(U, t).toarray()
@@ -0,0 +1,171 @@
+# -------------------------------------------------------------------------
+#
+# Copyright (c) 2009, IMB, RWTH Aachen.
+# All rights reserved.
+#
+# This software is provided without warranty under the terms of the BSD
+# license included in oricreate/LICENSE.txt and may be redistributed only
+# under the conditions described in the aforementioned license.  The license
+# is also available online at http://www.simvisage.com/licenses/BSD.txt
+#
+# Thanks for using oricreate open source!
+#
+# Created on Oct 18, 2026 by: rch
+
+import scipy.linalg as la
+import scipy.sparse.linalg as spla
+from traits.api import \
+    HasStrictTraits, Enum, Int, List, Tuple, Callable, Property
+
+import numpy as np
+
+
+class JacobianSolver(HasStrictTraits):
+    r'''Factorized jacobian of the Newton-Raphson iteration.
+
+    The jacobian :math:`\bm{J}` supplied to the method ``factorize``
+    is decomposed once and can be used to solve several linear systems
+    with the method ``solve``. Between two factorizations, the inverse
+    of the jacobian can be improved by the rank-one Broyden updates
+
+    .. math::
+        \bm{H}_{k+1} = \bm{H}_k +
+        \frac{(\bm{s} - \bm{H}_k \bm{y}) \, \bm{s}^T \bm{H}_k}
+             {\bm{s}^T \bm{H}_k \bm{y}}
+
+    with the increment of the unknowns :math:`\bm{s}` and the increment
+    of the residuum :math:`\bm{y}`. The updates are stored as pairs
+    of vectors and applied on top of the factorization.
+    '''
+
+    linear_solver = Enum('dense', 'sparse')
+    r'''Factorization of the dense or sparse jacobian.
+    '''
+
+    lsq_solver = Enum('lsmr', 'lsqr')
+    r'''Iterative least-squares solver used for non-square
+    or singular sparse jacobians.
+    '''
+
+    n_factorizations = Int(0)
+    r'''Number of factorizations performed so far.
+    '''
+
+    _solve = Callable
+    r'''Solver of the factorized system ``_solve(R, trans)``.
+    '''
+
+    _updates = List
+    r'''Rank-one updates of the inverse jacobian.
+    '''
+
+    _perm_c = Tuple
+    r'''Sparsity pattern of the last factorized sparse jacobian
+    and the column permutation of its SuperLU factorization.
+    '''
+
+    is_factorized = Property
+    r'''Indicates that a jacobian has been factorized.
+    '''
+
+    def _get_is_factorized(self):
+        return self._solve is not None
+
+    def factorize(self, dR):
+        '''Factorize the jacobian and discard the previous updates.
+        The previous factorization is discarded before the new one
+        is attempted so that a failed factorization is not reused.
+        '''
+        self._solve = None
+        self._updates = []
+        if self.linear_solver == 'sparse':
+            self._solve = self._factorize_sparse(dR)
+        else:
+            self._solve = self._factorize_dense(dR)
+        self.n_factorizations += 1
+
+    def solve(self, R):
+        '''Return the solution of the linear system with the right-hand-side R
+        using the factorized jacobian and the rank-one updates.
+        '''
+        d_U = self._solve(R, 'N')
+        for p, q in self._updates:
+            d_U += p * np.dot(q, R)
+        return d_U
+
+    def solve_transposed(self, R):
+        '''Return the solution of the transposed linear system.
+        '''
+        d_U = self._solve(R, 'T')
+        for p, q in self._updates:
+            d_U += q * np.dot(p, R)
+        return d_U
+
+    def update(self, s, y):
+        '''Broyden update of the inverse jacobian with the increment
+        of the unknowns s and the corresponding increment of the residuum y.
+        '''
+        H_y = self.solve(y)
+        s_H_y = np.dot(s, H_y)
+        if s_H_y == 0:
+            return
+        self._updates.append(((s - H_y) / s_H_y, self.solve_transposed(s)))
+
+    def _factorize_dense(self, dR):
+        lu_piv = la.lu_factor(dR, check_finite=False)
+        if np.any(np.diag(lu_piv[0]) == 0):
+            raise np.linalg.LinAlgError('Singular matrix')
+
+        def solve(R, trans):
+            return la.lu_solve(lu_piv, R, trans=(0 if trans == 'N' else 1),
+                               check_finite=False)
+        return solve
+
+    def _factorize_sparse(self, dR):
+        '''Factorize the sparse jacobian dR.
+
+        Square systems are factorized using SuperLU. The fill-reducing
+        column permutation obtained in the first factorization is stored
+        and applied to the subsequent jacobians with the same sparsity
+        pattern, so that only the numerical factorization is repeated.
+        Non-square and singular systems are solved in the least-squares
+        sense using the iterative ``lsq_solver``.
+        '''
+        n_rows, n_cols = dR.shape
+        if n_rows == n_cols:
+            try:
+                return self._factorize_splu(dR)
+            except RuntimeError:
+                pass
+        lsq = spla.lsqr if self.lsq_solver == 'lsqr' else spla.lsmr
+        dR = dR.tocsr()
+
+        def solve(R, trans):
+            A = dR if trans == 'N' else dR.T
+            return lsq(A, R, atol=1e-12, btol=1e-12)[0]
+        return solve
+
+    def _factorize_splu(self, dR):
+        dR = dR.tocsc()
+        dR.sort_indices()
+        if self._perm_c:
+            shape, indptr, indices, perm_c = self._perm_c
+            if (shape == dR.shape and
+                    np.array_equal(indptr, dR.indptr) and
+                    np.array_equal(indices, dR.indices)):
+                lu = spla.splu(dR[:, perm_c], permc_spec='NATURAL')
+
+                def solve(R, trans):
+                    if trans == 'N':
+                        d_U = np.zeros_like(R)
+                        d_U[perm_c] = lu.solve(R)
+                        return d_U
+                    return lu.solve(R[perm_c], trans='T')
+                return solve
+        lu = spla.splu(dR)
+        self._perm_c = (dR.shape, np.copy(dR.indptr), np.copy(dR.indices),
+                        np.copy(lu.perm_c))
+
+        def solve(R, trans):
+            return lu.solve(R, trans=trans)
+        return solve
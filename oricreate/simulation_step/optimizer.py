@@ -0,0 +1,227 @@
+# -------------------------------------------------------------------------
+#
+# Copyright (c) 2009, IMB, RWTH Aachen.
+# All rights reserved.
+#
+# This software is provided without warranty under the terms of the BSD
+# license included in oricreate/LICENSE.txt and may be redistributed only
+# under the conditions described in the aforementioned license.  The license
+# is also available online at http://www.simvisage.com/licenses/BSD.txt
+#
+# Thanks for using oricreate open source!
+#
+# Created on Oct 18, 2026 by: rch
+
+from scipy.optimize import \
+    fmin_slsqp, minimize, NonlinearConstraint, BFGS
+from scipy.sparse.linalg import \
+    LinearOperator
+from traits.api import \
+    HasStrictTraits, Float, Int
+
+import numpy as np
+
+
+class Optimizer(HasStrictTraits):
+    r'''Base class of the constrained optimization backends.
+
+    The backend minimizes the goal function of a simulation step
+    subject to its equality and inequality constraints. The values
+    and derivatives are obtained through the methods ``get_f_t``,
+    ``get_G_t``, ``get_H_t`` and their derivatives
+    of the simulation step.
+    '''
+
+    def minimize(self, sim_step, U_0):
+        '''Return the tuple ``(U, f, n_iter, converged, message)``
+        obtained by the minimization starting from the vector U_0.
+        '''
+        raise NotImplementedError
+
+
+class OptimizerSLSQP(Optimizer):
+    r'''Sequential Least Square Quadratic Programming method
+    using the dense implementation ``scipy.optimize.fmin_slsqp``.
+    '''
+
+    iprint = Int(2)
+    r'''Verbosity of the optimizer output.
+    '''
+
+    def minimize(self, sim_step, U_0):
+        config = sim_step.config
+        d0 = sim_step.get_f_t(U_0)
+        eps = d0 * 1e-4
+        get_f_du_t = None
+        get_G_du_t = None
+        get_H_t = None
+        get_H_du_t = None
+
+        # the derivatives are provided by the simulation step either
+        # analytically or by colored finite differences, otherwise
+        # they are approximated by the optimizer
+        if sim_step.has_f_du:
+            get_f_du_t = sim_step.get_f_du_t
+        if sim_step.has_G_du:
+            get_G_du_t = sim_step.get_G_du_t
+        if config.has_H:
+            get_H_t = sim_step.get_H_t
+            if sim_step.has_H_du:
+                get_H_du_t = sim_step.get_H_du_t
+
+        info = fmin_slsqp(sim_step.get_f_t,
+                          U_0,
+                          fprime=get_f_du_t,
+                          f_eqcons=sim_step.get_G_t,
+                          fprime_eqcons=get_G_du_t,
+                          f_ieqcons=get_H_t,
+                          fprime_ieqcons=get_H_du_t,
+                          acc=config.acc, iter=config.MAX_ITER,
+                          iprint=self.iprint,
+                          full_output=True,
+                          epsilon=eps)
+        U, f, n_iter, imode, smode = info
+        return U, f, n_iter, imode == 0, 'err: %d, %s' % (imode, smode)
+
+
+class OptimizerTrustConstr(Optimizer):
+    r'''Trust-region interior point method using
+    ``scipy.optimize.minimize(method='trust-constr')``.
+
+    The jacobians of the equality and inequality constraints
+    are supplied as sparse matrices. The hessian of the goal function
+    and the hessians of the constraints multiplied with the Lagrange
+    multipliers :math:`\bm{v}` are supplied as linear operators
+    evaluating the products with a vector :math:`\bm{p}`
+    by the finite difference of the gradients
+
+    .. math::
+        \nabla^2 f \, \bm{p} \approx
+        \frac{\nabla f(\bm{U} + h \bm{p}) - \nabla f(\bm{U})}{h}
+
+    so that no dense matrix of the size of the unknowns is constructed.
+    Components providing the hessian-vector products ``get_f_ddu``
+    and ``get_G_ddu`` are evaluated analytically instead.
+    If the analytical derivatives are switched off, the hessians
+    are approximated by the quasi-Newton updates. The derivatives
+    not supplied by the simulation step are approximated
+    by the optimizer.
+    '''
+
+    fd_step = Float(1e-7)
+    r'''Relative step size of the finite difference
+    hessian-vector products.
+    '''
+
+    initial_tr_radius = Float(1.0)
+    r'''Initial trust radius. Smaller values prevent large trial steps
+    in the first iterations of a time step.
+    '''
+
+    initial_constr_penalty = Float(1.0)
+    r'''Initial penalty of the constraint violation in the merit function.
+    Goal functions with large values, e.g. the total potential energy
+    of loaded structures, require larger penalties.
+    '''
+
+    verbose = Int(1)
+    r'''Verbosity of the optimizer output.
+    '''
+
+    def minimize(self, sim_step, U_0):
+        config = sim_step.config
+        constraints = []
+        if len(sim_step.gu_lst) > 0:
+            jac = sim_step.get_G_du_sparse_t
+            if not sim_step.has_G_du:
+                jac, hess = '2-point', BFGS()
+            elif not config.use_G_du:
+                hess = BFGS()
+            elif sim_step.has_G_ddu:
+                hess = self._get_cnstr_hess_ddu(sim_step.get_G_ddu_t)
+            else:
+                hess = self._get_cnstr_hess(jac)
+            constraints.append(
+                NonlinearConstraint(sim_step.get_G_t, 0.0, 0.0,
+                                    jac=jac, hess=hess)
+            )
+        if config.has_H:
+            jac = sim_step.get_H_du_sparse_t
+            if not sim_step.has_H_du:
+                jac, hess = '2-point', BFGS()
+            elif not config.use_H_du:
+                hess = BFGS()
+            else:
+                hess = self._get_cnstr_hess(jac)
+            constraints.append(
+                NonlinearConstraint(sim_step.get_H_t, 0.0, np.inf,
+                                    jac=jac, hess=hess)
+            )
+        if sim_step.has_f_du:
+            def jac(U):
+                return np.ravel(sim_step.get_f_du_t(U))
+            if not config.use_f_du:
+                hess = BFGS()
+            elif sim_step.has_f_ddu:
+                hess = self._get_hess_ddu(sim_step.get_f_ddu_t)
+            else:
+                hess = self._get_hess(jac)
+        else:
+            jac, hess = '2-point', BFGS()
+        res = minimize(sim_step.get_f_t, U_0, method='trust-constr',
+                       jac=jac, hess=hess, constraints=constraints,
+                       options=dict(gtol=config.acc, xtol=config.acc,
+                                    maxiter=config.MAX_ITER,
+                                    initial_tr_radius=self.initial_tr_radius,
+                                    initial_constr_penalty=(
+                                        self.initial_constr_penalty),
+                                    verbose=self.verbose))
+        # the step size criterion is accepted only for a feasible solution
+        converged = (res.status == 1 or res.status == 2 and
+                     res.constr_violation <= config.acc)
+        return res.x, res.fun, res.nit, converged, res.message
+
+    def _get_product(self, get_g, U):
+        '''Return the linear operator of the finite difference
+        hessian-vector product for the gradient function get_g.
+        '''
+        g_0 = get_g(U)
+        n = len(U)
+        h_0 = self.fd_step * max(1.0, np.linalg.norm(U))
+
+        def matvec(p):
+            p = np.ravel(p)
+            p_norm = np.linalg.norm(p)
+            if p_norm == 0:
+                return np.zeros_like(p)
+            h = h_0 / p_norm
+            return (get_g(U + h * p) - g_0) / h
+        return LinearOperator((n, n), matvec=matvec, dtype='float_')
+
+    def _get_hess_ddu(self, get_f_ddu):
+        def hess(U):
+            def matvec(p):
+                return get_f_ddu(U, np.ravel(p))
+            n = len(U)
+            return LinearOperator((n, n), matvec=matvec, dtype='float_')
+        return hess
+
+    def _get_cnstr_hess_ddu(self, get_G_ddu):
+        def hess(U, v):
+            def matvec(p):
+                return get_G_ddu(U, v, np.ravel(p))
+            n = len(U)
+            return LinearOperator((n, n), matvec=matvec, dtype='float_')
+        return hess
+
+    def _get_hess(self, get_f_du):
+        def hess(U):
+            return self._get_product(get_f_du, U)
+        return hess
+
+    def _get_cnstr_hess(self, get_G_du):
+        def hess(U, v):
+            def get_g(U):
+                return get_G_du(U).T.dot(v)
+            return self._get_product(get_g, U)
+        return hess
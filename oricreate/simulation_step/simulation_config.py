@@ -6,7 +6,7 @@ Created on Oct 29, 2014
 
 from traits.api import \
     HasStrictTraits, Property, cached_property, provides, \
-    Int, Trait, Instance, Bool, Dict, Str,  Float
+    Int, Trait, Instance, Bool, Dict, Str,  Float, Enum
 from traitsui.api import \
     View, UItem,  TableEditor, ObjectColumn, \
     Tabbed, VSplit
@@ -15,6 +15,9 @@ from oricreate.fu import \
 from oricreate.opt import \
     IOpt, IFu, IGu, IHu
 
+from .optimizer import \
+    Optimizer, OptimizerSLSQP, OptimizerTrustConstr
+
 gu_list_editor = TableEditor(
     columns=[ObjectColumn(label='Type', name='label'),
              ],
@@ -110,6 +113,22 @@ class SimulationConfig(HasStrictTraits):
     def _get_has_H(self):
         return len(self.hu) > 0
 
+    optimizer_type = Trait('slsqp',
+                           {'slsqp': OptimizerSLSQP,
+                            'trust-constr': OptimizerTrustConstr
+                            },
+                           input_change=True)
+    r'''Type of the constrained optimization backend used
+    if a goal function is specified.
+    '''
+
+    optimizer = Property(Instance(Optimizer), depends_on='optimizer_type')
+    r'''Optimization backend.
+    '''
+    @cached_property
+    def _get_optimizer(self):
+        return self.optimizer_type_()
+
     show_iter = Bool(False, auto_set=False, enter_set=True)
     r'''Saves the first 10 iteration steps, so they can be analyzed
     '''
@@ -123,15 +142,136 @@ class SimulationConfig(HasStrictTraits):
     '''
 
     use_f_du = Bool(True, auto_set=False, enter_set=True)
-    r'''Switch the use of goal function derivatives on.
+    r'''Switch the use of goal function derivatives on. Otherwise,
+    the gradient of a goal function with a sparse stencil
+    is obtained by colored finite differences, the gradient of the
+    remaining goal functions is approximated by the optimizer.
     '''
 
     use_G_du = Bool(True, auto_set=False, enter_set=True)
-    r'''Switch the use of constraint derivatives on.
+    r'''Switch the use of constraint derivatives on. Otherwise,
+    the jacobian is obtained by colored finite differences
+    using the sparsity pattern of the constraints. If any of the
+    constraints does not provide a sparse pattern, the jacobian
+    is approximated by the optimizer.
     '''
 
     use_H_du = Bool(True, auto_set=False, enter_set=True)
-    r'''Switch the use of constraint derivatives on.
+    r'''Switch the use of constraint derivatives on. Otherwise,
+    the jacobian is obtained by colored finite differences
+    using the sparsity pattern of the constraints. If any of the
+    constraints does not provide a sparse pattern, the jacobian
+    is approximated by the optimizer.
+    '''
+
+    fd_step = Float(1e-7, auto_set=False, enter_set=True)
+    r'''Relative perturbation of the unknowns in the finite difference
+    derivatives of the goal function and constraints.
+    '''
+
+    fd_n_workers = Int(1, auto_set=False, enter_set=True)
+    r'''Number of processes evaluating the perturbed values
+    of the finite difference derivatives.
+    '''
+
+    eval_cache_size = Int(4, auto_set=False, enter_set=True)
+    r'''Number of trial vectors for which the values of the goal function,
+    constraints and their derivatives are kept in the evaluation cache
+    of the simulation step. Zero switches the cache off.
+    '''
+
+    use_eval_plan = Bool(False, auto_set=False, enter_set=True)
+    r'''Evaluate the goal function and constraints using a compiled
+    traits-free evaluation plan. Components providing a compiled form
+    are evaluated directly from the trial vector, the remaining ones
+    through the crease pattern state.
+    '''
+
+    eliminate_dofs = Bool(False, auto_set=False, enter_set=True)
+    r'''Eliminate the dofs prescribed by the single-dof constraints
+    and the slave dofs of the linked pairs of dofs in ``GuDofConstraints``
+    from the vector of unknowns. The corresponding constraint equations
+    are removed and the displacement vector is reconstructed
+    from the free dofs.
+    '''
+
+    linear_solver = Enum('dense', 'sparse', auto_set=False, enter_set=True)
+    r'''Solver of the linearized system within the Newton-Raphson
+    iteration. The ``dense`` solver factorizes the full jacobian
+    using ``scipy.linalg.lu_factor`` and solves with ``lu_solve``.
+    The ``sparse`` solver uses the sparse jacobian and the SuperLU
+    factorization from ``scipy.sparse.linalg``. Both factorizations
+    are kept by the ``JacobianSolver`` of the simulation step so that
+    they can be reused by the modified Newton iteration
+    (``jacobian_update``).
+    The column ordering of the factorization is reused as long as
+    the sparsity pattern of the jacobian remains unchanged.
+    Non-square or singular systems are solved in the least-squares
+    sense using the iterative solver ``lsq_solver``.
+    '''
+
+    lsq_solver = Enum('lsmr', 'lsqr', auto_set=False, enter_set=True)
+    r'''Iterative least-squares solver used by the ``sparse`` linear solver
+    for non-square or singular systems.
+    '''
+
+    jacobian_update = Enum('newton', 'modified newton', 'broyden',
+                           auto_set=False, enter_set=True)
+    r'''Treatment of the jacobian within the Newton-Raphson iteration.
+    The ``newton`` scheme evaluates and factorizes the jacobian
+    in every iteration. The ``modified newton`` scheme keeps
+    the factorized jacobian until it gets refreshed according to
+    the refresh policy given by ``jacobian_refresh_ratio``,
+    ``jacobian_refresh_iter`` and ``jacobian_refresh_step``.
+    The ``broyden`` scheme additionally improves the kept jacobian
+    by rank-one updates in each iteration.
+    '''
+
+    jacobian_refresh_ratio = Float(0.5, auto_set=False, enter_set=True)
+    r'''Refresh the kept jacobian if the norm of the residuum
+    decreases by less than this ratio within an iteration.
+    '''
+
+    jacobian_refresh_iter = Int(10, auto_set=False, enter_set=True)
+    r'''Refresh the kept jacobian after the given number
+    of iterations. Zero switches this criterion off.
+    '''
+
+    jacobian_refresh_step = Bool(False, auto_set=False, enter_set=True)
+    r'''Refresh the kept jacobian at the beginning of each time step.
+    Otherwise, the jacobian of the previous step is reused.
+    '''
+
+    adaptive_time_step = Bool(False, auto_set=False, enter_set=True)
+    r'''Switch the adaptive time stepping on. The simulation task starts
+    with the first time increment of its time array and marches to its
+    last time value. Time increments that fail to converge are bisected
+    and the increment is enlarged after a fast convergence.
+    '''
+
+    time_step_bisections = Int(8, auto_set=False, enter_set=True)
+    r'''Maximum number of consecutive bisections of a time increment.
+    '''
+
+    time_step_grow_iter = Int(3, auto_set=False, enter_set=True)
+    r'''Enlarge the time increment if the step converged within
+    the given number of iterations.
+    '''
+
+    time_step_grow_factor = Float(2.0, auto_set=False, enter_set=True)
+    r'''Factor enlarging the time increment after a fast convergence.
+    '''
+
+    time_step_max = Float(0.0, auto_set=False, enter_set=True)
+    r'''Maximum time increment. Zero means no limit.
+    '''
+
+    predictor = Enum('none', 'linear', 'quadratic',
+                     auto_set=False, enter_set=True)
+    r'''Predictor of the trial displacement vector at the beginning of a time
+    step. The ``linear`` and ``quadratic`` predictors extrapolate
+    the displacements converged in the last two or three time steps.
+    With ``none``, the time step starts from the previous converged state.
     '''
 
     def validate_input(self):
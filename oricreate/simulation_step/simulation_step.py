@@ -12,14 +12,14 @@
 #
 # Created on Jan 29, 2013 by: rch
 
+from collections import OrderedDict
 import platform
 import time
 
-from scipy.optimize import \
-    fmin_slsqp
+import scipy.sparse as sp
 from traits.api import \
     HasStrictTraits, Event, Property, cached_property, \
-    Bool, Float, DelegatesTo, List, \
+    Bool, Float, Int, DelegatesTo, List, Dict, \
     Instance, WeakRef, Array
 
 import numpy as np
@@ -27,6 +27,14 @@ from oricreate.crease_pattern import \
     CreasePatternState
 from oricreate.forming_tasks import \
     FormingTask
+from oricreate.gu import \
+    GuDofConstraints
+from .dof_reduction import \
+    DofReduction
+from .evaluation_plan import \
+    EvaluationPlan
+from .jacobian_solver import \
+    JacobianSolver
 from .simulation_config import \
     SimulationConfig
 
@@ -37,6 +45,20 @@ elif platform.system() == 'Windows':
     sysclock = time.clock
 
 
+def get_read_only_view(value):
+    '''Return a view of the array or of the sparse matrix value
+    that cannot be modified in place. Scalar values are returned unchanged.
+    '''
+    if sp.issparse(value):
+        value = value.__class__(value, copy=False)
+        value.data = value.data.view()
+        value.data.setflags(write=False)
+    elif isinstance(value, np.ndarray):
+        value = value.view()
+        value.setflags(write=False)
+    return value
+
+
 class SimulationStep(HasStrictTraits):
     r"""Class implementing the transition of the formed object 
     from its initial time to the target time :math:`t`.
@@ -98,7 +120,7 @@ class SimulationStep(HasStrictTraits):
     '''
     @cached_property
     def _get_hu_lst(self):
-        for hu in self.config.gu_lst:
+        for hu in self.config.hu_lst:
             hu.forming_task = self.forming_task
         return self.config.hu_lst
 
@@ -137,6 +159,14 @@ class SimulationStep(HasStrictTraits):
     def _set_U(self, value):
         self.cp_state.U = value
 
+    n_iter = Int(0)
+    r'''Number of iterations needed to reach the target time :math:`t`.
+    '''
+
+    converged = Bool(False)
+    r'''Indicates that the solver converged at the target time :math:`t`.
+    '''
+
     U_t = Property(depends_on='t')
     r'''Final displacement vector :math:`X` at target time :math:`t`.
     '''
@@ -176,6 +206,11 @@ class SimulationStep(HasStrictTraits):
         '''Decide which solver to take and start it.
         '''
         self.config.validate_input()
+        self.validate_spec()
+        self.clear_eval_cache()
+        self._n_G_lst = []
+        self.compile_eval_plan()
+        self.setup_dof_reduction()
         if self.config.goal_function_type_ is not None:
             U_t = self._solve_fmin()
         else:
@@ -185,24 +220,62 @@ class SimulationStep(HasStrictTraits):
 
         return U_t
 
+    jacobian_solver = Instance(JacobianSolver, ())
+    r'''Factorized jacobian of the Newton-Raphson iteration kept
+    between the iterations and time steps.
+    '''
+
     def _solve_nr(self):
         '''Find the solution using the Newton-Raphson procedure.
         '''
+        self.validate_spec()
         i = 0
+        self.converged = False
         U_save = np.copy(self.U)
-        acc = self.config.acc
-        max_iter = self.config.MAX_ITER
+        U = self.reduce(U_save)
+        config = self.config
+        acc = config.acc
+        max_iter = config.MAX_ITER
+        sparse = config.linear_solver == 'sparse'
+        update = config.jacobian_update
+        js = self.jacobian_solver
+        js.trait_set(linear_solver=config.linear_solver,
+                     lsq_solver=config.lsq_solver)
+        n_factorizations = js.n_factorizations
+        refresh = (update == 'newton' or config.jacobian_refresh_step or
+                   not js.is_factorized)
+        n_kept = 0
+        nR_prev = None
         while i <= max_iter:
-            dR = self.get_G_du_t(self.U)
-            R = self.get_G_t(self.U)
+            R = self.get_G_t(U)
             nR = np.linalg.norm(R)
             if nR < acc:
                 print('==== converged in ', i, 'iterations ====')
+                self.converged = True
                 break
+            if nR_prev is not None and update != 'newton':
+                refresh = (
+                    refresh or
+                    nR > config.jacobian_refresh_ratio * nR_prev or
+                    (config.jacobian_refresh_iter > 0 and
+                     n_kept >= config.jacobian_refresh_iter)
+                )
+                if not refresh and update == 'broyden':
+                    js.update(d_U, R - R_prev)
             try:
-                d_U = np.linalg.solve(dR, -R)
-                self.U += d_U  # in-place increment
+                if refresh:
+                    if sparse:
+                        dR = self.get_G_du_sparse_t(U)
+                    else:
+                        dR = self.get_G_du_t(U)
+                    js.factorize(dR)
+                    n_kept = 0
+                d_U = js.solve(-R)
+                U = U + d_U
                 i += 1
+                n_kept += 1
+                refresh = update == 'newton'
+                nR_prev, R_prev = nR, R
             except Exception as inst:
                 print('=== Problems solving iteration step %d  ====' % i)
                 print('=== Exception message: ', inst)
@@ -211,54 +284,210 @@ class SimulationStep(HasStrictTraits):
         else:
             self.U = U_save
             print('==== did not converge in %d iterations ====' % i)
+        if self.converged:
+            self.U = self.expand(U)
 
+        self.n_iter = i
+        if update != 'newton':
+            print('==== jacobian factorized %d times ====' %
+                  (js.n_factorizations - n_factorizations))
         # update the state object with the new displacement vector
         return self.U
 
     def _solve_fmin(self):
-        '''Solve the problem using the
-        Sequential Least Square Quadratic Programming method.
+        '''Solve the problem using the constrained optimization backend
+        specified in the configuration. Sequential Least Square Quadratic
+        Programming method is used by default.
         '''
-        print('==== solving with SLSQP optimization ====')
+        self.validate_spec()
+        config = self.config
+        print('==== solving with %s optimization ====' % config.optimizer_type)
         U_save = np.copy(self.U)
-        d0 = self.get_f_t(self.U)
-        eps = d0 * 1e-4
-        get_f_du_t = None
-        get_G_du_t = None
-        get_H_t = None
-        get_H_du_t = None
-        acc = self.config.acc
-        max_iter = self.config.MAX_ITER
-
-        if self.config.use_f_du:
-            get_f_du_t = self.get_f_du_t
-        if self.config.use_G_du:
-            get_G_du_t = self.get_G_du_t
-        if self.config.has_H:
-            get_H_t = self.get_H_t
-            if self.config.use_H_du:
-                get_H_du_t = self.get_H_du_t
-
-        info = fmin_slsqp(self.get_f_t,
-                          self.U,
-                          fprime=get_f_du_t,
-                          f_eqcons=self.get_G_t,
-                          fprime_eqcons=get_G_du_t,
-                          #                           f_ieqcons=get_H_t,
-                          #                           fprime_ieqcons=get_H_du_t,
-                          acc=acc, iter=max_iter,
-                          iprint=2,
-                          full_output=True,
-                          epsilon=eps)
-        U, f, n_iter, imode, smode = info
-        if imode == 0:
+        U, f, n_iter, converged, message = \
+            config.optimizer.minimize(self, self.reduce(U_save))
+        self.n_iter = n_iter
+        self.converged = converged
+        if converged:
+            self.U = self.expand(U)
             print('(time: %g, iter: %d, f: %g)' % (self.t, n_iter, f))
         else:
             # no convergence reached.
             self.U = U_save
-            print('(time: %g, iter: %d, f: %g, err: %d, %s)' % \
-                (self.t, n_iter, f, imode, smode))
-        return U
+            print('(time: %g, iter: %d, f: %g, %s)' %
+                  (self.t, n_iter, f, message))
+        return self.expand(U)
+
+    _spec_key = List
+    r'''Specification keys of the constraints for which the evaluation
+    cache, the constant jacobians, the dof reduction and
+    the evaluation plan have been set up.
+    '''
+
+    def validate_spec(self):
+        '''Reset the quantities derived from the specification
+        of the constraints if it has been modified since they were
+        set up, e.g. by an in-place edit of the array ``dof_constraints``
+        between two calls of the solver. The components recompile
+        their equations in ``validate_spec`` as well.
+        '''
+        key = [c.validate_spec() for c in self.gu_lst + self.hu_lst]
+        if key == self._spec_key:
+            return
+        self._spec_key = key
+        self.clear_eval_cache()
+        self.G_du_const.clear()
+        self._n_G_lst = []
+        if self.dof_reduction is not None:
+            self.setup_dof_reduction()
+        if self.eval_plan is not None:
+            self.compile_eval_plan()
+
+    # ==========================================================================
+    # Elimination of dofs
+    # ==========================================================================
+
+    dof_reduction = Instance(DofReduction)
+    r'''Elimination of the dofs prescribed or linked by the dof constraints
+    set up at the beginning of the step if ``config.eliminate_dofs``
+    is set. The solvers then iterate over the free dofs only.
+    '''
+
+    def setup_dof_reduction(self):
+        '''Collect the dof constraints for the elimination.
+        '''
+        if not self.config.eliminate_dofs:
+            self.dof_reduction = None
+            return
+        dof_constraints = []
+        offset = 0
+        for gu, n_G in zip(self.gu_lst, self.n_G_lst):
+            if isinstance(gu, GuDofConstraints):
+                dof_constraints.append((offset, gu.dof_constraints))
+            offset += n_G
+        self.dof_reduction = DofReduction(n_dofs=self.cp_state.n_dofs,
+                                          n_G=offset,
+                                          dof_constraints=dof_constraints)
+
+    def reduce(self, U):
+        '''Return the vector of unknowns for the displacement vector U.
+        '''
+        if self.dof_reduction is None:
+            return np.copy(U)
+        return self.dof_reduction.reduce(U)
+
+    def expand(self, V):
+        '''Return the displacement vector for the vector of unknowns V.
+        '''
+        if self.dof_reduction is None:
+            return V
+        return self.dof_reduction.expand(V, self.t)
+
+    # ==========================================================================
+    # Evaluation cache
+    # ==========================================================================
+
+    eval_plan = Instance(EvaluationPlan)
+    r'''Traits-free evaluation plan of the goal function and constraints
+    compiled at the beginning of the step if ``config.use_eval_plan``
+    is set. The plan evaluates the compiled components directly
+    from the trial vector :math:`U` bypassing the crease pattern state.
+    '''
+
+    def compile_eval_plan(self):
+        '''Compile the evaluation plan for the current configuration.
+        '''
+        config = self.config
+        if not config.use_eval_plan:
+            self.eval_plan = None
+            return
+        fu = self.fu if config.goal_function_type_ is not None else None
+        f_du = None
+        if fu is not None:
+            f_du = self._get_du_fd(fu.get_f_du_fd, config.use_f_du,
+                                   fu.has_f_du)
+        hu_lst = self.hu_lst if config.has_H else []
+        gu_du_lst = [self._get_du_fd(gu.get_G_du_fd,
+                                     config.use_G_du, gu.has_G_du)
+                     for gu in self.gu_lst]
+        hu_du_lst = [self._get_du_fd(hu.get_H_du_fd,
+                                     config.use_H_du, hu.has_H_du)
+                     for hu in hu_lst]
+        self.eval_plan = EvaluationPlan(self.cp_state, fu,
+                                        self.gu_lst, hu_lst,
+                                        gu_du_lst, hu_du_lst,
+                                        self.G_du_const, f_du)
+
+    eval_cache = Instance(OrderedDict, ())
+    r'''Values of the goal function, constraints and their derivatives
+    evaluated for the recently visited trial vectors :math:`U`.
+    The entries are keyed by the time :math:`t` and the bytes of
+    the vector :math:`U` and ordered by their last use.
+    '''
+
+    n_eval_hits = Int(0)
+    r'''Number of evaluations served from the cache.
+    '''
+
+    n_eval_misses = Int(0)
+    r'''Number of evaluations performed on the crease pattern state.
+    '''
+
+    def clear_eval_cache(self):
+        self.eval_cache.clear()
+
+    def get_cached(self, name, U, get_value, *args):
+        '''Return the value of the quantity name for the trial vector U.
+
+        A value evaluated for the same trial vector and time
+        is returned from the cache without touching the crease pattern
+        state. Otherwise, the state is set to U only if it differs from
+        the current one, so that the geometrical properties of the
+        crease pattern state derived for U are shared by
+        all quantities evaluated for U. The number of cached trial vectors
+        is limited by ``config.eval_cache_size``. If an evaluation plan
+        is compiled, the values are obtained from the plan instead.
+        The values are returned as read-only views so that
+        the cached values cannot be modified by the caller.
+        '''
+        size = self.config.eval_cache_size
+        U = np.asarray(U, dtype='float_')
+        if size <= 0:
+            return get_read_only_view(self._evaluate(name, U, get_value,
+                                                     *args))
+        key = (self.t, U.tobytes())
+        cache = self.eval_cache
+        entry = cache.get(key)
+        if entry is None:
+            entry = cache[key] = {}
+            while len(cache) > size:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        if name in entry:
+            self.n_eval_hits += 1
+            return entry[name]
+        self.n_eval_misses += 1
+        value = entry[name] = get_read_only_view(
+            self._evaluate(name, U, get_value, *args))
+        return value
+
+    def _evaluate(self, name, V, get_value, *args):
+        U = self.expand(V)
+        if self.eval_plan is not None:
+            value = getattr(self.eval_plan, 'get_' + name)(U, self.t)
+        else:
+            self.set_state(U)
+            value = get_value(*args)
+        if self.dof_reduction is None:
+            return value
+        return self.dof_reduction.reduce_value(name, value)
+
+    def set_state(self, U):
+        '''Set the trial vector U to the crease pattern state
+        if it differs from the current one.
+        '''
+        if not np.array_equal(self.cp_state.u.flatten(), U):
+            self.cp_state.U = np.copy(U)
 
     def clear_iter(self):
         self.u_it_list = []
@@ -273,9 +502,8 @@ class SimulationStep(HasStrictTraits):
         '''Get the goal function value.
         '''
         if self.record_iter:
-            self.u_it_list.append(np.copy(U.reshape(-1, 3)))
-        self.cp_state.U = U
-        f = self.get_f()
+            self.u_it_list.append(np.copy(self.expand(U).reshape(-1, 3)))
+        f = self.get_cached('f', U, self.get_f)
         if self.debug_level > 0:
             print('f:\n', f)
         return f
@@ -286,22 +514,52 @@ class SimulationStep(HasStrictTraits):
     def get_f_du_t(self, U):
         '''Get the goal function derivatives.
         '''
-        self.cp_state.U = U
-        f_du = self.get_f_du()
+        f_du = self.get_cached('f_du', U, self.get_f_du)
         if self.debug_level > 2:
             print('f_du.shape:\n', f_du.shape)
             print('f_du:\n', f_du)
         return f_du
 
     def get_f_du(self):
-        return self.fu.get_f_du(self.t)
+        fu = self.fu
+        get_f_du_fd = self._get_du_fd(fu.get_f_du_fd,
+                                      self.config.use_f_du, fu.has_f_du)
+        if get_f_du_fd:
+            return get_f_du_fd(self.t)
+        return fu.get_f_du(self.t)
+
+    has_f_du = Property
+    r'''Indicates that the gradient of the goal function is supplied
+    to the optimizer, see ``_has_du``.
+    '''
+
+    def _get_has_f_du(self):
+        fu = self.fu
+        return self._has_du(fu, self.config.use_f_du, fu.has_f_du)
+
+    has_f_ddu = Property
+    r'''Indicates that the goal function provides the products
+    of its hessian with a vector.
+    '''
+
+    def _get_has_f_ddu(self):
+        return getattr(self.fu, 'has_f_ddu', False)
+
+    def get_f_ddu_t(self, U, p):
+        '''Get the product of the goal function hessian
+        at the trial vector U with the vector p.
+        '''
+        self.set_state(self.expand(U))
+        red = self.dof_reduction
+        if red is None:
+            return self.fu.get_f_ddu(p, self.t)
+        return red.T.T.dot(self.fu.get_f_ddu(red.T.dot(p), self.t))
 
     # ==========================================================================
     # Equality constraints
     # ==========================================================================
     def get_G_t(self, U):
-        self.cp_state.U = U
-        g = self.get_G(self.t)
+        g = self.get_cached('G', U, self.get_G, self.t)
         if self.debug_level > 1:
             print('G:\n', [g])
         return g
@@ -313,25 +571,125 @@ class SimulationStep(HasStrictTraits):
         return np.hstack(g_lst)
 
     def get_G_du_t(self, U):
-        self.cp_state.U = U
-        return self.get_G_du(self.t)
+        return self.get_cached('G_du', U, self.get_G_du, self.t)
 
     def get_G_du(self, t=0):
-        g_du_lst = [gu.get_G_du(t) for gu in self.gu_lst]
-        if(g_du_lst == []):
+        if(self.gu_lst == []):
             return []
-        g_du = np.vstack(g_du_lst)
+        g_du = self.get_G_du_sparse(t).toarray()
         if self.debug_level > 3:
             print('G_du.shape:\n', g_du.shape)
             print('G_du:\n', [g_du])
         return g_du
 
+    has_G_du = Property
+    r'''Indicates that the jacobian of the equality constraints
+    is supplied to the optimizer, see ``_has_du``.
+    '''
+
+    def _get_has_G_du(self):
+        use_G_du = self.config.use_G_du
+        return all(self._has_du(gu, use_G_du, gu.has_G_du)
+                   for gu in self.gu_lst)
+
+    has_G_ddu = Property
+    r'''Indicates that all equality constraints provide the products
+    of their hessians with a vector.
+    '''
+
+    def _get_has_G_ddu(self):
+        return all(getattr(gu, 'has_G_ddu', False) for gu in self.gu_lst)
+
+    _n_G_lst = List
+
+    n_G_lst = Property
+    r'''Numbers of constraint equations of the equality constraints
+    evaluated once within a step.
+    '''
+
+    def _get_n_G_lst(self):
+        if self._n_G_lst == []:
+            self._n_G_lst = [len(gu.get_G(self.t)) for gu in self.gu_lst]
+        return self._n_G_lst
+
+    def get_G_ddu_t(self, U, v, p):
+        '''Get the product of the constraint hessians at the trial vector U
+        weighted by the multipliers v with the vector p.
+        '''
+        self.set_state(self.expand(U))
+        red = self.dof_reduction
+        if red is not None:
+            v, p = red.expand_multipliers(v), red.T.dot(p)
+        G_ddu = np.zeros_like(p)
+        v_lst = np.split(v, np.cumsum(self.n_G_lst)[:-1])
+        for gu, v_gu in zip(self.gu_lst, v_lst):
+            G_ddu += gu.get_G_ddu(v_gu, p, self.t)
+        if red is not None:
+            return red.T.T.dot(G_ddu)
+        return G_ddu
+
+    def get_G_du_sparse_t(self, U):
+        return self.get_cached('G_du_sparse', U, self.get_G_du_sparse, self.t)
+
+    G_du_const = Property(Dict, depends_on='source_config_changed')
+    r'''Jacobians of the equality constraints with the flag
+    ``constant_G_du`` evaluated once within the simulation task.
+    '''
+    @cached_property
+    def _get_G_du_const(self):
+        return {}
+
+    def get_G_du_sparse(self, t=0):
+        '''Assemble the jacobians of all equality constraints
+        into a single sparse matrix in the CSR format.
+        '''
+        g_du_lst = []
+        G_du_const = self.G_du_const
+        for gu in self.gu_lst:
+            if getattr(gu, 'constant_G_du', False):
+                G_du = G_du_const.get(gu)
+                if G_du is None:
+                    G_du = G_du_const[gu] = sp.coo_matrix(
+                        gu.get_G_du_sparse(t))
+                g_du_lst.append(G_du)
+                continue
+            get_G_du_fd = self._get_du_fd(gu.get_G_du_fd,
+                                          self.config.use_G_du, gu.has_G_du)
+            if get_G_du_fd:
+                g_du_lst.append(get_G_du_fd(t))
+            else:
+                g_du_lst.append(gu.get_G_du_sparse(t))
+        if(g_du_lst == []):
+            return sp.csr_matrix((0, self.cp_state.n_dofs))
+        return sp.vstack(g_du_lst, format='csr')
+
+    def _has_du(self, component, use_du, has_du):
+        '''Return True if the derivatives of the component are evaluated
+        analytically or by the colored finite differences using
+        its sparsity pattern. The derivatives of the components without
+        a sparsity pattern are left to the optimizer which approximates
+        them by the finite differences with all dofs perturbed.
+        '''
+        return use_du and has_du or component.has_du_pattern
+
+    def _get_du_fd(self, get_du_fd, use_du, has_du):
+        '''Return the function delivering the finite difference jacobian
+        of the component if its derivatives are unavailable or switched off.
+        Otherwise, return None.
+        '''
+        if use_du and has_du:
+            return None
+        config = self.config
+
+        def get_du(t=0):
+            return get_du_fd(t, config.fd_step, config.fd_n_workers)
+        return get_du
+
     # ==========================================================================
     # Inequality constraints
     # ==========================================================================
     def get_H_t(self, U):
-        self.cp_state.U = U
-        h = self.get_H(self.t)
+        h = self.get_cached('H', U, self.get_H, self.t)
         if self.debug_level > 1:
             print('H:\n', [h])
         return h
@@ -343,11 +701,46 @@ class SimulationStep(HasStrictTraits):
         return np.hstack(h_lst)
 
     def get_H_du_t(self, U):
-        self.cp_state.U = U
-        return self.get_H_du(self.t)
+        return self.get_cached('H_du', U, self.get_H_du, self.t)
+
+    has_H_du = Property
+    r'''Indicates that the jacobian of the inequality constraints
+    is supplied to the optimizer, see ``_has_du``.
+    '''
+
+    def _get_has_H_du(self):
+        use_H_du = self.config.use_H_du
+        return all(self._has_du(hu, use_H_du, hu.has_H_du)
+                   for hu in self.hu_lst)
+
+    def get_H_du_sparse_t(self, U):
+        return self.get_cached('H_du_sparse', U, self.get_H_du_sparse, self.t)
+
+    def get_H_du_sparse(self, t=0):
+        '''Assemble the jacobians of all inequality constraints
+        into a single sparse matrix in the CSR format.
+        '''
+        h_du_lst = []
+        for hu in self.hu_lst:
+            get_H_du_fd = self._get_du_fd(hu.get_H_du_fd,
+                                          self.config.use_H_du, hu.has_H_du)
+            if get_H_du_fd:
+                h_du_lst.append(get_H_du_fd(t))
+            else:
+                h_du_lst.append(hu.get_H_du_sparse(t))
+        if(h_du_lst == []):
+            return sp.csr_matrix((0, self.cp_state.n_dofs))
+        return sp.vstack(h_du_lst, format='csr')
 
     def get_H_du(self, t=0):
-        h_du_lst = [hu.get_H_du(t) for hu in self.hu_lst]
+        h_du_lst = []
+        for hu in self.hu_lst:
+            get_H_du_fd = self._get_du_fd(hu.get_H_du_fd,
+                                          self.config.use_H_du, hu.has_H_du)
+            if get_H_du_fd:
+                h_du_lst.append(get_H_du_fd(t).toarray())
+            else:
+                h_du_lst.append(hu.get_H_du(t))
         if(h_du_lst == []):
             return []
         h_du = np.vstack(h_du_lst)
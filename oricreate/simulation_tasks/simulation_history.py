@@ -18,7 +18,7 @@ from traits.api import \
 
 import numpy as np
 from oricreate.crease_pattern import \
-    CreasePattern
+    CreasePattern, CreasePatternBatch
 
 
 INPUT = '+cp_input'
@@ -49,6 +49,14 @@ class SimulationHistory(CreasePattern):
     def _get_x_t(self):
         return self.x_0[np.newaxis, ...] + self.u_t
 
+    batch = Property(depends_on='X, u_t, +cp_topology')
+    r'''Operators evaluated for all recorded time steps at once
+    (see ``CreasePatternBatch``).
+    '''
+    @cached_property
+    def _get_batch(self):
+        return CreasePatternBatch(cp=self, u_t=self.u_t)
+
     def get_time_idx_arr(self, vot):
         '''Get the index corresponding to visual time
         '''
@@ -96,6 +96,13 @@ class SimulationTaskBase(FormingTask):
             t_arr = t_arr[::-1]
         return t_arr
 
+    t_record = Property(Array(float))
+    '''Time values of the recorded displacements ``u_t``.
+    '''
+
+    def _get_t_record(self):
+        return self.t_arr
+
     sim_history = Property(Instance(SimulationHistory))
     '''History of calculated displacements.
     '''
@@ -104,7 +111,7 @@ class SimulationTaskBase(FormingTask):
         cp = self.cp
         return SimulationHistory(
             x_0=cp.x_0, L=cp.L, F=cp.F, u_t=self.u_t,
-            t_record=self.t_arr
+            t_record=self.t_record
         )
 
 
@@ -147,34 +154,132 @@ class SimulationTask(SimulationTaskBase):
     '''
     record_iter = DelegatesTo('sim_step')
 
-    u_t = Property(depends_on='source_config_changed, unfold')
-    '''Displacement history for the current FoldRigidly process.
+    u_t_record = Property(depends_on='source_config_changed, unfold')
+    '''Displacement history, time values reached by the simulation
+    and numbers of iterations of the solved time steps.
     '''
     @cached_property
-    def _get_u_t(self):
+    def _get_u_t_record(self):
         '''Solve the problem with the appropriate solver
         '''
+        config = self.config
+        adaptive = config.adaptive_time_step
+        t_arr = self.t_arr
+        t_n, t_end = t_arr[0], t_arr[-1]
+        dt = t_arr[1] - t_arr[0] if len(t_arr) > 1 else 0.0
+        dt_max = config.time_step_max
+        t_tol = 1e-10 * np.fabs(t_end - t_n)
         u_t_list = [self.cp.u]
+        t_record = [t_n]
+        U_0 = np.copy(self.sim_step.U)
+        t_conv, U_conv, n_iter_list = [], [], []
+        i_t, n_bisect = 1, 0
         time_start = sysclock()
-        for t in self.t_arr[1:]:
+        while True:
+            if adaptive:
+                if np.fabs(t_end - t_n) <= t_tol:
+                    break
+                t = t_n + dt
+                if (t - t_end) * dt > 0 or np.fabs(t_end - t) <= t_tol:
+                    t = t_end
+            else:
+                if i_t >= len(t_arr):
+                    break
+                t = t_arr[i_t]
+                i_t += 1
             print('time: %g' % t)
+            U_pred = self._predict_U(t, t_conv, U_conv)
+            if U_pred is not None:
+                self.sim_step.U = U_pred
             self.sim_step.t = t
             #U = self.sim_step.U_t
             try:
                 U = self.sim_step.U_t
+                converged = self.sim_step.converged
             except Exception as inst:
                 print(inst)
-                break
+                if not adaptive:
+                    break
+                converged = False
+
+            if adaptive and not converged:
+                if n_bisect >= config.time_step_bisections:
+                    print('==== no convergence after %d bisections ====' %
+                          n_bisect)
+                    break
+                # restart from the last converged state with half increment
+                self.sim_step.U = U_conv[-1] if U_conv else U_0
+                dt /= 2.0
+                n_bisect += 1
+                print('==== bisecting the time increment to %g ====' % dt)
+                continue
 
             if self.sim_step.record_iter:
                 u_t_list += self.sim_step.u_it_list
                 self.sim_step.clear_iter()
 
             u_t_list.append(U.reshape(-1, 3))
+            t_record.append(t)
+            t_conv.append(t)
+            U_conv.append(np.copy(U))
+            n_iter_list.append(self.sim_step.n_iter)
+            t_n = t
+            n_bisect = 0
+            if adaptive and self.sim_step.n_iter <= config.time_step_grow_iter:
+                dt *= config.time_step_grow_factor
+                if dt_max > 0:
+                    dt = np.sign(dt) * min(np.fabs(dt), dt_max)
 
         time_end = sysclock()
         print('==== solved in ', time_end - time_start, '=====')
-        return np.array(u_t_list)
+        print('==== %d iterations in %d steps (predictor: %s) ====' %
+              (np.sum(n_iter_list), len(n_iter_list),
+               self.config.predictor))
+        return (np.array(u_t_list), np.array(t_record, dtype='float_'),
+                np.array(n_iter_list, dtype='int_'))
+
+    u_t = Property(depends_on='source_config_changed, unfold')
+    '''Displacement history for the current FoldRigidly process.
+    '''
+    @cached_property
+    def _get_u_t(self):
+        return self.u_t_record[0]
+
+    t_record = Property(Array(float),
+                        depends_on='source_config_changed, unfold')
+    '''Time values reached by the simulation. They differ from the time
+    array ``t_arr`` if the adaptive time stepping is switched on
+    or if the simulation stopped before reaching the final time.
+    '''
+    @cached_property
+    def _get_t_record(self):
+        return self.u_t_record[1]
+
+    n_iter_t = Property(Array(int),
+                        depends_on='source_config_changed, unfold')
+    '''Number of iterations needed in each of the solved time steps.
+    '''
+    @cached_property
+    def _get_n_iter_t(self):
+        return self.u_t_record[2]
+
+    def _predict_U(self, t, t_conv, U_conv):
+        '''Extrapolate the displacement vector at time t from the
+        displacement vectors U_conv converged at the times t_conv.
+        The last two (linear) or three (quadratic) converged states
+        are interpolated by a Lagrange polynomial in time.
+        Returns None if there are not enough converged states.
+        '''
+        n_k = {'none': 0, 'linear': 2, 'quadratic': 3}[self.config.predictor]
+        n_k = min(n_k, len(U_conv))
+        if n_k < 2:
+            return None
+        t_k = np.array(t_conv[-n_k:])
+        U_k = np.array(U_conv[-n_k:])
+        w_k = np.array([np.prod([(t - t_k[j]) / (t_k[i] - t_k[j])
+                                 for j in range(n_k) if j != i])
+                        for i in range(n_k)])
+        return np.einsum('k,k...->...', w_k, U_k)
 
     traits_view = View(
         Group(
@@ -0,0 +1,112 @@
+'''
+Kernels evaluating the vector products of the crease pattern operators.
+
+The cross products are evaluated component-wise instead of contracting
+the operands with the Levi-Civita symbol ``EPS``. The remaining sum-product
+contractions are evaluated by ``contract`` using contraction paths
+obtained from ``numpy.einsum_path`` only once for each combination
+of subscripts and operand shapes. All kernels accept an optional output
+array so that the result can be written directly into a preallocated
+array, e.g. a slice of the operator being assembled.
+
+Created on Oct 18, 2026
+
+@author: rch
+'''
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+def cross(a, b, out=None):
+    r'''Get the cross product :math:`\bm{a} \times \bm{b}` of two arrays
+    of vectors broadcast over their leading dimensions with the spatial
+    components in the last dimension. The output array must not share
+    memory with the operands.
+    '''
+    a0, a1, a2 = a[..., 0], a[..., 1], a[..., 2]
+    b0, b1, b2 = b[..., 0], b[..., 1], b[..., 2]
+    if out is None:
+        shape = np.broadcast(a0, b0).shape + (3,)
+        out = np.empty(shape, dtype=np.result_type(a, b))
+    np.multiply(a1, b2, out=out[..., 0])
+    out[..., 0] -= a2 * b1
+    np.multiply(a2, b0, out=out[..., 1])
+    out[..., 1] -= a0 * b2
+    np.multiply(a0, b1, out=out[..., 2])
+    out[..., 2] -= a1 * b0
+    return out
+
+
+def cross_matrix(a, out=None):
+    r'''Get the skew-symmetric matrices :math:`[\bm{a}]_\times`
+    of the shape ``(..., 3, 3)`` with
+    :math:`[\bm{a}]_\times \bm{b} = \bm{a} \times \bm{b}`.
+    The derivative of a cross product with respect
+    to its operands is then obtained as
+
+    .. math::
+        \frac{\partial (\bm{a} \times \bm{b})}{\partial \bm{b}}
+        = [\bm{a}]_\times, \quad
+        \frac{\partial (\bm{a} \times \bm{b})}{\partial \bm{a}}
+        = -[\bm{b}]_\times.
+
+    '''
+    if out is None:
+        out = np.empty(a.shape + (3,), dtype=a.dtype)
+    a0, a1, a2 = a[..., 0], a[..., 1], a[..., 2]
+    out[..., 0, 0] = 0.0
+    out[..., 1, 1] = 0.0
+    out[..., 2, 2] = 0.0
+    np.negative(a2, out=out[..., 0, 1])
+    out[..., 0, 2] = a1
+    out[..., 1, 0] = a2
+    np.negative(a0, out=out[..., 1, 2])
+    np.negative(a1, out=out[..., 2, 0])
+    out[..., 2, 1] = a0
+    return out
+
+
+def dot(a, b, out=None):
+    r'''Get the scalar products of two arrays of vectors
+    over their last dimension.
+    '''
+    return contract('...i,...i->...', a, b, out=out)
+
+
+EINSUM_PATH_CACHE_SIZE = 512
+'''Maximum number of cached contraction paths.
+'''
+
+_einsum_paths = OrderedDict()
+'''Contraction paths indexed by the subscripts and the operand shapes
+ordered from the least to the most recently used one.
+'''
+
+
+def get_einsum_path(subscripts, *operands):
+    '''Return the contraction path of ``numpy.einsum`` for the given
+    subscripts and operands. The path is evaluated only once for each
+    combination of subscripts and operand shapes. The least recently
+    used paths are discarded when the cache exceeds
+    ``EINSUM_PATH_CACHE_SIZE`` entries.
+    '''
+    key = (subscripts,) + tuple(np.shape(op) for op in operands)
+    path = _einsum_paths.get(key)
+    if path is None:
+        path, _ = np.einsum_path(subscripts, *operands, optimize='optimal')
+        _einsum_paths[key] = path
+        if len(_einsum_paths) > EINSUM_PATH_CACHE_SIZE:
+            _einsum_paths.popitem(last=False)
+    else:
+        _einsum_paths.move_to_end(key)
+    return path
+
+
+def contract(subscripts, *operands, out=None):
+    '''Evaluate ``numpy.einsum`` along the cached contraction path.
+    The result is written into the array out if supplied.
+    '''
+    path = get_einsum_path(subscripts, *operands)
+    return np.einsum(subscripts, *operands, optimize=path, out=out)
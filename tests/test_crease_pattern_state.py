@@ -4,6 +4,7 @@ Created on Feb 13, 2015
 @author: rch
 '''
 from oricreate.api import YoshimuraCPFactory
+from oricreate.crease_pattern import CreasePatternState
 import numpy as np
 
 
@@ -26,6 +27,170 @@ def test_crease_pattern_state_transitions():
     cp.u = cp.u
     assert cp.x[2, 2] == 1.0
 
+
+def test_topology_cache_invalidation():
+    '''Test that topological mappings survive the change of displacements
+    and get recalculated upon the change of the connectivity.
+    '''
+    cp_factory = YoshimuraCPFactory(n_x=1, n_y=2, L_x=4, L_y=2)
+    cp = cp_factory.formed_object
+
+    iL_F = cp.iL_F
+    L_vectors = cp.L_vectors
+    cp.u[2, 2] = 1.0
+    cp.u = cp.u
+    assert cp.iL_F is iL_F
+    assert cp.L_vectors is not L_vectors
+
+    cp.F = cp.F[:-1]
+    assert cp.iL_F is not iL_F
+    assert len(cp.iL_F) < len(iL_F)
+
+
+def test_facet_line_index():
+    '''Test the lookup of facets by the triples of their lines.
+    '''
+    cp_factory = YoshimuraCPFactory(n_x=1, n_y=2, L_x=4, L_y=2)
+    cp = cp_factory.formed_object
+
+    F_L = cp.F_L
+    F = np.arange(cp.n_F)
+    assert np.all(cp.LLL_F[F_L[:, 0], F_L[:, 1], F_L[:, 2]] == F)
+    assert np.all(cp.LLL_F[F_L[:, 2], F_L[:, 0], F_L[:, 1]] == F)
+    assert np.all(cp.LLL_F.get_F(F_L[:, ::-1]) == F)
+    assert cp.LLL_F[0, 0, 0] == -1
+    assert np.sum(cp.LLL_F.toarray() >= 0) == 6 * cp.n_F
+
+
+def test_half_edge_vertex_stars():
+    '''Test the counter-clockwise vertex star of an interior node.
+    '''
+    cp = CreasePatternState(X=[[0, 0, 0], [1, 0, 0], [1, 1, 0],
+                               [0, 1, 0], [0.5, 0.5, 0]],
+                            L=[[0, 1], [1, 2], [3, 2], [0, 3],
+                               [0, 4], [1, 4], [2, 4], [3, 4]],
+                            F=[[0, 1, 4], [1, 2, 4], [4, 3, 2], [4, 3, 0]])
+
+    assert np.all(cp.iN == [4])
+    assert np.all(cp.eN == [0, 1, 2, 3])
+    assert np.all(cp.iN_nbr[0] == [0, 1, 2, 3, 0])
+    assert np.all(cp.iN_aln[0] == [4, 5, 6, 7])
+    assert np.all(cp.iL == [4, 5, 6, 7])
+    assert np.all(cp.iL_F == [[0, 3], [0, 1], [1, 2], [2, 3]])
+    H = cp.H
+    iN_H = H.iN_H
+    assert np.all(H.H_rot[iN_H] == np.roll(iN_H, -1))
+
+
+def test_gravity_hessian_vector_product():
+    '''Test the hessian-vector product of the potential energy of gravity
+    against the central difference of its gradient.
+    '''
+    cp_factory = YoshimuraCPFactory(n_x=1, n_y=2, L_x=4, L_y=2)
+    cp = cp_factory.formed_object
+    U_0 = np.linspace(0.0, 0.3, cp.n_dofs) ** 2
+    p = np.cos(np.arange(cp.n_dofs))
+    h = 1e-6
+
+    def get_V_du(U):
+        cp.U = U
+        return np.copy(cp.V_du)
+
+    V_ddu_fd = (get_V_du(U_0 + h * p) - get_V_du(U_0 - h * p)) / (2 * h)
+    cp.U = U_0
+    assert np.allclose(cp.get_V_ddu(p), V_ddu_fd, atol=1e-6)
+
+
+def test_sector_angle_derivatives():
+    '''Test the derivatives of the sector angles and of the flat
+    foldability constraints against finite differences.
+    '''
+    from oricreate.api import CustomCPFactory
+    from oricreate.gu import GuFlatFoldability
+    cp_factory = YoshimuraCPFactory(n_x=2, n_y=2, L_x=2, L_y=1)
+    cp = cp_factory.formed_object
+    forming_task = CustomCPFactory(formed_object=cp)
+    gu = GuFlatFoldability(forming_task=forming_task)
+    U_0 = np.sin(np.arange(cp.n_dofs)) * 0.05
+    cp.U = U_0
+    theta_0, G_0 = cp.F_theta.flatten(), gu.get_G()
+    theta_du = cp.F_theta_du.toarray()
+    G_du = gu.get_G_du()
+    h = 1e-7
+    for k in range(cp.n_dofs):
+        U = np.copy(U_0)
+        U[k] += h
+        cp.U = U
+        assert np.allclose((cp.F_theta.flatten() - theta_0) / h,
+                           theta_du[:, k], atol=1e-5)
+        assert np.allclose((gu.get_G() - G_0) / h, G_du[:, k], atol=1e-5)
+
+
+def test_dihedral_angle_derivatives():
+    '''Test the stencil derivatives of the dihedral angles
+    against finite differences.
+    '''
+    cp_factory = YoshimuraCPFactory(n_x=2, n_y=2, L_x=2, L_y=1)
+    cp = cp_factory.formed_object
+    U_0 = np.sin(np.arange(cp.n_dofs)) * 0.05
+    cp.U = U_0
+    assert cp.iL_psi_N.shape == (cp.n_iL, 4)
+    assert cp.iL_psi_dul.shape == (cp.n_iL, 4, 3)
+    psi_0 = np.copy(cp.iL_psi)
+    psi_du = cp.iL_psi_du.toarray()
+    h = 1e-7
+    for k in range(cp.n_dofs):
+        U = np.copy(U_0)
+        U[k] += h
+        cp.U = U
+        assert np.allclose((cp.iL_psi - psi_0) / h, psi_du[:, k], atol=1e-5)
+
+
+def test_dihedral_angle_hessian_vector_product():
+    '''Test the products of the hessians of the dihedral angles
+    with a vector against the central difference of their derivatives.
+    '''
+    cp_factory = YoshimuraCPFactory(n_x=2, n_y=2, L_x=2, L_y=1)
+    cp = cp_factory.formed_object
+    U_0 = np.sin(np.arange(cp.n_dofs)) * 0.05
+    p = np.cos(np.arange(cp.n_dofs))
+    h = 1e-6
+
+    def get_psi_dul(U):
+        cp.U = U
+        return np.copy(cp.iL_psi_dul)
+
+    psi_ddul_fd = (get_psi_dul(U_0 + h * p) -
+                   get_psi_dul(U_0 - h * p)) / (2 * h)
+    cp.U = U_0
+    assert np.allclose(cp.get_iL_psi_ddul(p), psi_ddul_fd, atol=1e-7)
+
+
+def test_crease_pattern_batch():
+    '''Test the batched operators against the evaluation
+    of the individual states.
+    '''
+    from oricreate.crease_pattern import CreasePatternBatch
+    cp_factory = YoshimuraCPFactory(n_x=2, n_y=2, L_x=2, L_y=1)
+    cp = cp_factory.formed_object
+    u_t = np.sin(np.arange(3 * cp.n_dofs)).reshape(3, cp.n_N, 3) * 0.05
+    batch = CreasePatternBatch(cp=cp, u_t=u_t)
+    for i in range(3):
+        cp.u = u_t[i]
+        assert np.allclose(batch.L_lengths[i], cp.L_lengths)
+        assert np.allclose(batch.F_normals_dul[i], cp.F_normals_du)
+        assert np.allclose(batch.F_theta_dul[i], cp.F_theta_dul)
+        assert np.allclose(batch.iL_psi[i], cp.iL_psi)
+        assert np.allclose(batch.iL_psi_dul[i], cp.iL_psi_dul)
+        assert np.allclose(batch.V[i], cp.V)
+        assert np.allclose(batch.V_du[i], cp.V_du)
+        L_lengths_du = cp.L_vectors_du.T.dot(
+            (cp.L_vectors / cp.L_lengths[:, np.newaxis]).flatten())
+        L_lengths_dul = np.zeros((cp.n_N, 3))
+        np.add.at(L_lengths_dul, cp.L, batch.L_lengths_dul[i])
+        assert np.allclose(L_lengths_dul.flatten(), L_lengths_du)
+
+
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
     test_crease_pattern_state_transitions()
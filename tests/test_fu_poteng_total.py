@@ -0,0 +1,82 @@
+'''
+Created on Oct 18, 2026
+
+@author: rch
+'''
+from oricreate.api import YoshimuraCPFactory, CustomCPFactory
+from oricreate.fu import FuPotEngTotal
+import numpy as np
+
+
+def get_folded_cp_factory():
+    '''Return the factory of a Yoshimura pattern
+    with a folded initial configuration.
+    '''
+    cp = YoshimuraCPFactory(n_x=2, n_y=2, L_x=4, L_y=2).formed_object
+    cp.X = cp.X + 0.1 * np.sin(np.arange(cp.n_dofs)).reshape(-1, 3)
+    return CustomCPFactory(formed_object=cp)
+
+
+def get_fu(cp_factory, **kw):
+    return FuPotEngTotal(forming_task=cp_factory, kappa=np.array([2.0]),
+                         thickness=0.5, F_ext_list=[(0, 2, -0.5)], **kw)
+
+
+def test_gradient():
+    '''Test the gradient of the total potential energy against
+    the central difference of its value in a folded state.
+    '''
+    cp_factory = get_folded_cp_factory()
+    cp = cp_factory.formed_object
+    fu = get_fu(cp_factory, exclude_lines=[4], fu_factor=2.0)
+    U = 0.1 * np.cos(np.arange(cp.n_dofs))
+    h = 1e-6
+
+    def get_f(U):
+        cp.U = U
+        return fu.get_f()
+
+    f_du_fd = np.array([(get_f(U + h * e) - get_f(U - h * e)) / (2 * h)
+                        for e in np.identity(cp.n_dofs)])
+    cp.U = U
+    assert np.allclose(fu.get_f_du(), f_du_fd, rtol=1e-6, atol=1e-8)
+
+
+def test_hessian_vector_product():
+    '''Test the hessian-vector product of the total potential energy
+    against the central difference of its gradient in a folded state.
+    '''
+    cp_factory = get_folded_cp_factory()
+    cp = cp_factory.formed_object
+    p = np.cos(np.arange(cp.n_dofs))
+    h = 1e-6
+    U = 0.1 * np.sin(2 * np.arange(cp.n_dofs))
+    for exclude_lines in [[], [4, 5]]:
+        fu = get_fu(cp_factory, exclude_lines=exclude_lines, fu_factor=2.0)
+        assert fu.has_f_ddu
+
+        def get_f_du(U):
+            cp.U = U
+            return np.copy(fu.get_f_du())
+
+        f_ddu_fd = (get_f_du(U + h * p) - get_f_du(U - h * p)) / (2 * h)
+        cp.U = U
+        assert np.allclose(fu.get_f_ddu(p), f_ddu_fd, rtol=1e-6, atol=1e-8)
+
+
+def test_exclude_lines():
+    '''Test that the excluded lines do not contribute
+    to the stored energy.
+    '''
+    cp_factory = get_folded_cp_factory()
+    cp = cp_factory.formed_object
+    cp.U = 0.1 * np.cos(np.arange(cp.n_dofs))
+    f = get_fu(cp_factory).get_f()
+    f_ext = get_fu(cp_factory, exclude_lines=cp.iL).get_f()
+    f_0 = get_fu(cp_factory, exclude_lines=cp.iL[:1]).get_f()
+    iL_phi = cp.iL_psi - cp.iL_psi_0
+    iL_length = np.linalg.norm(cp.iL_vectors, axis=1)
+    f_iL = iL_phi ** 2 * iL_length
+    assert np.allclose(f - f_ext, np.sum(f_iL))
+    assert np.allclose(f - f_0, f_iL[0])
+    assert f_iL[0] > 0
@@ -0,0 +1,70 @@
+'''
+Created on Oct 18, 2026
+
+@author: rch
+'''
+from traits.api import \
+    HasStrictTraits, Array, Property
+
+import numpy as np
+
+
+class GrabPointsTask(HasStrictTraits):
+
+    '''Minimal forming task providing the grab points
+    of a single facet.
+    '''
+
+    X = Array(dtype='float_')
+    F = Array(dtype='int_')
+    GP = Array(dtype='int_')
+
+    formed_object = Property
+
+    def _get_formed_object(self):
+        return self
+
+    x_0 = Property
+
+    def _get_x_0(self):
+        return self.X
+
+    n_GP = Property
+
+    def _get_n_GP(self):
+        return len(self.GP)
+
+    n_D = Property
+
+    def _get_n_D(self):
+        return 3
+
+    n_dofs = Property
+
+    def _get_n_dofs(self):
+        return self.X.size
+
+    N = Property
+
+    def _get_N(self):
+        return np.arange(len(self.X))
+
+
+def test_grab_points_edit():
+    '''Test that the barycentric coordinates of the grab points
+    follow the changes of the grab points and of the nodes.
+    '''
+    from oricreate.gu import GuGrabPoints
+    task = GrabPointsTask(X=[[0, 0, 0], [1, 0, 0], [0, 1, 0],
+                             [0.2, 0.2, 0], [0.5, 0.25, 0]],
+                          F=[[0, 1, 2]], GP=[[3, 0]])
+    gu = GuGrabPoints(forming_task=task)
+    assert np.allclose(gu.grab_pts_L, [[0.6, 0.2, 0.2]])
+    task.GP = [[4, 0]]
+    assert np.allclose(gu.grab_pts_L, [[0.25, 0.5, 0.25]])
+    G_du = gu.get_G_du()
+    assert np.allclose(G_du[0, [0, 3, 6, 12]], [0.25, 0.5, 0.25, -1.0])
+    X = task.X.copy()
+    X[4] = [0.1, 0.1, 0]
+    task.X = X
+    assert np.allclose(gu.grab_pts_L, [[0.8, 0.1, 0.1]])
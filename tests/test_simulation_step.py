@@ -0,0 +1,492 @@
+'''
+Created on Oct 18, 2026
+
+@author: rch
+'''
+from oricreate.api import YoshimuraCPFactory
+import numpy as np
+
+
+def test_colored_fd_jacobian():
+    '''Test the finite difference jacobian of the constant length
+    constraints obtained by perturbing the colored columns.
+    '''
+    from oricreate.api import CustomCPFactory
+    from oricreate.gu import GuConstantLength
+    cp_factory = YoshimuraCPFactory(n_x=2, n_y=4, L_x=4, L_y=2)
+    cp = cp_factory.formed_object
+    forming_task = CustomCPFactory(formed_object=cp)
+    gu = GuConstantLength(forming_task=forming_task)
+    cp.U = np.sin(np.arange(cp.n_dofs)) * 0.1
+
+    G_du_fd = gu.get_G_du_fd(step=1e-8).toarray()
+    assert np.allclose(gu.get_G_du(), G_du_fd, atol=1e-6)
+    assert gu._fd_jacobian.n_colors < cp.n_dofs
+
+
+def test_dof_reduction():
+    '''Test the elimination of the fixed and linked dofs.
+    '''
+    from oricreate.gu import fix, link
+    from oricreate.simulation_step.dof_reduction import DofReduction
+    dof_constraints = fix([0], [0, 1, 2]) + fix([1], [2], lambda t: t) + \
+        link([2], [2], 1.0, [3], [2], -1.0)
+    red = DofReduction(n_dofs=15, n_G=len(dof_constraints),
+                       dof_constraints=[(0, dof_constraints)])
+    assert red.n_free == 10
+    assert not np.any(red.G_keep)
+    U = red.expand(np.arange(red.n_free) + 1.0, 0.5)
+    assert np.allclose(U[[0, 1, 2, 5]], [0, 0, 0, 0.5])
+    assert U[8] == U[11]
+    assert np.allclose(red.expand(red.reduce(U), 0.5), U)
+
+
+def get_single_fold_task(n_steps=4, **config):
+    '''Return the simulation task folding a square sheet
+    along its diagonal by prescribing the dihedral angle.
+    '''
+    from oricreate.api import \
+        CreasePatternState, CustomCPFactory, SimulationConfig, SimulationTask
+    from oricreate.gu import \
+        GuConstantLength, GuDofConstraints, GuPsiConstraints, fix
+    cp = CreasePatternState(X=[[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]],
+                            L=[[0, 1], [1, 2], [2, 3], [3, 0], [0, 2]],
+                            F=[[0, 1, 2], [0, 2, 3]])
+    cp_factory = CustomCPFactory(formed_object=cp)
+    psi_max = np.pi * 0.3
+    gu_psi = GuPsiConstraints(forming_task=cp_factory,
+                              psi_constraints=[([(4, 1.0)],
+                                                lambda t: -psi_max * t)])
+    gu_dofs = GuDofConstraints(dof_constraints=fix([0], [0, 1, 2]) +
+                               fix([1], [1, 2]) + fix([2], [2]))
+    config.setdefault('acc', 1e-10)
+    config.setdefault('MAX_ITER', 50)
+    sim_config = SimulationConfig(goal_function_type='none',
+                                  gu={'cl': GuConstantLength(),
+                                      'u': gu_dofs, 'psi': gu_psi},
+                                  **config)
+    sim_task = SimulationTask(previous_task=cp_factory, config=sim_config,
+                              n_steps=n_steps)
+    cp.u[3, 2] = 0.05
+    return sim_task
+
+
+def get_nonlinear_system(n=6):
+    '''Return the residuum and the jacobian of a nonlinear system
+    with a tridiagonal jacobian and its solution.
+    '''
+    import scipy.sparse as sp
+    A = (np.diag(4.0 * np.ones(n)) + np.diag(-np.ones(n - 1), 1) +
+         np.diag(-2.0 * np.ones(n - 1), -1))
+    U_sol = np.linspace(0.2, 1.0, n)
+    b = np.dot(A, U_sol) + 0.5 * U_sol ** 3
+
+    def get_R(U):
+        return np.dot(A, U) + 0.5 * U ** 3 - b
+
+    def get_dR(U, sparse=False):
+        dR = A + np.diag(1.5 * U ** 2)
+        return sp.csc_matrix(dR) if sparse else dR
+    return get_R, get_dR, U_sol
+
+
+def test_jacobian_solver_transposed():
+    '''Test the solution of the transposed systems with the factorized
+    and Broyden-updated jacobian and the reuse of the column permutation.
+    '''
+    from oricreate.simulation_step.jacobian_solver import JacobianSolver
+    get_R, get_dR, _ = get_nonlinear_system()
+    U, R = np.linspace(0.0, 1.0, 6), np.cos(np.arange(6.0))
+    for linear_solver in ['dense', 'sparse']:
+        js = JacobianSolver(linear_solver=linear_solver)
+        sparse = linear_solver == 'sparse'
+        js.factorize(get_dR(U, sparse))
+        dR = get_dR(U)
+        assert np.allclose(np.dot(dR, js.solve(R)), R)
+        assert np.allclose(np.dot(dR.T, js.solve_transposed(R)), R)
+        # the updated inverse H fulfills the secant condition H y = s
+        # and its transposed application is consistent with H
+        s, y = np.sin(np.arange(6.0)), np.dot(dR, R) + 0.1 * R
+        js.update(s, y)
+        assert np.allclose(js.solve(y), s)
+        H = np.array([js.solve(e) for e in np.identity(6)]).T
+        assert np.allclose(js.solve_transposed(R), np.dot(H.T, R))
+        # the column permutation of the sparse factorization
+        # is reused for the jacobian with the same sparsity pattern
+        perm_c = js._perm_c
+        js.factorize(get_dR(2 * U, sparse))
+        assert js.n_factorizations == 2
+        assert not js._updates
+        assert np.allclose(np.dot(get_dR(2 * U), js.solve(R)), R)
+        assert np.allclose(np.dot(get_dR(2 * U).T,
+                                  js.solve_transposed(R)), R)
+        if sparse:
+            assert perm_c and js._perm_c is perm_c
+
+
+def test_jacobian_solver_iteration():
+    '''Test the Newton-Raphson iteration of a nonlinear system
+    with the refreshed, kept and Broyden-updated jacobian.
+    '''
+    from oricreate.simulation_step.jacobian_solver import JacobianSolver
+    get_R, get_dR, U_sol = get_nonlinear_system()
+    n_iter = {}
+    for update in ['newton', 'modified newton', 'broyden']:
+        for linear_solver in ['dense', 'sparse']:
+            js = JacobianSolver(linear_solver=linear_solver)
+            U, R_prev, d_U = np.zeros_like(U_sol), None, None
+            for i in range(100):
+                R = get_R(U)
+                if np.linalg.norm(R) < 1e-12:
+                    break
+                if update == 'broyden' and R_prev is not None:
+                    js.update(d_U, R - R_prev)
+                if update == 'newton' or not js.is_factorized:
+                    js.factorize(get_dR(U, linear_solver == 'sparse'))
+                d_U = js.solve(-R)
+                U, R_prev = U + d_U, R
+            assert np.allclose(U, U_sol)
+            n_iter[update, linear_solver] = (i, js.n_factorizations)
+    for linear_solver in ['dense', 'sparse']:
+        i_n, n_fact_n = n_iter['newton', linear_solver]
+        i_m, n_fact_m = n_iter['modified newton', linear_solver]
+        i_b, n_fact_b = n_iter['broyden', linear_solver]
+        assert n_fact_n == i_n
+        assert n_fact_m == n_fact_b == 1
+        assert i_b < i_m
+
+
+def test_jacobian_solver_failed_factorization():
+    '''Test that a failed factorization discards the previous one.
+    '''
+    from oricreate.simulation_step.jacobian_solver import JacobianSolver
+    js = JacobianSolver()
+    js.factorize(np.identity(3))
+    js.update(np.ones(3), np.arange(3.0))
+    try:
+        js.factorize(np.zeros((3, 3)))
+    except np.linalg.LinAlgError:
+        pass
+    assert not js.is_factorized
+    assert not js._updates
+    assert js.n_factorizations == 1
+
+
+def test_jacobian_update():
+    '''Test the convergence of the folding simulation with the jacobian
+    refreshed in each iteration, kept and updated by Broyden's method.
+    '''
+    u_t, n_factorizations, n_iter = {}, {}, {}
+    for update in ['newton', 'modified newton', 'broyden']:
+        for refresh_iter in [0, 3]:
+            for linear_solver in ['dense', 'sparse']:
+                sim_task = get_single_fold_task(
+                    jacobian_update=update, linear_solver=linear_solver,
+                    jacobian_refresh_iter=refresh_iter)
+                key = update, refresh_iter, linear_solver
+                u_t[key] = sim_task.u_t
+                n_iter[key] = np.sum(sim_task.n_iter_t)
+                n_factorizations[key] = \
+                    sim_task.sim_step.jacobian_solver.n_factorizations
+    u_ref = u_t['newton', 0, 'dense']
+    for u in u_t.values():
+        assert np.allclose(u, u_ref, atol=1e-8)
+    for linear_solver in ['dense', 'sparse']:
+        newton = 'newton', 0, linear_solver
+        modified = 'modified newton', 0, linear_solver
+        broyden = 'broyden', 0, linear_solver
+        assert n_factorizations[newton] == n_iter[newton]
+        assert n_factorizations[modified] < n_iter[newton]
+        assert n_factorizations[broyden] == 1
+        assert n_iter[broyden] < n_iter[modified]
+        # the kept jacobian is refreshed after three iterations
+        refreshed = 'modified newton', 3, linear_solver
+        assert n_factorizations[refreshed] > n_factorizations[modified]
+        assert n_iter[refreshed] < n_iter[modified]
+
+
+def test_eval_cache():
+    '''Test the hits, misses and the eviction of the least recently used
+    trial vectors in the evaluation cache and its read-only values.
+    '''
+    sim_task = get_single_fold_task(eval_cache_size=2)
+    sim_step = sim_task.sim_step
+    U_0 = np.copy(sim_step.U)
+    U_1, U_2 = U_0 + 0.01, U_0 + 0.02
+    G_0 = sim_step.get_G_t(U_0)
+    sim_step.get_G_du_t(U_0)
+    sim_step.get_G_t(U_1)
+    assert (sim_step.n_eval_hits, sim_step.n_eval_misses) == (0, 3)
+    assert sim_step.get_G_t(U_0) is G_0
+    assert (sim_step.n_eval_hits, sim_step.n_eval_misses) == (1, 3)
+    # U_1 is the least recently used trial vector and is evicted
+    sim_step.get_G_t(U_2)
+    assert len(sim_step.eval_cache) == 2
+    sim_step.get_G_t(U_0)
+    sim_step.get_G_t(U_1)
+    assert (sim_step.n_eval_hits, sim_step.n_eval_misses) == (2, 5)
+    for G in [G_0, sim_step.get_G_du_t(U_1),
+              sim_step.get_G_du_sparse_t(U_1).data]:
+        assert not G.flags.writeable
+        try:
+            G[0] = 1.0
+        except ValueError:
+            pass
+        else:
+            assert False, 'cached value modified'
+
+
+def test_adaptive_time_step():
+    '''Test the bisection of the time increment that fails to converge
+    and the recorded time values of the adaptive time stepping.
+    '''
+    u_ref = get_single_fold_task(n_steps=4).u_t[-1]
+    # the single time increment needs five iterations and is bisected
+    sim_task = get_single_fold_task(n_steps=1, adaptive_time_step=True,
+                                    MAX_ITER=4)
+    assert np.allclose(sim_task.t_record, [0.0, 0.5, 0.75, 1.0])
+    assert len(sim_task.u_t) == len(sim_task.t_record)
+    assert len(sim_task.n_iter_t) == 3
+    assert np.allclose(sim_task.u_t[-1], u_ref, atol=1e-8)
+    assert np.allclose(sim_task.sim_history.t_record, sim_task.t_record)
+    # without bisections the simulation stops at the initial time
+    sim_task = get_single_fold_task(n_steps=1, adaptive_time_step=True,
+                                    MAX_ITER=4, time_step_bisections=0)
+    assert np.allclose(sim_task.t_record, [0.0])
+    assert len(sim_task.u_t) == 1
+
+
+def test_predictor():
+    '''Test the linear and quadratic extrapolation of the converged
+    states along a polynomial path and the reduction of the iterations.
+    '''
+    a, b, c = np.arange(3.0), np.ones(3), np.cos(np.arange(3.0))
+    t_conv = [0.1, 0.3, 0.4]
+    t = 0.7
+    for predictor, U_path in [('linear', lambda t: a + b * t),
+                              ('quadratic', lambda t: a + b * t + c * t ** 2)]:
+        sim_task = get_single_fold_task(predictor=predictor)
+        U_conv = [U_path(t_k) for t_k in t_conv]
+        assert np.allclose(sim_task._predict_U(t, t_conv, U_conv), U_path(t))
+        assert sim_task._predict_U(t, t_conv[:1], U_conv[:1]) is None
+    # the linear predictor does not reproduce the quadratic path
+    sim_task = get_single_fold_task(predictor='linear')
+    U_conv = [a + b * t_k + c * t_k ** 2 for t_k in t_conv]
+    assert not np.allclose(sim_task._predict_U(t, t_conv, U_conv),
+                           a + b * t + c * t ** 2)
+    sim_task = get_single_fold_task(predictor='none')
+    assert sim_task._predict_U(t, t_conv, U_conv) is None
+
+    n_iter, u_t = {}, {}
+    for predictor in ['none', 'linear', 'quadratic']:
+        sim_task = get_single_fold_task(n_steps=8, predictor=predictor)
+        n_iter[predictor] = np.sum(sim_task.n_iter_t)
+        u_t[predictor] = sim_task.u_t
+    assert n_iter['quadratic'] < n_iter['linear'] < n_iter['none']
+    assert np.allclose(u_t['linear'], u_t['none'], atol=1e-8)
+    assert np.allclose(u_t['quadratic'], u_t['none'], atol=1e-8)
+
+
+def test_optimizer_type():
+    '''Test the minimization of the distance to a target dihedral angle
+    with and without the inequality constraint bounding the angle
+    using each of the optimization backends.
+    '''
+    from oricreate.api import \
+        CreasePatternState, CustomCPFactory, SimulationConfig, SimulationTask
+    from oricreate.fu import FuTargetPsiValue
+    from oricreate.gu import GuConstantLength, GuDofConstraints, fix
+    from oricreate.hu import HuPsiConstraints
+    for optimizer_type in ['slsqp', 'trust-constr']:
+        for psi_bound, psi_sol in [(None, -0.6), (0.3, -0.3)]:
+            cp = CreasePatternState(
+                X=[[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]],
+                L=[[0, 1], [1, 2], [2, 3], [3, 0], [0, 2]],
+                F=[[0, 1, 2], [0, 2, 3]])
+            cp_factory = CustomCPFactory(formed_object=cp)
+            hu = {}
+            if psi_bound is not None:
+                hu['mv'] = HuPsiConstraints(forming_task=cp_factory,
+                                            psi_constraints=[(4, True)],
+                                            threshold=psi_bound)
+            gu_dofs = GuDofConstraints(
+                dof_constraints=fix([0], [0, 1, 2]) + fix([1], [1, 2]) +
+                fix([2], [2]))
+            sim_config = SimulationConfig(
+                goal_function_type='total potential energy',
+                gu={'cl': GuConstantLength(), 'u': gu_dofs}, hu=hu,
+                acc=1e-8, MAX_ITER=200, optimizer_type=optimizer_type)
+            sim_config._fu = FuTargetPsiValue(forming_task=cp_factory,
+                                              psi_value=(4, -0.6))
+            sim_task = SimulationTask(previous_task=cp_factory,
+                                      config=sim_config, n_steps=1)
+            cp.u[3, 2] = 0.05
+            sim_task.u_t
+            cp = sim_task.formed_object
+            assert sim_task.sim_step.converged
+            assert np.allclose(cp.iL_psi, [psi_sol], atol=1e-4)
+            assert np.allclose(cp.L_lengths, [1, 1, 1, 1, np.sqrt(2)],
+                               atol=1e-6)
+
+
+def test_dof_constraints_in_place_edit():
+    '''Test that the compiled dof constraints, the constant jacobian,
+    the evaluation cache, the dof reduction and the evaluation plan
+    follow the in-place edits of the array of dof constraints
+    once they are validated by the simulation step.
+    '''
+    from oricreate.gu import fix
+    for config in [{}, dict(eliminate_dofs=True), dict(use_eval_plan=True)]:
+        sim_task = get_single_fold_task(n_steps=1, **config)
+        gu_dofs = sim_task.config.gu['u']
+        gu_dofs.dof_constraints = fix([0], [0, 1, 2]) + fix([1], [1, 2]) + \
+            fix([2], [2], 0.0)
+        sim_task.u_t
+        sim_step = sim_task.sim_step
+        # prescribe the vertical displacement of the node 2
+        gu_dofs.dof_constraints[-1][-1] = 0.1
+        sim_step.validate_spec()
+        assert np.allclose(gu_dofs.get_G(1.0)[-1],
+                           sim_step.U[8] - 0.1)
+        sim_step._solve_nr()
+        assert sim_step.converged
+        assert np.allclose(sim_step.cp_state.u[2, 2], 0.1)
+        # change the coefficient of the equation
+        gu_dofs.dof_constraints[-1][0] = [(2, 2, 2.0)]
+        assert np.allclose(gu_dofs.get_G_du()[-1, 8], 1.0)
+        sim_step.validate_spec()
+        assert np.allclose(gu_dofs.get_G_du()[-1, 8], 2.0)
+        sim_step._solve_nr()
+        assert sim_step.converged
+        assert np.allclose(sim_step.cp_state.u[2, 2], 0.05)
+
+
+def test_psi_constraints_in_place_edit():
+    '''Test that the compiled psi constraints follow the in-place edits
+    of the arrays of equality and inequality psi constraints
+    once they are validated.
+    '''
+    from oricreate.hu import HuPsiConstraints
+    sim_task = get_single_fold_task(n_steps=1)
+    sim_task.u_t
+    cp = sim_task.formed_object
+    gu_psi = sim_task.config.gu['psi']
+    psi = cp.iL_psi[0]
+    assert np.allclose(gu_psi.get_G(1.0), [0.0], atol=1e-8)
+    gu_psi.psi_constraints[0][-1] = -0.2
+    gu_psi.validate_spec()
+    assert np.allclose(gu_psi.get_G(1.0), [psi + 0.2])
+    gu_psi.psi_constraints[0][0] = [(4, 2.0)]
+    gu_psi.validate_spec()
+    assert np.allclose(gu_psi.get_G(1.0), [2 * psi + 0.2])
+    assert np.allclose(gu_psi.get_G_du(), 2 * cp.iL_psi_du.toarray())
+    gu_psi.psi_constraints[0][0] = [(4, 1.0)]
+    sim_step = sim_task.sim_step
+    sim_step._solve_nr()
+    assert sim_step.converged
+    assert np.allclose(cp.iL_psi, [-0.2])
+    hu_psi = HuPsiConstraints(forming_task=sim_task,
+                              psi_constraints=[(4, True)])
+    assert np.allclose(hu_psi.get_H(), [-0.2])
+    hu_psi.psi_constraints[0][1] = False
+    hu_psi.validate_spec()
+    assert np.allclose(hu_psi.get_H(), [0.2])
+    hu_psi.sign = {True: -1, False: 1}
+    assert np.allclose(hu_psi.get_H(), [-0.2])
+
+
+def test_eval_plan():
+    '''Test that the compiled evaluation plan reproduces the goal
+    function, the constraints and their derivatives evaluated
+    through the crease pattern state.
+    '''
+    from oricreate.api import SimulationConfig, SimulationTask
+    from oricreate.fu import FuPotEngGravity, FuPotEngTotal
+    from oricreate.gu import \
+        GuConstantLength, GuDofConstraints, GuPsiConstraints, fix
+    from oricreate.hu import HuPsiConstraints
+    from oricreate.gu.gu_psi_constraints import CompiledPsiConstraints
+    from oricreate.simulation_step.evaluation_plan import StateEvaluation
+    cp_factory = YoshimuraCPFactory(n_x=2, n_y=2, L_x=4, L_y=2)
+    cp = cp_factory.formed_object
+    cp.X = cp.X + 0.1 * np.sin(np.arange(cp.n_dofs)).reshape(-1, 3)
+    L_0, L_1 = cp.iL[:2]
+    for fu in [FuPotEngTotal(forming_task=cp_factory, thickness=0.5,
+                             exclude_lines=[L_1],
+                             F_ext_list=[(0, 2, lambda t: -t),
+                                         (1, 0, 0.1)]),
+               FuPotEngGravity(forming_task=cp_factory)]:
+        gu_psi = GuPsiConstraints(
+            forming_task=cp_factory,
+            psi_constraints=[([(L_0, 1.0), (L_1, -0.5)], lambda t: t)])
+        hu_psi = HuPsiConstraints(forming_task=cp_factory,
+                                  psi_constraints=[(L_1, True)])
+        sim_config = SimulationConfig(
+            goal_function_type='total potential energy',
+            gu={'cl': GuConstantLength(), 'psi': gu_psi,
+                'u': GuDofConstraints(dof_constraints=fix([0], [0, 1, 2]))},
+            hu={'psi': hu_psi})
+        sim_config._fu = fu
+        sim_task = SimulationTask(previous_task=cp_factory,
+                                  config=sim_config, n_steps=1)
+        sim_step = sim_task.sim_step
+        sim_step.t = 0.5
+        U = 0.05 * np.cos(np.arange(cp.n_dofs))
+        names = ['f', 'f_du', 'G', 'G_du', 'H', 'H_du']
+        get_values = [getattr(sim_step, 'get_%s_t' % name)
+                      for name in names]
+        values = [np.copy(get_value(U)) for get_value in get_values]
+        sim_config.use_eval_plan = True
+        sim_step.compile_eval_plan()
+        sim_step.clear_eval_cache()
+        plan = sim_step.eval_plan
+        assert not isinstance(plan.fu, StateEvaluation)
+        i_psi = sim_step.gu_lst.index(gu_psi)
+        assert isinstance(plan.gu_lst[i_psi], CompiledPsiConstraints)
+        assert isinstance(plan.hu_lst[0], StateEvaluation)
+        for name, get_value, value in zip(names, get_values, values):
+            assert np.allclose(get_value(U), value), name
+
+
+def test_fd_stencils():
+    '''Test the finite difference derivatives of the angle based
+    constraints using the vertex star stencil and of the target
+    dihedral angle goal function using the stencil of its line.
+    '''
+    from oricreate.api import CustomCPFactory
+    from oricreate.fu import FuTargetPsiValue
+    from oricreate.gu import GuDevelopability, GuFlatFoldability
+    cp_factory = YoshimuraCPFactory(n_x=2, n_y=4, L_x=4, L_y=2)
+    cp = cp_factory.formed_object
+    forming_task = CustomCPFactory(formed_object=cp)
+    cp.U = np.sin(np.arange(cp.n_dofs)) * 0.1
+    for gu in [GuFlatFoldability(forming_task=forming_task),
+               GuDevelopability(forming_task=forming_task)]:
+        G_du_fd = gu.get_G_du_fd(step=1e-8).toarray()
+        assert np.allclose(gu.get_G_du(), G_du_fd, atol=1e-6)
+        assert gu._fd_jacobian.n_colors < cp.n_dofs / 2
+    fu = FuTargetPsiValue(forming_task=forming_task,
+                          psi_value=(cp.iL[0], 0.5))
+    f_du_fd = fu.get_f_du_fd(step=1e-8)
+    assert np.allclose(fu.get_f_du().flatten(), f_du_fd, atol=1e-6)
+    assert fu._fd_jacobian.n_colors == 12
+
+
+def test_fd_derivatives_supplied():
+    '''Test that the derivatives are supplied to the optimizer
+    only if they are evaluated analytically or if all components
+    provide a sparse pattern for the colored finite differences.
+    '''
+    sim_task = get_single_fold_task(use_G_du=False)
+    sim_step = sim_task.sim_step
+    assert sim_step.has_G_du
+    G_du = sim_step.get_G_du_t(sim_step.U)
+    sim_task.config.use_G_du = True
+    sim_step.clear_eval_cache()
+    assert np.allclose(sim_step.get_G_du_t(sim_step.U), G_du, atol=1e-6)
+    sim_task.config.gu['cl'].du_stencil = 'dense'
+    assert sim_step.has_G_du
+    sim_task.config.use_G_du = False
+    assert not sim_step.has_G_du
+    sim_task.u_t
+    assert sim_step.converged